@@ -1,8 +1,18 @@
 ﻿from __future__ import annotations
+import asyncio, json
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel, Field
-from app.services.market_data import get_quotes, get_history
+from app.core.http_cache import (
+    ValidatorCache, make_etag, etag_matches, not_modified, apply_validators, seconds_until_boundary,
+)
+from app.core.serialization import FastJSONResponse, NPY_MEDIA_TYPE, npy_bytes
+from app.services.market_data import (
+    get_quotes, get_history, get_history_columns, chart_points_limit, _normalize_period_interval, _INTERVAL_SECONDS,
+)
+from app.services.quote_stream import quote_hub
 
 router = APIRouter(prefix="/api/market", tags=["market"])
 
@@ -21,6 +31,38 @@ def quotes(
     data = get_quotes(syms)
     return {"quotes": [{"ticker": k, "price": v} for k, v in data.items()]}
 
+_STREAM_KEEPALIVE_SECONDS = 15.0
+
+@router.get("/stream")
+async def stream(
+    request: Request,
+    tickers: str = Query(..., description="Comma-separated symbols, ex: AAPL,MSFT,TSLA"),
+):
+    """
+    Server-Sent Events: `data: {"quotes": {"AAPL": 231.4, ...}}` with changed prices only.
+    All clients share one upstream poller (see services/quote_stream.py).
+    """
+    syms = [s.strip().upper() for s in tickers.split(",") if s.strip()]
+
+    async def events():
+        sub = await quote_hub.subscribe(syms)
+        try:
+            while not await request.is_disconnected():
+                try:
+                    batch = await asyncio.wait_for(sub.get(), timeout=_STREAM_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps({'quotes': batch})}\n\n"
+        finally:
+            quote_hub.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 class CandleOut(BaseModel):
     date: str
     open: float
@@ -35,15 +77,62 @@ class HistoryResponse(BaseModel):
     interval: str = Field(..., description="ex: 1d, 1h, 30m, 15m, 5m, 1m")
     candles: List[CandleOut]
 
+_history_validators = ValidatorCache("history-validators")
+
 @router.get("/history", response_model=HistoryResponse)
 def history(
+    request: Request,
+    response: Response,
     ticker: str = Query(..., description="Symbol, ex: AAPL"),
     period: str = Query("1y"),
     interval: str = Query("1d"),
+    fmt: str = Query("json", alias="format", pattern="^(json|columnar|npy)$",
+                     description="json (candles[]) | columnar ({t,o,h,l,c,v}, epoch seconds) | npy (binary)"),
+    max_points: Optional[int] = Query(None, ge=3, le=100_000, description="decimate for charts (ex: chart width in px)"),
+    downsample: str = Query("minmax", pattern="^(minmax|lttb)$",
+                            description="minmax (OHLC buckets, extremes kept) | lttb (real bars, shape of close)"),
 ):
-    return {
-        "ticker": ticker.upper(),
-        "period": period,
-        "interval": interval,
-        "candles": get_history(ticker, period, interval),
-    }
+    # Seria se schimbă o dată pe bară: până la următoarea bară, același ETag => 304 fără provider
+    p_norm, i_norm = _normalize_period_interval(period, interval)
+    vkey = f"{ticker.upper()}|{p_norm}|{i_norm}|{fmt}|{max_points or ''}|{downsample}"
+    known = _history_validators.fresh(vkey)
+    if known and etag_matches(request, known[0]):
+        return not_modified(*known)
+
+    max_age = seconds_until_boundary(_INTERVAL_SECONDS.get(i_norm, 86400))
+
+    if fmt == "json":
+        candles = get_history(ticker, period, interval, chart_points_limit(max_points), downsample)
+        last_ts = candles[-1]["date"] if candles else None
+        last_close = candles[-1]["close"] if candles else None
+        last_modified = datetime.fromisoformat(last_ts).timestamp() if last_ts else None
+        etag = make_etag("history", vkey, len(candles), last_ts, last_close)
+        _history_validators.remember(vkey, etag, max_age, last_modified)
+        if etag_matches(request, etag):
+            return not_modified(etag, max_age, last_modified)
+        apply_validators(response, etag, max_age, last_modified)
+        return {
+            "ticker": ticker.upper(),
+            "period": period,
+            "interval": interval,
+            "candles": candles,
+        }
+
+    # Columnar: fără model pydantic per rând; arrays NumPy encodate direct
+    cols = get_history_columns(ticker, period, interval, chart_points_limit(max_points), downsample)
+    n = len(cols["t"])
+    last_modified = float(cols["t"][-1]) if n else None
+    etag = make_etag("history", vkey, n, last_modified, float(cols["c"][-1]) if n else None)
+    _history_validators.remember(vkey, etag, max_age, last_modified)
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age, last_modified)
+    if fmt == "npy":
+        out = Response(npy_bytes(cols), media_type=NPY_MEDIA_TYPE)
+    else:
+        out = FastJSONResponse({
+            "ticker": ticker.upper(),
+            "period": period,
+            "interval": interval,
+            **cols,
+        })
+    return apply_validators(out, etag, max_age, last_modified)
@@ -0,0 +1,16 @@
+from __future__ import annotations
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def get_metrics():
+    # Scrape Prometheus; 404 când METRICS_ENABLED=false
+    if not metrics.enabled():
+        raise HTTPException(status_code=404, detail="metrics disabled")
+    return PlainTextResponse(metrics.render(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,11 +1,8 @@
 from __future__ import annotations
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel, Field
-import pandas as pd
 
-from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
-from app.ml.pipeline.infer_service import predict_from_candles
-from app.ml.data.synth import synth_candles
+# Modulele ML (pandas/sklearn) se încarcă la primul apel, nu la importul aplicației
 
 router = APIRouter(prefix="/api/ml", tags=["ml"])
 
@@ -16,6 +13,9 @@ class TrainRequest(BaseModel):
 
 @router.post("/train")
 def train(req: TrainRequest):
+    from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
+    from app.ml.data.synth import synth_candles
+
     # TODO: înlocuiește synth_candles cu provider real (Yahoo/AlphaVantage)
     df = synth_candles(n=900, seed=11)
     metrics = train_on_dataframe(df, TrainConfig(ticker=req.ticker, horizon_days=req.horizon_days))
@@ -24,15 +24,140 @@ def train(req: TrainRequest):
 class PredictRequest(BaseModel):
     ticker: str
     horizon_days: int = Field(7, ge=2, le=30)
+    coverage: float = Field(0.8, gt=0, lt=1, description="nivelul benzilor conformal (0.8 => q10/q90)")
 
 @router.post("/predict")
 def predict(req: PredictRequest):
+    from app.ml.pipeline.infer_service import predict_from_candles
+    from app.ml.data.synth import synth_candles
+
     # pentru demo folosim ultimele N lumânări sintetice; în producție: ultimele lumânări din provider.
     df = synth_candles(n=1200, seed=13)
     try:
-        out = predict_from_candles(req.ticker, req.horizon_days, df)
+        out = predict_from_candles(req.ticker, req.horizon_days, df, coverage=req.coverage)
         return {"ok": True, "prediction": out}
     except FileNotFoundError:
         raise HTTPException(status_code=400, detail="Modelul nu există. Rulează /api/ml/train mai întâi.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+class RecalibrateRequest(BaseModel):
+    ticker: str
+    horizon_days: int = Field(7, ge=2, le=30)
+    window: int = Field(250, ge=30, le=2000, description="ultimele N zile rezolvate")
+    method: str = Field("isotonic", pattern="^(isotonic|platt)$")
+
+@router.post("/calibration/recalibrate")
+def recalibrate(req: RecalibrateRequest):
+    from app.services.ml_integration import recalibrate_online
+
+    try:
+        return {"ok": True, **recalibrate_online(req.ticker, req.horizon_days, req.window, req.method)}
+    except FileNotFoundError:
+        raise HTTPException(status_code=400, detail="Modelul nu există. Rulează /api/ml/train mai întâi.")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/trajectories")
+def trajectories(
+    tickers: str | None = Query(None, description="Comma-separated; gol => universul de azi"),
+    max_horizon: int = Query(14, ge=1, le=60),
+    paths: int = Query(10_000, ge=100, le=100_000),
+    seed: int = Query(42),
+    mode: str = Query("bootstrap", pattern="^(bootstrap|normal)$"),
+    ar1: bool = Query(True),
+    model_horizon_days: int | None = Query(None, ge=2, le=30, description="drift din modelul antrenat pe acest orizont"),
+):
+    import time
+    from app.services.ml_integration import trajectories_for
+
+    if tickers:
+        syms = [t for t in tickers.split(",") if t.strip()]
+    else:
+        from app.services.universe import today_universe
+        syms = today_universe()["all"]
+    t0 = time.perf_counter()
+    try:
+        out = trajectories_for(syms, horizons=range(1, max_horizon + 1), n_paths=paths, seed=seed,
+                               mode=mode, ar1=ar1, model_horizon_days=model_horizon_days)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    out.update({"seed": seed, "paths": paths, "mode": mode, "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)})
+    return out
+
+@router.get("/drift")
+def drift_scores(
+    ticker: str | None = Query(None),
+    horizon_days: int | None = Query(None, ge=2, le=30),
+):
+    from app.ml.monitoring.drift import drift_monitor
+
+    return {
+        "models": drift_monitor.scores(ticker, horizon_days),
+        "retrain_queue": [{"ticker": t, "horizon_days": h} for t, h in drift_monitor.pending_retrains()],
+        "thresholds": {"psi": drift_monitor.psi_threshold, "ks": drift_monitor.ks_threshold},
+    }
+
+@router.post("/drift/retrain")
+def drift_retrain(max_jobs: int = Query(1, ge=1, le=20)):
+    from app.services.ml_integration import retrain_drifted
+
+    done = retrain_drifted(max_jobs)
+    return {"ok": True, "retrained": [{"ticker": t, "horizon_days": h} for t, h in done]}
+
+@router.get("/policy")
+def policy(horizon_days: int = Query(7, ge=1, le=90)):
+    import os
+    from app.ml.pipeline.infer_service import ART_DIR
+    from app.ml.policy.thresholds import Policy, policy_path
+
+    path = policy_path(ART_DIR, horizon_days)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Nicio politică optimizată pentru acest orizont.")
+    return Policy.load(path).to_dict()
+
+@router.post("/policy/optimize")
+def policy_optimize(
+    horizon_days: int = Query(7, ge=1, le=90),
+    full: bool = Query(False, description="reconstruiește grila în loc de actualizarea incrementală"),
+):
+    from app.services.ml_integration import optimize_policy
+
+    try:
+        return {"ok": True, **optimize_policy(horizon_days, full=full)}
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@router.get("/shap/importance")
+def shap_importance(ticker: str = Query(...), horizon_days: int = Query(7, ge=2, le=30)):
+    import json
+    import os
+    from app.ml.pipeline.infer_service import ART_DIR
+    from app.ml.monitoring.shap_stability import importance_path
+
+    path = importance_path(ART_DIR, f"{ticker.upper()}_{horizon_days}d")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Nicio importanță SHAP pentru acest model (antrenează-l din nou).")
+    with open(path, encoding="utf-8") as f:
+        windows = json.load(f)["windows"]
+    last = windows[-1]
+    out = {"ticker": ticker.upper(), "horizon_days": horizon_days, "windows": len(windows),
+           "trained_at": last["trained_at"], "train_end": last.get("train_end")}
+    for target in ("cls", "reg"):
+        if last.get(target):
+            pairs = sorted(zip(last["features"], last[target]), key=lambda p: -p[1])
+            out[target] = [{"feature": f, "mean_abs_shap": v} for f, v in pairs]
+    return out
+
+@router.get("/shap/stability")
+def shap_stability(
+    target: str = Query("cls", pattern="^(cls|reg)$"),
+    min_share: float = Query(0.02, ge=0, le=1),
+    cv_threshold: float = Query(1.0, gt=0),
+    rank_std_threshold: float = Query(3.0, gt=0),
+):
+    from app.ml.pipeline.infer_service import ART_DIR
+    from app.ml.monitoring.shap_stability import load_histories, stability_report
+
+    return stability_report(load_histories(ART_DIR), target, min_share=min_share,
+                            cv_threshold=cv_threshold, rank_std_threshold=rank_std_threshold)
@@ -1,13 +1,18 @@
+import re
+import time
 from fastapi import APIRouter, Depends, HTTPException
-from fastapi import Path, Query
-from typing import List, Optional
+from fastapi import Path, Query, Request, Response
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel, Field
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
+from app.core.fanout import fan_out
+from app.core.http_cache import make_etag, etag_matches, not_modified, apply_validators
 from app.db.session import get_db
-from app.services.market_data import get_history, get_quotes
+from app.services.market_data import chart_points_limit, get_history, get_quotes
 from app.services.ml_integration import ensure_model_and_predict
-from app.db.session import SessionLocal
 from app.models.prediction import StockPrediction
 from app.schemas.prediction import PredictionIn, PredictionOut
 from app.services.prediction_engine import PredictionEngine
@@ -32,6 +37,7 @@ class PredictionRowOut(BaseModel):
     outcome: Optional[str] = None
     rationale: Optional[str] = None
     created_at: str
+    bands: Optional[Dict[str, Any]] = None
 
 class PredictionDetailsResponse(BaseModel):
     ticker: str
@@ -41,17 +47,25 @@ class PredictionDetailsResponse(BaseModel):
     prediction: Optional[PredictionRowOut] = None
     previous: List[PredictionRowOut] = []
     candles: List[CandleOut] = []
+    timings_ms: Dict[str, float] = {}  # db / history / quotes / total
+    partial: List[str] = []            # secțiuni care au expirat sau au eșuat (servite goale)
 
 
+engine = PredictionEngine()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_BAND_RE = re.compile(r"band(\d+)=\[(-?[\d.]+)%, (-?[\d.]+)%\]")
+
+
+def _bands_from_rationale(rationale: Optional[str], expected_change_pct: float) -> Optional[Dict[str, Any]]:
+    """Bands of a stored row: the table has no columns for them, the rationale keeps band80=[lo%, hi%]."""
+    m = _BAND_RE.search(rationale or "")
+    if m is None:
+        return None
+    cov = int(m.group(1))
+    lo, hi = (100 - cov) // 2, (100 + cov) // 2
+    return {f"q{lo:02d}": float(m.group(2)), "q50": float(expected_change_pct), f"q{hi:02d}": float(m.group(3)),
+            "coverage": cov / 100, "method": "split_conformal"}
 
-engine = PredictionEngine()
 
 @router.post("", response_model=PredictionOut)
 def create_prediction(payload: PredictionIn, db: Session = Depends(get_db)):
@@ -65,6 +79,8 @@ def create_prediction(payload: PredictionIn, db: Session = Depends(get_db)):
         probability_pct = ml["probability_pct"]
         expected_change_pct = ml["expected_change_pct"]
         reward_to_risk = ml["reward_to_risk"]
+        bands = ml.get("bands")
+        drivers = ml.get("drivers")
     except Exception as e:
         # 502: problemă la provider/ML, nu la client
         raise HTTPException(status_code=502, detail=f"Predict ML a eșuat: {e}")
@@ -74,6 +90,10 @@ def create_prediction(payload: PredictionIn, db: Session = Depends(get_db)):
 
     # (opțional) un motiv scurt/explicativ pentru audit/UX
     rationale = f"ML(v1): prob={probability_pct}%, exp={expected_change_pct}%, rr={reward_to_risk}"
+    if bands:
+        rationale += f", band80=[{bands['q10']}%, {bands['q90']}%]"
+    if drivers:
+        rationale += ", drivers=" + ";".join(f"{d['feature']}{d['value']:+.2f}" for d in drivers)
 
     obj = StockPrediction(
         ticker=ticker,
@@ -87,23 +107,32 @@ def create_prediction(payload: PredictionIn, db: Session = Depends(get_db)):
     db.add(obj)
     db.commit()
     db.refresh(obj)
-    return obj
+    out = PredictionOut.model_validate(obj)
+    out.bands = bands
+    return out
 
 @router.get("/{ticker}", response_model=PredictionDetailsResponse)
 def prediction_details(
+    request: Request,
+    response: Response,
     ticker: str = Path(..., description="Symbol, ex: AAPL"),
     period: str = Query("3mo"),
     interval: str = Query("1d"),
     limit: int = Query(10, ge=1, le=200),
+    max_points: Optional[int] = Query(None, ge=3, le=100_000, description="decimate candles (ex: chart width in px)"),
+    downsample: str = Query("lttb", pattern="^(minmax|lttb)$"),
     db: Session = Depends(get_db),
 ):
     t = ticker.upper()
 
-    # 1) Predicții din DB: ultima + câteva anterioare
-    #    (presupunem modelul SQLAlchemy: StockPrediction cu coloane folosite în UI)
-    q = db.query(StockPrediction).filter(StockPrediction.ticker == t).order_by(StockPrediction.created_at.desc())
-    latest = q.first()
-    prev = q.offset(1).limit(limit).all()
+    # 0) Validator ieftin: id-ul ultimei predicții (un MAX pe index) + fereastra TTL a cotației.
+    #    Dacă clientul are deja varianta asta, 304 înainte de history/quotes.
+    ttl = max(1, int(settings.market_cache_ttl_seconds))
+    latest_id = db.query(func.max(StockPrediction.id)).filter(StockPrediction.ticker == t).scalar()
+    etag = make_etag("prediction", t, latest_id, period, interval, limit, max_points, downsample,
+                     int(time.time() // ttl))
+    if etag_matches(request, etag):
+        return not_modified(etag, ttl)
 
     def row_to_out(r: StockPrediction) -> PredictionRowOut:
         return PredictionRowOut(
@@ -116,37 +145,63 @@ def prediction_details(
             outcome=getattr(r, "outcome", None),
             rationale=getattr(r, "rationale", None),
             created_at=r.created_at.isoformat() if getattr(r, "created_at", None) else "",
+            bands=_bands_from_rationale(getattr(r, "rationale", None), float(r.expected_change_pct)),
         )
 
-    latest_out = row_to_out(latest) if latest else None
-    previous_out = [row_to_out(r) for r in prev]
-
-    # 2) Istoric de piață (period/interval din query)
-    try:
-        candles_js = get_history(t, period, interval)  # list[dict]
-    except Exception as e:
-        # dacă providerii dau rate-limit/eroare, continuăm totuși cu secțiunea de predicții
-        candles_js = []
-    candles_out = [CandleOut(**c) for c in candles_js]
-
-    # 3) Ultimul preț live (pentru header)
-    try:
-        qp = get_quotes([t])  # dict: {ticker: price}
-        last_price = qp.get(t)
-    except Exception:
-        last_price = None
+    # 1) Predicții din DB: ultima + câteva anterioare
+    #    (presupunem modelul SQLAlchemy: StockPrediction cu coloane folosite în UI)
+    #    Sesiune proprie pe același engine: ramura rulează în alt thread decât request-ul.
+    bind = db.get_bind()
+
+    def load_predictions():
+        with Session(bind=bind) as s:
+            q = s.query(StockPrediction).filter(StockPrediction.ticker == t).order_by(StockPrediction.created_at.desc())
+            latest = q.first()
+            return (row_to_out(latest) if latest else None), [row_to_out(r) for r in q.offset(1).limit(limit).all()]
+
+    # 1-3) DB, istoric și cotație sunt independente: rulează concurent, fiecare cu bugetul lui.
+    #      Dacă providerii dau rate-limit/eroare/timeout, răspundem cu secțiunea goală.
+    t0 = time.perf_counter()
+    res = fan_out({
+        "db": (load_predictions, settings.details_db_timeout_seconds, (None, [])),
+        "history": (lambda: get_history(t, period, interval, chart_points_limit(max_points), downsample),
+                    settings.details_history_timeout_seconds, []),
+        "quotes": (lambda: get_quotes([t]).get(t), settings.details_quotes_timeout_seconds, None),
+    })
+    latest_out, previous_out = res["db"].value
+    timings = {name: round(r.ms, 2) for name, r in res.items()}
+    timings["total"] = round((time.perf_counter() - t0) * 1000.0, 2)
+    partial = [name for name, r in res.items() if not r.ok]
+    if partial:
+        # răspuns degradat: fără ETag (un 304 ulterior l-ar fixa la client) și necacheabil
+        response.headers["Cache-Control"] = "no-store"
+    else:
+        apply_validators(response, etag, ttl)
 
     return {
         "ticker": t,
-        "last_price": last_price,
+        "last_price": res["quotes"].value,
         "period": period,
         "interval": interval,
         "prediction": latest_out,
         "previous": previous_out,
-        "candles": candles_out,
+        "candles": res["history"].value,  # validat o singură dată de response_model
+        "timings_ms": timings,
+        "partial": partial,
     }
 
 
 @router.get("", response_model=List[PredictionOut])
-def list_predictions(db: Session = Depends(get_db), limit: int = 100):
-    return db.query(StockPrediction).order_by(StockPrediction.created_at.desc()).limit(limit).all()
+def list_predictions(request: Request, response: Response, db: Session = Depends(get_db), limit: int = 100):
+    # Lista se schimbă doar când se scrie o predicție nouă: ETag din (max id, count)
+    max_id, count = db.query(func.max(StockPrediction.id), func.count(StockPrediction.id)).one()
+    etag = make_etag("predictions", max_id, count, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag, 0)
+    apply_validators(response, etag, 0)
+    out = []
+    for r in db.query(StockPrediction).order_by(StockPrediction.created_at.desc()).limit(limit).all():
+        row = PredictionOut.model_validate(r)
+        row.bands = _bands_from_rationale(r.rationale, r.expected_change_pct)
+        out.append(row)
+    return out
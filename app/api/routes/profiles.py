@@ -0,0 +1,25 @@
+from __future__ import annotations
+from typing import List, Dict
+from fastapi import APIRouter, HTTPException, Request
+
+from app.core import profiling
+
+router = APIRouter(prefix="/api/profiles", tags=["profiling"])
+
+def _guard(request: Request):
+    # Profilurile conțin căi și stack-uri interne: doar clienții din PROFILING_ALLOWED_CLIENTS
+    if not profiling.client_allowed(request.client.host if request.client else None):
+        raise HTTPException(status_code=403, detail="client not allowed")
+
+@router.get("", response_model=List[Dict])
+def list_profiles(request: Request):
+    _guard(request)
+    return profiling.list_profiles()
+
+@router.get("/{profile_id}")
+def get_profile(profile_id: str, request: Request):
+    _guard(request)
+    data = profiling.load_profile(profile_id)
+    if data is None:
+        raise HTTPException(status_code=404, detail="profile not found")
+    return data
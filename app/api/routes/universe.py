@@ -1,10 +1,12 @@
 from __future__ import annotations
 from typing import List, Dict
 from datetime import datetime
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request, Response
 from pydantic import BaseModel, Field
 
-from app.services.universe import today_universe, _pool_list, _fixed_list
+from app.core.config import settings
+from app.core.http_cache import make_etag, etag_matches, not_modified, apply_validators, seconds_until_boundary
+from app.services.universe import today_universe, _pool_list, _fixed_list, _today_seed
 
 router = APIRouter(prefix="/api/universe", tags=["universe"])
 
@@ -15,7 +17,15 @@ class UniverseResponse(BaseModel):
     all: List[str] = Field(description="fixed + random (unique, in this order)")
 
 @router.get("/today", response_model=UniverseResponse)
-def get_today_universe():
+def get_today_universe(request: Request, response: Response):
+    # Se schimbă o dată pe zi: ETag din seed-ul zilei + configurația universului (fără I/O)
+    seed = _today_seed()
+    etag = make_etag("universe", seed, settings.universe_fixed,
+                     settings.universe_random_pool_path, settings.universe_random_daily_count)
+    max_age = seconds_until_boundary(86400)
+    if etag_matches(request, etag):
+        return not_modified(etag, max_age)
+    apply_validators(response, etag, max_age)
     return today_universe()
 
 class PoolStats(BaseModel):
@@ -28,3 +38,22 @@ def pool_stats():
     pool = set(_pool_list())
     fixed = set(_fixed_list())
     return {"pool_size": len(pool), "fixed_size": len(fixed), "overlap": len(pool & fixed)}
+
+@router.get("/shard")
+def get_shard():
+    # Partea din universul de azi deținută de acest worker + cine deține restul
+    from app.services import sharding
+
+    coord = sharding.coordinator
+    local = sharding.local_universe()
+    if coord is None:
+        return {"enabled": False, "local": local}
+    return {
+        "enabled": True,
+        "worker_id": coord.worker_id,
+        "live_workers": coord.live_workers,
+        "shard_count": coord.shard_count,
+        "owned_shards": sorted(coord.owned),
+        "assignments": {str(s): owner for s, (owner, _) in sorted(coord.assignments.items())},
+        "local": local,
+    }
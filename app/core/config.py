@@ -30,9 +30,13 @@ class Settings(BaseSettings):
     
     # Logging
     log_level: str = "INFO"  # DEBUG, INFO, WARNING, ERROR, CRITICAL
+    log_json: bool = False  # o linie JSON per înregistrare (producție / agregatoare de loguri)
+    log_enqueue: bool = False  # scrierea pe un thread de fundal, prin coadă (producție)
+    log_sample_per_site: float = 0.0  # max debug/info pe secundă per linie de cod; 0 = toate
 
     # Database
     database_url: str = "sqlite:///./data/app.db"
+    db_create_all: bool = True  # False în producție (schema gestionată de alembic)
 
     @property
     def sqlalchemy_database_uri(self) -> str:
@@ -42,11 +46,92 @@ class Settings(BaseSettings):
     # App
     app_name: str = "AI Stock Predictor v2"
     debug: bool = False
+    preload_ml: bool = False  # True => importă pandas/sklearn în lifespan, nu la prima predicție
 
     # Market providers
     alpha_vantage_api_key: str | None = None
     market_provider_order: str = "yahoo,alpha_vantage"
     market_cache_ttl_seconds: int = 5
+    market_stream_interval_seconds: float = 5.0  # tick-ul pollerului comun pentru /api/market/stream
+    market_history_cache_ttl_seconds: int = 60
+    market_resample_enabled: bool = True  # un singur interval de bază per (ticker, period), restul derivate local
+    market_history_max_points: int = 5000  # plafon de bare per răspuns (decimare min/max); 0 = fără
+
+    # Replay provider (MARKET_PROVIDER_ORDER=replay): date înregistrate/sintetice + erori injectate
+    replay_data_dir: str | None = "data/replay"  # {TICKER}_{interval}.csv; lipsă => serie sintetică
+    replay_latency_ms: str = "lognormal:80,0.6"  # fixed:40 | uniform:20,120 | normal:80,20 | lognormal:median,sigma | 0
+    replay_error_rate: float = 0.0
+    replay_empty_rate: float = 0.0
+    replay_rate_limit_rate: float = 0.0  # răspunsuri tip "Note" (rate limit Alpha Vantage)
+    replay_seed: int = 42
+
+    # Cache backend: memory (per worker) | sqlite (comun pe un host) | redis (comun între hosturi)
+    cache_backend: str = "memory"
+    cache_url: str | None = None  # ex: data/cache.sqlite3 sau redis://127.0.0.1:6379/0
+
+    # Observability
+    metrics_enabled: bool = True  # /metrics (format Prometheus); False => instrumentare no-op
+    profiling_enabled: bool = False  # comutator global pentru ProfilingMiddleware
+    profiling_sample_rate: int = 0  # profilează 1 din N request-uri; 0 => doar la cerere (X-Profile: 1)
+    profiling_allowed_clients: str = "127.0.0.1,::1"  # IP-uri care pot cere/citi profiluri; "*" => oricine
+    profiling_dir: str = "data/profiles"
+    profiling_max_bytes: int = 50_000_000  # peste limită se șterg cele mai vechi profiluri
+    profiling_interval_ms: float = 5.0  # perioada samplerului de stack-uri
+
+    # Drift de features (PSI/KS față de histogramele de antrenare, fereastră glisantă per model)
+    drift_enabled: bool = True
+    drift_bins: int = 10  # binuri de masă egală în histogramele de referință
+    drift_window: int = 500  # ultimele N predicții per (ticker, orizont)
+    drift_eval_every: int = 25  # PSI/KS la fiecare N predicții
+    drift_min_samples: int = 100  # sub atâtea observații nu evaluăm
+    drift_psi_threshold: float = 0.25
+    drift_ks_threshold: float = 0.3
+    drift_max_models: int = 512  # monitoare ținute în memorie (LRU)
+    drift_retrain_queue_size: int = 64
+    drift_retrain_interval_seconds: float = 0.0  # >0 => worker care reantrenează din coadă; 0 => doar manual
+
+    # Optimizer EV pentru pragurile buy/hold/sell (predicții rezolvate, fereastră rulantă)
+    policy_window_days: int = 180
+    policy_cost_pct: float = 0.3  # cost dus-întors per tranzacție (comision + spread + slippage), în %
+    policy_features: str = "prob,exp,rr"  # o singură feature => căutare exactă (sortare + cumsum)
+    policy_bins: int = 32  # praguri candidate (cuantile) per feature în grila multi-dimensională
+    policy_min_trades: int = 30  # sub atâtea tranzacții în fereastră un prag nu e luat în calcul
+    policy_smoothing: float = 0.5  # cât din drumul spre noul optim se face la o reoptimizare (1 = tot)
+    policy_refresh_interval_seconds: float = 0.0  # >0 => reoptimizare incrementală periodică; 0 => doar manual
+
+    # SHAP: importanța globală per artefact (la antrenare), drivers în rationale, raport de stabilitate
+    shap_enabled: bool = True
+    shap_sample_rows: int = 1000  # rânduri de validare explicate pentru importanța globală
+    shap_history_windows: int = 12  # ferestre de reantrenare păstrate per artefact
+    shap_top_k: int = 3  # contribuții în rationale-ul predicției; 0 = off
+    ml_artifact_cache_models: int = 256  # modele (ticker, orizont) cu artefacte încărcate în memorie (LRU)
+    shap_report_interval_seconds: float = 0.0  # >0 => raport periodic de stabilitate; 0 => doar la cerere
+
+    # Sharding-ul universului între procese/hosturi (lease-uri în tabela shard_leases)
+    shard_enabled: bool = False
+    shard_worker_id: str | None = None  # gol => hostname:pid
+    shard_url: str | None = None  # URL-ul la care alți workeri ajung la acesta (pentru routing)
+    shard_count: int = 64  # shard-uri logice; nu se schimbă după pornirea clusterului
+    shard_vnodes: int = 64  # noduri virtuale per worker în ring
+    shard_lease_seconds: float = 30.0  # heartbeat la 1/3 din lease
+    shard_routing: str = "off"  # off | redirect (307) | proxy
+
+    # Știri: surse pentru pipeline-ul de ingestie + dedup near-duplicate (SimHash) cu memorie fixă
+    news_sources: str = ""  # ex: "jsonl:data/news/*.jsonl"
+    news_dedup_capacity: int = 200_000  # câte amprente recente păstrează indexul
+
+    # Bare intraday din stream-ul de cotații (1m/5m în memorie; providerul doar pentru găuri)
+    bars_enabled: bool = False
+    bars_1m_capacity: int = 600  # ~10h de bare 1m per ticker
+    bars_5m_capacity: int = 288  # 24h de bare 5m per ticker
+    bars_max_tickers: int = 2000  # LRU peste tickere
+    bars_universe_refresh_seconds: float = 300.0  # reabonare când se schimbă universul zilei
+
+    # Fan-out concurent (ex: GET /api/predictions/{ticker}): un pool per ramură + buget per ramură
+    fanout_max_workers: int = 16  # thread-uri per pool de ramură (db / history / quotes)
+    details_db_timeout_seconds: float = 2.0
+    details_history_timeout_seconds: float = 5.0
+    details_quotes_timeout_seconds: float = 2.0
 
     # CORS
     cors_origins: str | None = None  # ex: "http://127.0.0.1:8000,http://localhost:8000"
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+"""
+Concurrent fan-out of independent blocking calls (DB, providers) with per-branch budgets
+- One bounded thread pool per branch name ("db", "history", "quotes"...), FANOUT_MAX_WORKERS
+  each: stragglers of a slow provider can only fill their own pool, never delay the DB branch
+- Every branch gets its own timeout, measured from the fan-out start, and a fallback value:
+  a slow or failing branch degrades to partial data instead of delaying the others
+- Per-branch timing (ms) and status (ok | timeout | error) for the response / logs
+- A timed-out call keeps running in its worker (threads cannot be interrupted); its result
+  is dropped, and the per-branch pool bound keeps such stragglers from piling up
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+
+Branch = Tuple[Callable[[], Any], float, Any]  # (fn, timeout_seconds, fallback)
+
+_pools: Dict[str, ThreadPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+
+def _executor(name: str) -> ThreadPoolExecutor:
+    pool = _pools.get(name)
+    if pool is None:
+        with _pool_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                pool = _pools[name] = ThreadPoolExecutor(max_workers=settings.fanout_max_workers,
+                                                         thread_name_prefix=f"fanout-{name}")
+    return pool
+
+
+@dataclass
+class BranchResult:
+    value: Any
+    ms: float
+    status: str  # ok | timeout | error
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+
+def _timed(fn: Callable[[], Any]) -> Tuple[Any, float]:
+    t0 = time.perf_counter()
+    value = fn()
+    return value, (time.perf_counter() - t0) * 1000.0
+
+
+def fan_out(branches: Dict[str, Branch], executor: ThreadPoolExecutor | None = None) -> Dict[str, BranchResult]:
+    """
+    Run every branch concurrently; wall time ~ the slowest branch within its budget.
+    Each branch runs in the pool of its name, unless `executor` is given (shared by all).
+    """
+    t0 = time.perf_counter()
+    futures = {name: ((executor or _executor(name)).submit(_timed, fn), timeout, fallback)
+               for name, (fn, timeout, fallback) in branches.items()}
+    out: Dict[str, BranchResult] = {}
+    for name, (fut, timeout, fallback) in futures.items():
+        remaining = t0 + timeout - time.perf_counter()
+        try:
+            value, ms = fut.result(timeout=max(0.0, remaining))
+            out[name] = BranchResult(value, ms, "ok")
+        except FutureTimeout:
+            fut.cancel()  # dacă n-a pornit încă (pool plin), nu mai pornește
+            out[name] = BranchResult(fallback, (time.perf_counter() - t0) * 1000.0, "timeout")
+            logger.warning("Fan-out branch '{}' timed out after {:.1f}s; serving partial data", name, timeout)
+        except Exception as e:
+            out[name] = BranchResult(fallback, (time.perf_counter() - t0) * 1000.0, "error")
+            logger.warning("Fan-out branch '{}' failed: {}", name, e)
+    return out
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+"""
+Conditional HTTP caching helpers
+- Strong ETags from cheap fingerprints (date seed, last candle, latest prediction id)
+- If-None-Match matching (lists, weak validators, '*')
+- 304 responses and ETag / Cache-Control / Last-Modified headers
+- ValidatorCache: last ETag served per key until the data's next natural update,
+  so a matching If-None-Match can be answered before any provider/DB work
+"""
+
+import hashlib
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.services.cache import make_cache
+
+
+def make_etag(*parts) -> str:
+    raw = "|".join("" if p is None else str(p) for p in parts)
+    return '"' + hashlib.blake2b(raw.encode("utf-8"), digest_size=10).hexdigest() + '"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header or not etag:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def http_date(ts: float | datetime) -> str:
+    dt = ts if isinstance(ts, datetime) else datetime.fromtimestamp(ts, tz=timezone.utc)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return format_datetime(dt.astimezone(timezone.utc), usegmt=True)
+
+
+def cache_control(max_age: int) -> str:
+    # max_age <= 0 => clientul revalidează de fiecare dată (ETag tot economisește body-ul)
+    if max_age <= 0:
+        return "no-cache"
+    return f"private, max-age={int(max_age)}"
+
+
+def apply_validators(response: Response, etag: str, max_age: int,
+                     last_modified: float | datetime | None = None) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control(max_age)
+    if last_modified is not None:
+        response.headers["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def not_modified(etag: str, max_age: int, last_modified: float | datetime | None = None) -> Response:
+    return apply_validators(Response(status_code=304), etag, max_age, last_modified)
+
+
+def seconds_until_boundary(step_seconds: int, now: float | None = None) -> int:
+    """Seconds until the next multiple of `step_seconds` (UTC epoch aligned)."""
+    now = time.time() if now is None else now
+    step = max(1, int(step_seconds))
+    return max(1, int(step - (now % step)))
+
+
+class ValidatorCache:
+    """
+    key -> (etag, fresh_until, last_modified). While fresh, a request presenting the same
+    ETag gets 304 without recomputing anything. Uses the configured cache backend,
+    so validators are shared between workers when the backend is.
+    """
+
+    def __init__(self, namespace: str = "validators", maxsize: int = 4096):
+        self._store = make_cache(namespace, ttl_seconds=86400, maxsize=maxsize)
+
+    def fresh(self, key: str, now: float | None = None) -> Optional[Tuple[str, int, float | None]]:
+        item = self._store.get(key)
+        if item is None:
+            return None
+        etag, fresh_until, last_modified = item
+        now = time.time() if now is None else now
+        if now >= fresh_until:
+            return None
+        return etag, int(fresh_until - now), last_modified
+
+    def remember(self, key: str, etag: str, max_age: int, last_modified: float | None = None):
+        self._store.set(key, (etag, time.time() + max(0, max_age), last_modified))
+
+    def clear(self):
+        self._store.clear()
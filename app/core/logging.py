@@ -1,12 +1,64 @@
 from __future__ import annotations
-import sys, logging
-from typing import Optional
+
+"""
+Logging (loguru) for dev and production
+- Dev (default): coloured text to stdout, written synchronously
+- Production: LOG_ENQUEUE=true => the sink writes from a background thread fed by a queue
+  (the request path only enqueues); LOG_JSON=true => one JSON object per line
+- LOG_SAMPLE_PER_SITE: at most N debug/info records per second per call site (file:line);
+  warnings and errors are never dropped; the next kept record carries the dropped count
+- Level guard: enabled(level) and the std-logging bridge skip building messages for
+  records below the configured level; the hot-path debug sites in market_data
+  (quotes, _fetch_history, get_history_many_columns) check enabled("DEBUG") first
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, Optional, TextIO, Tuple
+
 from loguru import logger as _logger
 from app.core.config import settings
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:  # pragma: no cover
+    orjson = None
+    HAS_ORJSON = False
+
+_TEXT_FORMAT = ("<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
+                "<level>{level: <8}</level> | "
+                "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
+                "<level>{message}</level>")
+_WARNING_NO = 30
+
+# pragul curent (numeric), setat de setup_logging; citit fără lock pe calea caldă
+_min_level_no = 20
+
+
+def _normalize_level(value: Optional[str]) -> str:
+    if not value:
+        return "INFO"
+    return str(value).upper()
+
+
+def enabled(level: str) -> bool:
+    """Cheap check before building an expensive log message."""
+    try:
+        return _logger.level(level).no >= _min_level_no
+    except ValueError:
+        return True
+
+
 # Intercept std logging (uvicorn, fastapi) -> loguru
 class InterceptHandler(logging.Handler):
     def emit(self, record: logging.LogRecord) -> None:
+        if record.levelno < _min_level_no:
+            return  # nici mesajul, nici căutarea în stivă pentru nivele oprite
         try:
             level = _logger.level(record.levelname).name
         except Exception:
@@ -17,28 +69,83 @@ class InterceptHandler(logging.Handler):
             depth += 1
         _logger.opt(depth=depth, exception=record.exc_info).log(level, record.getMessage())
 
-def _normalize_level(value: Optional[str]) -> str:
-    if not value:
-        return "INFO"
-    return str(value).upper()
 
-def setup_logging():
+class SiteSampler:
+    """Token bucket per call site for records below WARNING (loguru `filter`)."""
+
+    def __init__(self, per_second: float, burst: float | None = None):
+        self.rate = float(per_second)
+        self.burst = float(burst if burst is not None else max(1.0, per_second))
+        self._sites: Dict[Tuple[str, int], list] = {}  # site -> [tokens, last_ts, dropped]
+        self._lock = threading.Lock()
+
+    def __call__(self, record) -> bool:
+        if record["level"].no >= _WARNING_NO:
+            return True
+        key = (record["name"], record["line"])
+        now = time.monotonic()
+        with self._lock:
+            s = self._sites.get(key)
+            if s is None:
+                s = self._sites[key] = [self.burst, now, 0]
+            s[0] = min(self.burst, s[0] + (now - s[1]) * self.rate)
+            s[1] = now
+            if s[0] < 1.0:
+                s[2] += 1
+                return False
+            s[0] -= 1.0
+            dropped, s[2] = s[2], 0
+        if dropped:
+            record["extra"]["sampled_dropped"] = dropped
+        return True
+
+
+def _json_line(record) -> str:
+    doc = {
+        "ts": record["time"].isoformat(),
+        "level": record["level"].name,
+        "logger": record["name"],
+        "fn": record["function"],
+        "line": record["line"],
+        "msg": record["message"],
+    }
+    extra = {k: v for k, v in record["extra"].items() if k != "_json"}
+    if extra:
+        doc["extra"] = extra
+    if record["exception"] is not None:
+        doc["exc"] = "".join(traceback.format_exception(*record["exception"]))
+    if HAS_ORJSON:
+        return orjson.dumps(doc, default=str).decode()
+    return json.dumps(doc, default=str, ensure_ascii=False)
+
+
+def _json_format(record) -> str:
+    # loguru aplică format() pe șablon: JSON-ul stă în extra, nu în șablon (acolade)
+    record["extra"]["_json"] = _json_line(record)
+    return "{extra[_json]}\n"
+
+
+def setup_logging(level: str | None = None, json_format: bool | None = None, enqueue: bool | None = None,
+                  sample_per_site: float | None = None, sink: TextIO | None = None):
+    global _min_level_no
     # clean default handlers
     _logger.remove()
 
-    level = _normalize_level(getattr(settings, "log_level", None))
+    level = _normalize_level(level or getattr(settings, "log_level", None))
+    json_format = settings.log_json if json_format is None else json_format
+    enqueue = settings.log_enqueue if enqueue is None else enqueue
+    rate = settings.log_sample_per_site if sample_per_site is None else sample_per_site
+    _min_level_no = _logger.level(level).no
 
-    # console sink
     _logger.add(
-        sys.stdout,
+        sink or sys.stdout,
         level=level,
         backtrace=False,
         diagnose=False,
-        enqueue=False,  # poți schimba pe True în producție
-        format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
-               "<level>{level: <8}</level> | "
-               "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-               "<level>{message}</level>",
+        enqueue=enqueue,  # True în producție: scrierea iese de pe calea request-ului
+        filter=SiteSampler(rate) if rate and rate > 0 else None,
+        format=_json_format if json_format else _TEXT_FORMAT,
+        colorize=False if json_format else None,
     )
 
     # redirect std logging to loguru
@@ -49,4 +156,5 @@ def setup_logging():
 
     return _logger
 
+
 logger = setup_logging()
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+"""
+Lightweight Prometheus-style metrics (no client library)
+- Counter / Gauge / Histogram with label values
+- Negligible overhead when disabled (METRICS_ENABLED=false): every op returns immediately
+- render() -> Prometheus text exposition format (served at /metrics)
+- MetricsMiddleware: per-route latency histogram (route template, not raw path)
+Values are per process; with several uvicorn workers each one exposes its own.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from app.core.config import settings
+
+_enabled: bool = bool(settings.metrics_enabled)
+_REGISTRY: List["_Metric"] = []
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def set_enabled(value: bool) -> None:
+    global _enabled
+    _enabled = bool(value)
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames: Tuple[str, ...] = tuple(labelnames)
+        self._lock = threading.Lock()
+        _REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not _enabled:
+            return
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self):
+        return [f"{self.name}{_fmt_labels(self.labelnames, k)} {_fmt_value(v)}"
+                for k, v in sorted(self._values.items())]
+
+    def clear(self):
+        self._values.clear()
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        if not _enabled:
+            return
+        k = self._key(labels)
+        with self._lock:
+            self._values[k] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        # key -> [bucket counts..., overflow (+Inf), sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        if not _enabled:
+            return
+        k = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(k)
+            if row is None:
+                row = self._values[k] = [0.0] * (len(self.buckets) + 3)
+            row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def time(self, **labels):
+        """`with H.time(provider="yahoo"):` — no-op context when metrics are disabled."""
+        if not _enabled:
+            return nullcontext()
+        return _timer(self, labels)
+
+    def count(self, **labels) -> float:
+        row = self._values.get(self._key(labels))
+        return row[-1] if row else 0.0
+
+    def samples(self):
+        out = []
+        for k, row in sorted(self._values.items()):
+            acc = 0.0
+            for b, c in zip(self.buckets + (float("inf"),), row):
+                acc += c
+                le = 'le="%s"' % _fmt_value(b)
+                out.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le)} {_fmt_value(acc)}")
+            labels = _fmt_labels(self.labelnames, k)
+            out.append(f"{self.name}_sum{labels} {_fmt_value(row[-2])}")
+            out.append(f"{self.name}_count{labels} {_fmt_value(row[-1])}")
+        return out
+
+    def clear(self):
+        self._values.clear()
+
+
+@contextmanager
+def _timer(h: Histogram, labels: Dict[str, str]):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        h.observe(time.perf_counter() - t0, **labels)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _REGISTRY:
+        lines.append(f"# HELP {m.name} {m.help}")
+        lines.append(f"# TYPE {m.name} {m.kind}")
+        with m._lock:
+            lines.extend(m.samples())
+    return "\n".join(lines) + "\n"
+
+
+def reset() -> None:
+    for m in _REGISTRY:
+        m.clear()
+
+
+# ---------------------------
+# Metrics used across the app
+# ---------------------------
+
+HTTP_LATENCY = Histogram("http_request_duration_seconds", "HTTP request latency by route template.",
+                         ["method", "route", "status"])
+PROVIDER_LATENCY = Histogram("market_provider_latency_seconds", "Market provider call latency.",
+                             ["provider", "op", "outcome"])
+PROVIDER_UPSTREAM = Counter("market_provider_upstream_requests_total",
+                            "Upstream requests made by providers (incl. retries/fallbacks).",
+                            ["provider", "endpoint", "outcome"])
+CACHE_REQUESTS = Counter("cache_requests_total", "Cache lookups by cache and result.", ["cache", "result"])
+HISTORY_ATTEMPTS = Counter("market_history_attempts_total",
+                           "get_history attempts per provider (1=requested period, 2=broadened).",
+                           ["provider", "attempt", "outcome"])
+MODEL_LOAD_SECONDS = Histogram("ml_model_load_seconds", "joblib.load time for model artifacts.")
+FEATURES_SECONDS = Histogram("ml_features_seconds", "add_indicators time.", ["stage"])
+INFERENCE_SECONDS = Histogram("ml_inference_seconds", "predict_from_candles total time.")
+TRAIN_SECONDS = Histogram("ml_train_seconds", "train_on_dataframe duration.",
+                          buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+MODEL_QUALITY = Gauge("ml_model_quality", "Model quality (test/online): brier, ece, auc, accuracy, ...",
+                      ["ticker", "horizon", "metric", "source"])
+DB_QUERY_SECONDS = Histogram("db_query_seconds", "SQL statement execution time.", ["op"])
+FEATURE_DRIFT = Gauge("ml_feature_drift_psi", "PSI of live vs training feature distribution (last evaluation).",
+                      ["ticker", "horizon_days", "feature"])
+
+
+def record_model_quality(ticker: str, horizon_days: int, source: str = "test", **metrics: float) -> None:
+    """Set model-quality gauges, ex: record_model_quality("AAPL", 7, source="online", brier=0.21, ece=0.03)."""
+    for name, value in metrics.items():
+        if value is None or value != value:  # NaN
+            continue
+        MODEL_QUALITY.set(value, ticker=ticker.upper(), horizon=str(horizon_days), metric=name, source=source)
+
+
+# ---------------------------
+# ASGI middleware
+# ---------------------------
+
+class MetricsMiddleware:
+    """
+    Pure ASGI (no BaseHTTPMiddleware overhead). Labels use the matched route template
+    (ex: /api/predictions/{ticker}) so cardinality stays bounded. SSE streams are skipped.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _enabled:
+            await self.app(scope, receive, send)
+            return
+
+        t0 = time.perf_counter()
+        state = {"status": 500, "stream": False}
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                for k, v in message.get("headers", []):
+                    if k == b"content-type" and v.startswith(b"text/event-stream"):
+                        state["stream"] = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            if not state["stream"]:
+                route = scope.get("route")
+                path = getattr(route, "path", None) or "<unmatched>"
+                HTTP_LATENCY.observe(time.perf_counter() - t0, method=scope.get("method", ""),
+                                     route=path, status=str(state["status"]))
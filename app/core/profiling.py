@@ -0,0 +1,382 @@
+from __future__ import annotations
+
+"""
+On-demand request profiling (offline, no external APM)
+- Triggers: `X-Profile: 1` header or `?profile=1` from an allowed client, or 1 in N requests
+- Statistical CPU profile: a sampler thread walks sys._current_frames() every few ms, so it
+  also sees sync endpoints running in the threadpool (cProfile only sees its own thread)
+- Memory: tracemalloc snapshot diff (top allocation sites by line) + peak for the request
+- Output: one JSON per request in PROFILING_DIR (folded stacks are flamegraph/speedscope ready);
+  oldest files are pruned past PROFILING_MAX_BYTES
+- At most one profiled request at a time; everything is a no-op when PROFILING_ENABLED=false
+- SSE streams are never profiled: skipped up front (stream path / Accept: text/event-stream),
+  and if a response still turns out to be a stream, profiling stops at its first message
+- Scope: both the CPU samples and the memory diff are process-wide (every thread, every
+  allocation), not filtered to the request: the threadpool thread that runs a sync endpoint is
+  not known up front. Profiles say so ("scope": "process") and split CPU samples per thread,
+  marking the thread that served the request's ASGI call; read them on an otherwise idle
+  process for clean attribution
+"""
+
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import logger
+
+_MAX_DEPTH = 64
+_MAX_FOLDED = 500
+_TOP = 30
+_ID_RE = re.compile(r"^[0-9A-Za-z_-]{1,64}$")
+_STREAM_PATHS = ("/api/market/stream",)
+
+# Frame-uri "în așteptare" (thread idle în pool / event loop în select) nu sunt timp CPU util
+_IDLE_LEAVES = {"wait", "select", "poll", "epoll", "_worker", "get", "accept", "sleep"}
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", "thread.py", "socket.py")
+
+_CWD = os.getcwd() + os.sep
+_busy = threading.Lock()
+_counter = itertools.count(1)
+
+
+def _allowed_clients() -> set:
+    return {c.strip() for c in (settings.profiling_allowed_clients or "").split(",") if c.strip()}
+
+
+def client_allowed(host: Optional[str]) -> bool:
+    allowed = _allowed_clients()
+    return "*" in allowed or (host is not None and host in allowed)
+
+
+def _short(filename: str) -> str:
+    # căi relative la repo pentru codul nostru, doar ultimele componente pentru librării
+    if filename.startswith(_CWD):
+        return filename[len(_CWD):]
+    parts = filename.replace("\\", "/").split("/")
+    return "/".join(parts[-2:])
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _thread_name(tid: int) -> str:
+    for t in threading.enumerate():
+        if t.ident == tid:
+            return t.name
+    return str(tid)
+
+
+class StackSampler(threading.Thread):
+    """Counts folded stacks of every other thread (process-wide) at a fixed interval."""
+
+    def __init__(self, interval_seconds: float, request_thread: Optional[int] = None):
+        super().__init__(name="profile-sampler", daemon=True)
+        self.interval = max(0.0005, float(interval_seconds))
+        self.stacks: Counter = Counter()
+        self.per_thread: Counter = Counter()  # tid -> sample-uri non-idle
+        self.names: Dict[int, str] = {}
+        self.request_thread = request_thread
+        self.ticks = 0
+        self._halt = threading.Event()
+
+    def run(self):
+        me = threading.get_ident()
+        while not self._halt.wait(self.interval):
+            self.ticks += 1
+            for tid, frame in sys._current_frames().items():
+                if tid == me:
+                    continue
+                leaf = frame.f_code
+                if leaf.co_name in _IDLE_LEAVES and leaf.co_filename.endswith(_IDLE_FILES):
+                    continue
+                labels: List[str] = []
+                f = frame
+                while f is not None and len(labels) < _MAX_DEPTH:
+                    labels.append(_frame_label(f.f_code))
+                    f = f.f_back
+                self.stacks[";".join(reversed(labels))] += 1
+                self.per_thread[tid] += 1
+                if tid not in self.names:
+                    self.names[tid] = _thread_name(tid)
+
+    def cancel(self) -> None:
+        self._halt.set()  # fără join / rezumat: rezultatul se aruncă
+
+    def stop(self) -> Dict:
+        self._halt.set()
+        self.join(timeout=1.0)
+        out = summarize_stacks(self.stacks, self.ticks, self.interval)
+        out["scope"] = "process"
+        out["threads"] = [
+            {"thread": self.names.get(tid, str(tid)), "samples": n, "request_thread": tid == self.request_thread}
+            for tid, n in self.per_thread.most_common()
+        ]
+        return out
+
+
+def summarize_stacks(stacks: Counter, ticks: int, interval: float) -> Dict:
+    self_counts: Counter = Counter()
+    incl_counts: Counter = Counter()
+    for stack, n in stacks.items():
+        frames = stack.split(";")
+        self_counts[frames[-1]] += n
+        for fr in set(frames):
+            incl_counts[fr] += n
+    return {
+        "interval_ms": round(interval * 1000, 3),
+        "ticks": ticks,
+        "samples": int(sum(stacks.values())),
+        "top_self": [{"frame": k, "samples": v} for k, v in self_counts.most_common(_TOP)],
+        "top_inclusive": [{"frame": k, "samples": v} for k, v in incl_counts.most_common(_TOP)],
+        "folded": [[k, v] for k, v in stacks.most_common(_MAX_FOLDED)],
+    }
+
+
+class MemoryDiff:
+    """
+    tracemalloc before/after; tracing is started only for the profiled request. tracemalloc
+    sees every thread's allocations, so the diff is process-wide over the request's window.
+    """
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self._started = False
+        self._before = None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started = True
+        tracemalloc.reset_peak()
+        self._before = tracemalloc.take_snapshot()
+
+    def cancel(self) -> None:
+        if self._started:
+            tracemalloc.stop()
+            self._started = False
+
+    def stop(self) -> Dict:
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if self._started:
+            tracemalloc.stop()
+        flt = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        diff = after.filter_traces(flt).compare_to(self._before.filter_traces(flt), "lineno")
+        return {
+            "scope": "process",
+            "peak_bytes": int(peak),
+            "net_bytes": int(sum(d.size_diff for d in diff)),
+            "top": [
+                {"where": f"{_short(d.traceback[0].filename)}:{d.traceback[0].lineno}",
+                 "size_diff": int(d.size_diff), "count_diff": int(d.count_diff)}
+                for d in diff[:_TOP] if d.size_diff
+            ],
+        }
+
+
+# ---------------------------
+# Storage
+# ---------------------------
+
+def profiles_dir() -> str:
+    return settings.profiling_dir
+
+
+def _path(profile_id: str) -> Optional[str]:
+    if not _ID_RE.match(profile_id or ""):
+        return None
+    return os.path.join(profiles_dir(), f"{profile_id}.json")
+
+
+def save_profile(profile_id: str, data: Dict) -> str:
+    os.makedirs(profiles_dir(), exist_ok=True)
+    path = _path(profile_id)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+    prune(settings.profiling_max_bytes)
+    return path
+
+
+def prune(max_bytes: int) -> int:
+    """Delete oldest profiles until the directory fits in max_bytes. Returns files removed."""
+    d = profiles_dir()
+    if not os.path.isdir(d):
+        return 0
+    files: List[Tuple[float, int, str]] = []
+    for name in os.listdir(d):
+        if name.endswith(".json"):
+            p = os.path.join(d, name)
+            st = os.stat(p)
+            files.append((st.st_mtime, st.st_size, p))
+    files.sort()
+    total = sum(s for _, s, _ in files)
+    removed = 0
+    for _, size, p in files:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(p)
+        except OSError:
+            continue
+        total -= size
+        removed += 1
+    return removed
+
+
+def list_profiles() -> List[Dict]:
+    d = profiles_dir()
+    if not os.path.isdir(d):
+        return []
+    out = []
+    for name in os.listdir(d):
+        if not name.endswith(".json"):
+            continue
+        p = os.path.join(d, name)
+        try:
+            with open(p, encoding="utf-8") as f:
+                meta = json.load(f).get("request", {})
+        except (OSError, ValueError):
+            continue
+        out.append({"id": name[:-5], "bytes": os.path.getsize(p), **meta})
+    out.sort(key=lambda r: r.get("started_at", ""), reverse=True)
+    return out
+
+
+def load_profile(profile_id: str) -> Optional[Dict]:
+    path = _path(profile_id)
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+# ---------------------------
+# ASGI middleware
+# ---------------------------
+
+def _is_stream(scope) -> bool:
+    if scope.get("path", "") in _STREAM_PATHS:
+        return True
+    return any(k == b"accept" and b"text/event-stream" in v for k, v in scope.get("headers", []))
+
+
+def _requested(scope) -> bool:
+    for k, v in scope.get("headers", []):
+        if k == b"x-profile":
+            return v.strip().lower() in (b"1", b"true", b"yes")
+    qs = scope.get("query_string", b"")
+    return b"profile=1" in qs.split(b"&")
+
+
+def should_profile(scope) -> Optional[str]:
+    """Trigger reason ("explicit" | "sampled") or None."""
+    if not settings.profiling_enabled:
+        return None
+    client = (scope.get("client") or (None,))[0]
+    if _requested(scope) and client_allowed(client):
+        return "explicit"
+    n = int(settings.profiling_sample_rate or 0)
+    if n > 0 and next(_counter) % n == 0:
+        return "sampled"
+    return None
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI. Adds `X-Profile-Id` to profiled responses; fetch the result from
+    /api/profiles/{id}. SSE responses are not profiled (the stream never "ends").
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.profiling_enabled or _is_stream(scope):
+            # SSE: ar ține samplerul, tracemalloc și _busy cât trăiește stream-ul, pentru nimic
+            await self.app(scope, receive, send)
+            return
+        reason = should_profile(scope)
+        if reason is None or scope.get("path", "").startswith("/api/profiles"):
+            await self.app(scope, receive, send)
+            return
+        if not _busy.acquire(blocking=False):
+            # deja se profilează alt request; nu suprapunem (overhead și rezultate amestecate)
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S") + "-" + uuid.uuid4().hex[:8]
+        state = {"status": 500, "stream": False, "released": False}
+        sampler = StackSampler(settings.profiling_interval_ms / 1000.0, request_thread=threading.get_ident())
+        mem = MemoryDiff()
+        started_at = datetime.now(timezone.utc).isoformat()
+        try:
+            mem.start()
+            sampler.start()
+        except Exception:
+            _busy.release()
+            raise
+        t0 = time.perf_counter()
+
+        def _abandon():
+            # stream nedetectat din request: oprim tot imediat, nu la finalul stream-ului
+            state["released"] = True
+            sampler.cancel()
+            mem.cancel()
+            _busy.release()
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+                headers = list(message.get("headers", []))
+                for k, v in headers:
+                    if k == b"content-type" and v.startswith(b"text/event-stream"):
+                        state["stream"] = True
+                if state["stream"]:
+                    _abandon()
+                else:
+                    headers.append((b"x-profile-id", profile_id.encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            if not state["released"]:
+                self._finish(scope, profile_id, reason, started_at, t0, state, sampler, mem)
+
+    @staticmethod
+    def _finish(scope, profile_id: str, reason: str, started_at: str, t0: float, state: Dict,
+                sampler: StackSampler, mem: MemoryDiff) -> None:
+        wall = time.perf_counter() - t0
+        try:
+            cpu = sampler.stop()
+            memory = mem.stop()
+            save_profile(profile_id, {
+                "request": {
+                    "method": scope.get("method"), "path": scope.get("path"),
+                    "query": scope.get("query_string", b"").decode("latin-1"),
+                    "status": state["status"], "reason": reason,
+                    "started_at": started_at, "wall_ms": round(wall * 1000, 3),
+                },
+                "cpu": cpu,
+                "memory": memory,
+            })
+            logger.info("Profile {} saved ({} {} {:.1f} ms)", profile_id,
+                        scope.get("method"), scope.get("path"), wall * 1000)
+        except Exception as e:
+            logger.warning("Profiling failed for {}: {}", scope.get("path"), e)
+        finally:
+            _busy.release()
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+"""
+Fast response encoding for array-heavy payloads.
+- orjson (if installed) with native NumPy serialization; stdlib json fallback
+- .npy binary for Python/NumPy clients
+"""
+
+import io
+import json
+from typing import Any, Dict
+
+import numpy as np
+from starlette.responses import Response
+
+try:
+    import orjson
+    HAS_ORJSON = True
+except Exception:
+    orjson = None  # type: ignore
+    HAS_ORJSON = False
+
+
+def _default(obj: Any):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> bytes:
+    if HAS_ORJSON:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(obj, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """JSONResponse without pydantic/jsonable_encoder; accepts NumPy arrays as values."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+NPY_MEDIA_TYPE = "application/x-npy"
+
+
+def npy_bytes(columns: Dict[str, np.ndarray]) -> bytes:
+    """
+    Columns -> one structured array in .npy format (np.load(io.BytesIO(body)) on the client).
+    """
+    n = len(next(iter(columns.values()))) if columns else 0
+    rec = np.empty(n, dtype=[(k, v.dtype) for k, v in columns.items()])
+    for k, v in columns.items():
+        rec[k] = v
+    buf = io.BytesIO()
+    np.save(buf, rec, allow_pickle=False)
+    return buf.getvalue()
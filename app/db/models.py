@@ -1 +1,19 @@
-# TODO: models will be added here
+from __future__ import annotations
+from sqlalchemy import Float, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.db.base import Base
+
+
+class ShardLease(Base):
+    """
+    Time-bound ownership records for universe sharding (app/services/sharding.py).
+    key "worker:<id>" = membership heartbeat, key "shard:<n>" = owner of logical shard n.
+    """
+    __tablename__ = "shard_leases"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    owner: Mapped[str] = mapped_column(String(128), index=True)
+    owner_url: Mapped[str | None] = mapped_column(String(256), nullable=True)
+    expires_at: Mapped[float] = mapped_column(Float, index=True)  # epoch secunde; expirat => preluabil
+    version: Mapped[int] = mapped_column(Integer, default=0)  # crește la fiecare schimbare de owner (fencing)
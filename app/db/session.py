@@ -1,8 +1,10 @@
 from __future__ import annotations
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from app.core.config import settings
+from app.core.metrics import DB_QUERY_SECONDS
 
 # 1) Rezolvăm URL-ul din .env
 DATABASE_URL = settings.database_url  # ex: "sqlite:///./data/app.db"
@@ -33,8 +35,42 @@ SessionLocal = sessionmaker(
     future=True,
 )
 
-# 4) Dependency FastAPI
+# Timpul per statement SQL (op = primul cuvânt: SELECT / INSERT / ...), pentru /metrics
+@event.listens_for(engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_t0", []).append(time.perf_counter())
+
+@event.listens_for(engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stack = conn.info.get("query_t0")
+    if not stack:
+        return
+    op = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "?"
+    DB_QUERY_SECONDS.observe(time.perf_counter() - stack.pop(), op=op)
+
+# Statement eșuat: after_cursor_execute nu mai rulează => scoatem t0 ca stiva să nu crească
+@event.listens_for(engine, "handle_error")
+def _handle_error(context):
+    conn = context.connection
+    stack = conn.info.get("query_t0") if conn is not None else None
+    if stack:
+        stack.pop()
+
+# 4) Schema: create_all o singură dată per proces (dezactivabil în producție, unde rulează alembic)
+_schema_ready = False
+
+def ensure_schema() -> None:
+    global _schema_ready
+    if _schema_ready or not settings.db_create_all:
+        return
+    from app.db.base import Base
+    import app.db.models  # noqa: F401  (înregistrează tabelele în Base.metadata)
+    Base.metadata.create_all(bind=engine)
+    _schema_ready = True
+
+# 5) Dependency FastAPI
 def get_db():
+    ensure_schema()
     db = SessionLocal()
     try:
         yield db
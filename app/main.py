@@ -1,3 +1,6 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse
@@ -6,19 +9,67 @@ from starlette.requests import Request
 
 from app.core.config import settings
 from app.core.logging import logger
-from app.db.session import engine
-from app.db.base import Base
+from app.core.metrics import MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware
+from app.services.sharding import ShardRoutingMiddleware
+from app.db.session import ensure_schema
 
 from app.api.routes.health import router as health_router
 from app.api.routes.predictions import router as predictions_router
 from app.api.routes.market import router as market_router
 from app.api.routes.ml import router as ml_router
 from app.api.routes.universe import router as universe_router
+from app.api.routes.metrics import router as metrics_router
+from app.api.routes.profiles import router as profiles_router
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Lucrul greu de la pornire stă aici, nu la importul modulului
+    from app.services.market_data import init_providers
 
+    ensure_schema()          # no-op dacă DB_CREATE_ALL=false
+    init_providers()
+    if settings.preload_ml:
+        import app.ml.pipeline.train_baseline  # noqa: F401
+        import app.ml.pipeline.infer_service   # noqa: F401
+    from app.services.sharding import heartbeat_loop, init_sharding
+    coord = init_sharding()  # no-op dacă SHARD_ENABLED=false
+    shard_task = asyncio.create_task(heartbeat_loop(coord)) if coord is not None else None
+    bars_task = None
+    if settings.bars_enabled:
+        from app.services.bar_aggregator import feed_loop
+        bars_task = asyncio.create_task(feed_loop())
+    retrain_task = None
+    if settings.drift_retrain_interval_seconds > 0:
+        from app.services.ml_integration import drift_retrain_loop
+        retrain_task = asyncio.create_task(drift_retrain_loop(settings.drift_retrain_interval_seconds))
+    policy_task = None
+    if settings.policy_refresh_interval_seconds > 0:
+        from app.services.ml_integration import policy_refresh_loop
+        policy_task = asyncio.create_task(policy_refresh_loop(settings.policy_refresh_interval_seconds))
+    shap_task = None
+    if settings.shap_report_interval_seconds > 0:
+        from app.services.ml_integration import shap_report_loop
+        shap_task = asyncio.create_task(shap_report_loop(settings.shap_report_interval_seconds))
+    yield
+    if shap_task is not None:
+        shap_task.cancel()
+    if policy_task is not None:
+        policy_task.cancel()
+    if retrain_task is not None:
+        retrain_task.cancel()
+    if bars_task is not None:
+        bars_task.cancel()
+    await logger.complete()  # golește coada sink-ului (LOG_ENQUEUE=true)
+    if shard_task is not None:
+        shard_task.cancel()
 
-Base.metadata.create_all(bind=engine)
 
-app = FastAPI(title=settings.app_name)
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app.add_middleware(ShardRoutingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 # Static & templates
 app.mount("/static", StaticFiles(directory="app/ui/static"), name="static")
@@ -51,6 +102,8 @@ app.include_router(predictions_router)
 app.include_router(market_router)
 app.include_router(universe_router)
 app.include_router(ml_router)
+app.include_router(metrics_router)
+app.include_router(profiles_router)
 
 
 logger.info("UI loaded (enterprise layout).")
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+"""
+Split-conformal intervals for the return regressor
+- Built once at training time from |y - ŷ| on the calibration (validation) split
+- Optional volatility binning (ATR %): calm and volatile regimes get their own residual sets
+- Stored as one .npz: bin edges + all sorted residuals concatenated + per-bin offsets
+- Inference: bin = searchsorted(edges, vol) (O(log bins)), half-width = the
+  ceil((n+1)·coverage)-th smallest residual of that bin (O(1) on the sorted array);
+  any coverage level, no extra model fits
+"""
+
+import math
+import os
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+
+
+@dataclass
+class ConformalIndex:
+    edges: np.ndarray      # (B-1,) limitele binurilor de volatilitate; gol => un singur bin
+    values: np.ndarray     # reziduuri absolute sortate, concatenate pe binuri
+    offsets: np.ndarray    # (B+1,) bin b = values[offsets[b]:offsets[b+1]]
+
+    @property
+    def n_bins(self) -> int:
+        return len(self.offsets) - 1
+
+    def bin_of(self, vol: Optional[float]) -> int:
+        if self.edges.size == 0:
+            return 0
+        if vol is None or not np.isfinite(vol):
+            return self.n_bins - 1  # volatilitate necunoscută => binul cel mai volatil (conservator)
+        return int(np.searchsorted(self.edges, vol, side="right"))
+
+    def halfwidth(self, coverage: float, vol: Optional[float] = None) -> float:
+        """Interval half-width with >= `coverage` marginal coverage (split conformal)."""
+        if not 0.0 < coverage < 1.0:
+            raise ValueError("coverage must be in (0, 1)")
+        b = self.bin_of(vol)
+        res = self.values[self.offsets[b]:self.offsets[b + 1]]
+        n = res.size
+        k = math.ceil((n + 1) * coverage) - 1
+        # prea puține reziduuri pentru nivelul cerut => cel mai mare (interval conservator)
+        return float(res[min(max(k, 0), n - 1)])
+
+    def bands(self, point: float, vol: Optional[float] = None,
+              levels: Iterable[float] = (0.1, 0.5, 0.9)) -> Dict[str, float]:
+        """
+        Quantile-style bands around the point forecast: level p < 0.5 => point - w(1 - 2p),
+        p > 0.5 => point + w(2p - 1), p = 0.5 => point (symmetric absolute residuals).
+        """
+        out = {}
+        for p in levels:
+            name = f"q{int(round(p * 100)):02d}"
+            if abs(p - 0.5) < 1e-9:
+                out[name] = point
+            else:
+                w = self.halfwidth(abs(2 * p - 1), vol)
+                out[name] = point - w if p < 0.5 else point + w
+        return out
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, edges=self.edges, values=self.values, offsets=self.offsets)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "ConformalIndex":
+        with np.load(path) as z:
+            return cls(edges=z["edges"], values=z["values"], offsets=z["offsets"])
+
+
+def build_conformal_index(y_true: np.ndarray, y_pred: np.ndarray, vol: Optional[np.ndarray] = None,
+                          max_bins: int = 3, min_per_bin: int = 60) -> ConformalIndex:
+    """Sorted |y - ŷ| per volatility bin (equal-count bins, each with >= min_per_bin residuals)."""
+    res = np.abs(np.asarray(y_true, dtype=np.float64) - np.asarray(y_pred, dtype=np.float64))
+    ok = np.isfinite(res)
+    if vol is not None:
+        vol = np.asarray(vol, dtype=np.float64)
+        ok &= np.isfinite(vol)
+    res = res[ok]
+    if res.size == 0:
+        raise ValueError("No finite calibration residuals.")
+
+    n_bins = max(1, min(int(max_bins), res.size // max(1, min_per_bin))) if vol is not None else 1
+    if n_bins == 1:
+        return ConformalIndex(edges=np.empty(0), values=np.sort(res), offsets=np.array([0, res.size]))
+
+    v = vol[ok]
+    edges = np.quantile(v, np.linspace(0, 1, n_bins + 1)[1:-1])
+    bins = np.searchsorted(edges, v, side="right")
+    parts: List[np.ndarray] = [np.sort(res[bins == b]) for b in range(n_bins)]
+    offsets = np.concatenate(([0], np.cumsum([p.size for p in parts])))
+    return ConformalIndex(edges=edges, values=np.concatenate(parts), offsets=offsets)
+
+
+def empirical_coverage(index: ConformalIndex, y_true: np.ndarray, y_pred: np.ndarray,
+                       vol: Optional[np.ndarray], coverage: float) -> float:
+    """Share of (y, ŷ) pairs whose |y - ŷ| falls inside the interval (held-out check)."""
+    y_true, y_pred = np.asarray(y_true, dtype=np.float64), np.asarray(y_pred, dtype=np.float64)
+    if y_true.size == 0:
+        return float("nan")
+    vols = np.full(y_true.size, np.nan) if vol is None else np.asarray(vol, dtype=np.float64)
+    widths = np.array([index.halfwidth(coverage, v) for v in vols])
+    return float(np.mean(np.abs(y_true - y_pred) <= widths))
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+"""
+Standalone probability calibration (separate from the pickled classifier)
+- Isotonic: breakpoints (x, y), evaluated with np.interp (searchsorted + linear piece)
+- Platt: p = sigmoid(a * logit(raw) + b), two floats, vectorized
+- Artifact: calib_{TICKER}_{h}d.json, a few hundred bytes, written atomically (tmp + os.replace)
+- Fitted on the classifier's raw P(up): at training time on the validation split,
+  online on a recent window of resolved predictions (milliseconds, base model untouched)
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import numpy as np
+
+_P_CLIP = 1e-6
+
+
+@dataclass
+class Calibrator:
+    method: str                      # "isotonic" | "platt"
+    x: List[float] = field(default_factory=list)  # isotonic: praguri crescătoare în probabilitatea brută
+    y: List[float] = field(default_factory=list)  # isotonic: probabilitatea calibrată la fiecare prag
+    a: float = 1.0                   # platt
+    b: float = 0.0                   # platt
+    n: int = 0                       # observații folosite la fit
+    source: str = "train"            # train | online
+    fitted_at: float = 0.0
+
+    def predict(self, raw: np.ndarray) -> np.ndarray:
+        raw = np.asarray(raw, dtype=np.float64)
+        if self.method == "isotonic":
+            return np.interp(raw, self.x, self.y)  # în afara intervalului => capetele (clip)
+        z = self.a * _logit(raw) + self.b
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def to_dict(self) -> Dict:
+        d = {"method": self.method, "n": self.n, "source": self.source, "fitted_at": self.fitted_at}
+        if self.method == "isotonic":
+            d.update(x=self.x, y=self.y)
+        else:
+            d.update(a=self.a, b=self.b)
+        return d
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "Calibrator":
+        return cls(method=d["method"], x=list(d.get("x", [])), y=list(d.get("y", [])),
+                   a=float(d.get("a", 1.0)), b=float(d.get("b", 0.0)), n=int(d.get("n", 0)),
+                   source=d.get("source", "train"), fitted_at=float(d.get("fitted_at", 0.0)))
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Calibrator":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, _P_CLIP, 1 - _P_CLIP)
+    return np.log(p / (1 - p))
+
+
+def fit_isotonic(raw: np.ndarray, y: np.ndarray) -> Calibrator:
+    """
+    Pool-adjacent-violators on (raw, y) sorted by raw; keeps only block boundaries.
+    Tied raw scores are pooled first (one point per unique score, weighted mean of y), as
+    sklearn's IsotonicRegression does: the fit must not depend on the order of ties.
+    """
+    raw = np.asarray(raw, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    xu, inv = np.unique(raw, return_inverse=True)
+    ysum = np.bincount(inv, weights=y, minlength=xu.size)
+    wsum = np.bincount(inv, minlength=xu.size).astype(np.float64)
+    # blocuri: [suma, greutate, x_min, x_max]; stivă PAV
+    sums: List[float] = []
+    weights: List[float] = []
+    lo: List[float] = []
+    hi: List[float] = []
+    for xv, sv, wv in zip(xu.tolist(), ysum.tolist(), wsum.tolist()):
+        sums.append(sv); weights.append(wv); lo.append(xv); hi.append(xv)
+        while len(sums) > 1 and sums[-2] / weights[-2] >= sums[-1] / weights[-1]:
+            s, w, h = sums.pop(), weights.pop(), hi.pop()
+            lo.pop()
+            sums[-1] += s; weights[-1] += w; hi[-1] = h
+    x_pts: List[float] = []
+    y_pts: List[float] = []
+    for s, w, a, b in zip(sums, weights, lo, hi):
+        v = s / w
+        x_pts.append(a); y_pts.append(v)
+        if b > a:
+            x_pts.append(b); y_pts.append(v)
+    return Calibrator("isotonic", x=x_pts, y=y_pts, n=int(raw.size), fitted_at=time.time())
+
+
+def fit_platt(raw: np.ndarray, y: np.ndarray, iters: int = 50, l2: float = 1e-3) -> Calibrator:
+    """Logistic fit on logit(raw) with Newton steps (2 parameters, Platt's smoothed targets)."""
+    s = _logit(np.asarray(raw, dtype=np.float64))
+    y = np.asarray(y, dtype=np.float64)
+    n_pos = float(y.sum())
+    n_neg = float(y.size - n_pos)
+    t = np.where(y > 0.5, (n_pos + 1) / (n_pos + 2), 1 / (n_neg + 2))
+    X = np.column_stack([s, np.ones_like(s)])
+    w = np.array([1.0, 0.0])
+    for _ in range(iters):
+        p = 1.0 / (1.0 + np.exp(-(X @ w)))
+        g = X.T @ (p - t) + l2 * w
+        H = (X * (p * (1 - p))[:, None]).T @ X + l2 * np.eye(2)
+        step = np.linalg.solve(H, g)
+        w -= step
+        if np.max(np.abs(step)) < 1e-9:
+            break
+    return Calibrator("platt", a=float(w[0]), b=float(w[1]), n=int(s.size), fitted_at=time.time())
+
+
+def fit_calibrator(raw: np.ndarray, y: np.ndarray, method: str = "isotonic") -> Calibrator:
+    if method == "isotonic":
+        return fit_isotonic(raw, y)
+    if method in ("platt", "sigmoid"):
+        return fit_platt(raw, y)
+    raise ValueError("method must be 'isotonic' or 'platt'")
+
+
+def expected_calibration_error(p: np.ndarray, y: np.ndarray, bins: int = 10) -> float:
+    """ECE with equal-width bins."""
+    p = np.asarray(p, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if p.size == 0:
+        return float("nan")
+    idx = np.minimum((p * bins).astype(int), bins - 1)
+    gap = np.abs(np.bincount(idx, weights=p, minlength=bins) - np.bincount(idx, weights=y, minlength=bins))
+    return float(gap.sum() / p.size)
+
+
+def calibrator_path(art_dir: str, tag: str) -> str:
+    return os.path.join(art_dir, f"calib_{tag}.json")
@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+"""
+Path-dependent TreeSHAP for the GradientBoosting models (roadmap: SHAP stability & pruning)
+- The ensemble is flattened once into per-leaf arrays (every tree, every leaf): the path's split
+  feature / threshold / direction, the cover ratio of each step and the leaf value x learning rate
+- Per leaf, the path-dependent value function only depends on which of the path's (unique)
+  features the row satisfies: v(S) = value * prod_{d in S} z_d * prod_{d not in S} q_d, with z_d
+  in {0, 1} and q_d the cover ratio. Its Shapley values are precomputed for every z pattern
+  (2^m for m unique features, m <= max_depth) when the explainer is built
+- Explaining a batch: per row and leaf, the z pattern is a bitmask from D vectorized
+  comparisons; the precomputed values are gathered and summed into features with one sparse
+  (slot -> feature) product => no per-row or per-node Python, rows processed in chunks of
+  bounded memory
+- Output in the model's raw space: log-odds for the classifier, % change for the regressor;
+  expected_value + contributions.sum(axis=1) == raw prediction
+"""
+
+from dataclasses import dataclass
+from functools import cached_property
+from math import factorial
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+_CHUNK_CELLS = 1 << 22  # rânduri x frunze per chunk (~32MB de float64 la gather)
+_MAX_PATH_FEATURES = 8  # tiparele z încap într-un uint8; tabelul are 2^m rânduri per frunză
+
+
+def _trees(model) -> List:
+    est = np.asarray(model.estimators_)
+    if est.ndim == 2 and est.shape[1] != 1:
+        raise ValueError("only single-output ensembles (regression / binary classification) are supported")
+    return [e.tree_ for e in est.ravel()]
+
+
+def _raw_predict(model, X: np.ndarray) -> np.ndarray:
+    if hasattr(model, "decision_function"):
+        return np.asarray(model.decision_function(X), dtype=np.float64).ravel()
+    return np.asarray(model.predict(X), dtype=np.float64).ravel()
+
+
+def _leaf_paths(tree):
+    """(leaf value, [(feature, threshold, went_left, missing_left, cover ratio), ...]) per leaf."""
+    left, right = tree.children_left, tree.children_right
+    cover = tree.weighted_n_node_samples
+    missing = getattr(tree, "missing_go_to_left", None)
+    value = tree.value[:, 0, 0]
+    out = []
+    stack = [(0, [])]
+    while stack:
+        node, path = stack.pop()
+        if left[node] == -1:
+            out.append((float(value[node]), path))
+            continue
+        f, thr = int(tree.feature[node]), float(tree.threshold[node])
+        m_left = bool(missing[node]) if missing is not None else False
+        for child, went_left in ((left[node], True), (right[node], False)):
+            step = (f, thr, went_left, m_left, float(cover[child] / cover[node]))
+            stack.append((child, path + [step]))
+    return out
+
+
+def _floor32(thr: np.ndarray) -> np.ndarray:
+    """Largest float32 <= thr: for float32 x, x <= thr (float64, as sklearn compares) <=> x <= floor32."""
+    t32 = thr.astype(np.float32)
+    return np.where(t32.astype(np.float64) > thr, np.nextafter(t32, np.float32(-np.inf)), t32)
+
+
+def _elementary(q: np.ndarray, mask: int, m: int) -> np.ndarray:
+    """Coefficients of prod_{d in mask} (1 + q_d t), per leaf -> (leaves, m + 1)."""
+    e = np.zeros((q.shape[0], m + 1))
+    e[:, 0] = 1.0
+    for d in range(m):
+        if mask >> d & 1:
+            e[:, 1:] = e[:, 1:] + e[:, :-1] * q[:, d:d + 1]
+    return e
+
+
+def _phi_table(q: np.ndarray, value: np.ndarray, m: int) -> np.ndarray:
+    """
+    Shapley values (leaves, 2^m, m) of the leaf games with m unique features, for every
+    pattern z (bit d = row satisfies the path's conditions on feature d).
+    phi_i = value * (z_i - q_i) * sum_{S subset of Z\\{i}} w(|S|) * prod_{d in U\\{i}\\S} q_d
+    """
+    w = np.array([factorial(s) * factorial(m - s - 1) / factorial(m) for s in range(m)])
+    full = (1 << m) - 1
+    out = np.zeros((q.shape[0], 1 << m, m))
+    for z in range(1 << m):
+        for i in range(m):
+            a = z & ~(1 << i)            # trăsăturile satisfăcute, fără i
+            c = full & ~z & ~(1 << i)    # nesatisfăcute, fără i: intră mereu cu q
+            e = _elementary(q, a, m)
+            k = bin(a).count("1")
+            # S cu |S| = s dintre cele k satisfăcute: sum w(s) * e_{k-s}(q_A)
+            acc = sum(w[s] * e[:, k - s] for s in range(k + 1))
+            pc = np.prod(np.where([(c >> d) & 1 for d in range(m)], q, 1.0), axis=1)
+            out[:, z, i] = value * (float(z >> i & 1) - q[:, i]) * acc * pc
+    return out
+
+
+@dataclass
+class TreeExplainer:
+    n_features: int
+    expected_value: float
+    features: Optional[List[str]]
+    path_feat: np.ndarray    # (L, D) feature pe pasul d al drumului (0 pentru padding)
+    path_thr: np.ndarray     # (L, D) float32, rotunjit în jos (comparație exactă ca în sklearn)
+    path_left: np.ndarray    # (L, D) bool: drumul merge la stânga (x <= thr)
+    path_nan_left: np.ndarray  # (L, D) bool: NaN merge la stânga
+    path_bit: np.ndarray     # (L, D) uint8: 1 << slotul trăsăturii unice; 0 pentru padding
+    leaf_feat: np.ndarray    # (L, M) trăsătura fiecărui slot; -1 pentru padding
+    phi: np.ndarray          # (L, 2^M, M) contribuții precalculate per tipar z
+
+    @classmethod
+    def from_model(cls, model, features: Sequence[str] | None = None) -> "TreeExplainer":
+        lr = float(getattr(model, "learning_rate", 1.0))
+        leaves = [(lr * v, p) for tree in _trees(model) for v, p in _leaf_paths(tree)]
+        n_features = int(model.n_features_in_)
+        L = len(leaves)
+        D = max(1, max(len(p) for _, p in leaves))
+        slots = [list(dict.fromkeys(s[0] for s in p)) for _, p in leaves]  # trăsături unice, în ordinea drumului
+        M = max(1, max(len(s) for s in slots))
+        if M > _MAX_PATH_FEATURES:
+            raise ValueError(f"paths with more than {_MAX_PATH_FEATURES} distinct features are not supported")
+
+        path_feat = np.zeros((L, D), dtype=np.int64)
+        path_thr = np.zeros((L, D))
+        path_left = np.zeros((L, D), dtype=bool)
+        path_nan_left = np.zeros((L, D), dtype=bool)
+        path_bit = np.zeros((L, D), dtype=np.uint8)
+        leaf_feat = np.full((L, M), -1, dtype=np.int64)
+        q = np.ones((L, M))
+        value = np.zeros(L)
+        m_of = np.zeros(L, dtype=np.int64)
+        for j, ((v, path), feats) in enumerate(zip(leaves, slots)):
+            value[j], m_of[j] = v, len(feats)
+            leaf_feat[j, :len(feats)] = feats
+            for d, (f, thr, went_left, nan_left, ratio) in enumerate(path):
+                slot = feats.index(f)
+                path_feat[j, d], path_thr[j, d] = f, thr
+                path_left[j, d], path_nan_left[j, d] = went_left, nan_left
+                path_bit[j, d] = 1 << slot
+                q[j, slot] *= ratio
+
+        # E[f] sub distribuția de antrenare (cover): v(∅) al fiecărei frunze
+        X0 = np.zeros((1, n_features))
+        expected = float(np.sum(value * np.prod(q, axis=1)))
+        raw0 = float(_raw_predict(model, X0)[0])
+        tree_sum0 = float(sum(lr * t.predict(X0.astype(np.float32)).ravel()[0] for t in _trees(model)))
+        init = raw0 - tree_sum0  # estimatorul inițial (prior / medie), același pentru orice rând
+
+        phi = np.zeros((L, 1 << M, M))
+        for m in np.unique(m_of):
+            if m == 0:
+                continue  # arbore cu o singură frunză: constantă, intră doar în expected_value
+            rows = np.flatnonzero(m_of == m)
+            phi[rows, :1 << m, :m] = _phi_table(q[rows, :m], value[rows], int(m))
+        return cls(n_features, init + expected, list(features) if features is not None else None,
+                   path_feat, _floor32(path_thr), path_left, path_nan_left, path_bit, leaf_feat, phi)
+
+    @property
+    def n_leaves(self) -> int:
+        return int(self.phi.shape[0])
+
+    @cached_property
+    def _onehot(self):
+        """Sparse (n_features, L * M): slot -> feature, one nonzero per used slot (dense would be ~phi's size)."""
+        from scipy.sparse import csr_matrix  # vine cu scikit-learn
+
+        L, _, M = self.phi.shape
+        flat = self.leaf_feat.ravel()
+        slots = np.flatnonzero(flat >= 0)
+        return csr_matrix((np.ones(slots.size), (flat[slots], slots)), shape=(self.n_features, L * M))
+
+    def _patterns(self, X: np.ndarray) -> np.ndarray:
+        """(n, L) bitmask of the path features each row satisfies at each leaf (X float32)."""
+        L, D = self.path_feat.shape
+        fail = np.zeros((X.shape[0], L), dtype=np.uint8)
+        has_nan = bool(np.isnan(X).any())
+        for d in range(D):
+            x = X[:, self.path_feat[:, d]]
+            go_left = x <= self.path_thr[:, d]  # NaN => False
+            if has_nan:
+                go_left |= np.isnan(x) & self.path_nan_left[:, d]
+            fail |= (go_left != self.path_left[:, d]) * self.path_bit[:, d]
+        full = np.bitwise_or.reduce(self.path_bit, axis=1)
+        return full & ~fail
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """(n, n_features) contributions in the model's raw space."""
+        # arborii sklearn compară în float32 (X e convertit la predict)
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        L, _, M = self.phi.shape
+        onehot = self._onehot
+        out = np.empty((X.shape[0], self.n_features))
+        chunk = max(1, _CHUNK_CELLS // max(1, L * M))
+        leaf = np.arange(L)
+        for a in range(0, X.shape[0], chunk):
+            z = self._patterns(X[a:a + chunk])
+            out[a:a + chunk] = (onehot @ self.phi[leaf, z].reshape(len(z), L * M).T).T
+        return out
+
+    def global_importance(self, X: np.ndarray) -> np.ndarray:
+        """Mean |contribution| per feature over the rows of X."""
+        if len(X) == 0:
+            return np.zeros(self.n_features)
+        return np.abs(self.shap_values(X)).mean(axis=0)
+
+    def top_contributions(self, x: np.ndarray, k: int = 3, names: Sequence[str] | None = None) -> List[dict]:
+        """The k largest |contributions| for one row, as {feature, value}."""
+        phi = self.shap_values(np.asarray(x).reshape(1, -1))[0]
+        names = names or self.features or [f"f{i}" for i in range(self.n_features)]
+        return [{"feature": names[i], "value": float(phi[i])} for i in np.argsort(-np.abs(phi))[:k]]
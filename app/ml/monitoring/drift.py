@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+"""
+Streaming feature drift (roadmap: PSI/KS -> retraining)
+- Training: one reference histogram per feature (add_indicators columns) over the training
+  split, equal-mass bins from reference quantiles, saved as drift_{TICKER}_{h}d.npz
+- Inference: each prediction's feature row is binned and pushed into a per-model sliding
+  window (uint8 ring of bin ids + running counts) => O(features) per update, no rescans
+- One slot per bar, not per call: a prediction on the bar already observed (same ticker, same
+  last candle) replaces that slot in place, so repeated requests cannot fill the window with
+  copies of one row
+- Every `eval_every` observations: PSI and binned KS per feature vs the reference
+- Scores per (ticker, horizon, feature); crossing a threshold enqueues a retrain
+  (bounded, deduplicated queue)
+- Memory bounded: window x features bytes per model, at most `max_models` monitors (LRU)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.metrics import FEATURE_DRIFT
+
+_EPS = 1e-4  # podea pentru proporții goale în PSI (altfel log(0))
+
+
+@dataclass
+class DriftReference:
+    features: List[str]
+    edges: np.ndarray  # (F, B-1) limite interioare, crescătoare pe fiecare rând
+    ref: np.ndarray    # (F, B) proporții pe binuri în setul de antrenare
+    n: int
+
+    @property
+    def n_bins(self) -> int:
+        return self.ref.shape[1]
+
+    def bin_row(self, x: np.ndarray) -> np.ndarray:
+        """Bin index per feature for one row (NaN => last bin, like searchsorted)."""
+        x = np.asarray(x, dtype=np.float64)
+        return np.sum(~(x[:, None] < self.edges), axis=1).astype(np.uint8)
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, features=np.array(self.features), edges=self.edges, ref=self.ref, n=self.n)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "DriftReference":
+        with np.load(path) as z:
+            return cls(features=[str(f) for f in z["features"]], edges=z["edges"], ref=z["ref"], n=int(z["n"]))
+
+
+def build_reference(X: np.ndarray, features: Sequence[str], bins: int = 10) -> DriftReference:
+    """Equal-mass reference histograms (bins <= 255, ids are stored as uint8)."""
+    X = np.asarray(X, dtype=np.float64)
+    bins = int(min(max(bins, 2), 255))
+    qs = np.linspace(0, 1, bins + 1)[1:-1]
+    edges = np.nanquantile(X, qs, axis=0).T  # (F, B-1)
+    edges = np.maximum.accumulate(edges, axis=1)
+    ids = np.sum(~(X[:, :, None] < edges[None, :, :]), axis=2)  # (n, F)
+    counts = np.stack([np.bincount(ids[:, f], minlength=bins) for f in range(X.shape[1])])
+    return DriftReference(list(features), edges, counts / max(1, X.shape[0]), int(X.shape[0]))
+
+
+def psi(ref: np.ndarray, live: np.ndarray) -> np.ndarray:
+    """Population stability index per row of (F, B) proportion arrays."""
+    r, l = np.maximum(ref, _EPS), np.maximum(live, _EPS)
+    return np.sum((l - r) * np.log(l / r), axis=1)
+
+
+def ks_binned(ref: np.ndarray, live: np.ndarray) -> np.ndarray:
+    """KS statistic on the shared bins: max |CDF_ref - CDF_live| per feature."""
+    return np.max(np.abs(np.cumsum(ref, axis=1) - np.cumsum(live, axis=1)), axis=1)
+
+
+class ModelMonitor:
+    """Sliding window of the last `window` feature rows of one model, as bin counts."""
+
+    def __init__(self, reference: DriftReference, window: int, mtime: float = 0.0):
+        self.reference = reference
+        self.mtime = mtime
+        self.window = int(window)
+        F = len(reference.features)
+        self._ring = np.zeros((self.window, F), dtype=np.uint8)
+        self._counts = np.zeros((F, reference.n_bins), dtype=np.int64)
+        self._cols = np.arange(F)
+        self._pos = 0
+        self.filled = 0
+        self.seen = 0
+        self.last_bar = None  # bara (timestamp) ultimului rând; același bar => slot înlocuit
+        self.psi: Optional[np.ndarray] = None
+        self.ks: Optional[np.ndarray] = None
+        self.evaluated_at: Optional[float] = None
+
+    def update(self, x: np.ndarray, bar=None) -> bool:
+        """Push a row; False when it only replaced the row of the same `bar` (no new observation)."""
+        b = self.reference.bin_row(x)
+        if bar is not None and bar == self.last_bar and self.filled:
+            last = (self._pos - 1) % self.window
+            self._counts[self._cols, self._ring[last]] -= 1
+            self._ring[last] = b
+            self._counts[self._cols, b] += 1
+            return False
+        self.last_bar = bar
+        if self.filled == self.window:
+            self._counts[self._cols, self._ring[self._pos]] -= 1
+        else:
+            self.filled += 1
+        self._ring[self._pos] = b
+        self._counts[self._cols, b] += 1
+        self._pos = (self._pos + 1) % self.window
+        self.seen += 1
+        return True
+
+    def evaluate(self) -> Tuple[np.ndarray, np.ndarray]:
+        live = self._counts / max(1, self.filled)
+        self.psi = psi(self.reference.ref, live)
+        self.ks = ks_binned(self.reference.ref, live)
+        self.evaluated_at = time.time()
+        return self.psi, self.ks
+
+
+class DriftMonitor:
+    def __init__(self, window: int | None = None, eval_every: int | None = None,
+                 min_samples: int | None = None, psi_threshold: float | None = None,
+                 ks_threshold: float | None = None, max_models: int | None = None,
+                 queue_size: int | None = None):
+        self.window = int(window or settings.drift_window)
+        self.eval_every = max(1, int(eval_every or settings.drift_eval_every))
+        self.min_samples = int(min_samples if min_samples is not None else settings.drift_min_samples)
+        self.psi_threshold = float(psi_threshold if psi_threshold is not None else settings.drift_psi_threshold)
+        self.ks_threshold = float(ks_threshold if ks_threshold is not None else settings.drift_ks_threshold)
+        self.max_models = int(max_models or settings.drift_max_models)
+        self._monitors: "OrderedDict[Tuple[str, int], ModelMonitor]" = OrderedDict()
+        self._queue: deque = deque(maxlen=int(queue_size or settings.drift_retrain_queue_size))
+        self._queued: set = set()
+        self._lock = threading.Lock()
+
+    # --------------- updates ---------------
+
+    def _monitor(self, key: Tuple[str, int], reference_path: str) -> Optional[ModelMonitor]:
+        try:
+            mtime = os.path.getmtime(reference_path)
+        except OSError:
+            return None  # artefact vechi, fără referință
+        mon = self._monitors.get(key)
+        if mon is None or mon.mtime != mtime:
+            # model nou sau reantrenat => fereastră nouă față de noua referință
+            mon = ModelMonitor(DriftReference.load(reference_path), self.window, mtime)
+            self._monitors[key] = mon
+            while len(self._monitors) > self.max_models:
+                self._monitors.popitem(last=False)
+        self._monitors.move_to_end(key)
+        return mon
+
+    def observe(self, ticker: str, horizon_days: int, x: np.ndarray, reference_path: str, bar=None) -> None:
+        """
+        Feed one prediction's feature row; evaluates every `eval_every` new rows.
+        bar: timestamp of the candle the row was computed on; the same bar again replaces its slot.
+        """
+        key = (ticker.upper(), int(horizon_days))
+        with self._lock:
+            mon = self._monitor(key, reference_path)
+            if mon is None or len(x) != len(mon.reference.features):
+                return
+            if not mon.update(x, bar):
+                return
+            if mon.seen % self.eval_every or mon.filled < self.min_samples:
+                return
+            p, k = mon.evaluate()
+            drifted = [f for f, a, b in zip(mon.reference.features, p, k)
+                       if a > self.psi_threshold or b > self.ks_threshold]
+            if drifted:
+                self._enqueue(key, drifted)
+        for f, a in zip(mon.reference.features, p):
+            FEATURE_DRIFT.set(float(a), ticker=key[0], horizon_days=str(key[1]), feature=f)
+
+    # --------------- retrain queue ---------------
+
+    def _enqueue(self, key: Tuple[str, int], drifted: List[str]) -> None:
+        if key in self._queued:
+            return
+        if len(self._queue) == self._queue.maxlen:
+            self._queued.discard(self._queue[0])  # deque-ul scoate automat cel mai vechi
+        self._queue.append(key)
+        self._queued.add(key)
+        logger.info("Feature drift on {} {}d ({}) => retrain queued", key[0], key[1], ", ".join(drifted))
+
+    def pop_retrain(self) -> Optional[Tuple[str, int]]:
+        with self._lock:
+            if not self._queue:
+                return None
+            key = self._queue.popleft()
+            self._queued.discard(key)
+            return key
+
+    def pending_retrains(self) -> List[Tuple[str, int]]:
+        with self._lock:
+            return list(self._queue)
+
+    # --------------- read side ---------------
+
+    def scores(self, ticker: str | None = None, horizon_days: int | None = None) -> List[Dict]:
+        out = []
+        with self._lock:
+            for (t, h), mon in self._monitors.items():
+                if (ticker and t != ticker.upper()) or (horizon_days and h != horizon_days):
+                    continue
+                feats = {}
+                if mon.psi is not None:
+                    feats = {f: {"psi": round(float(a), 4), "ks": round(float(b), 4)}
+                             for f, a, b in zip(mon.reference.features, mon.psi, mon.ks)}
+                out.append({
+                    "ticker": t, "horizon_days": h, "samples": mon.filled, "seen": mon.seen,
+                    "evaluated_at": mon.evaluated_at, "features": feats,
+                    "drifted": [f for f, s in feats.items()
+                                if s["psi"] > self.psi_threshold or s["ks"] > self.ks_threshold],
+                })
+        return out
+
+    def reset(self) -> None:
+        with self._lock:
+            self._monitors.clear()
+            self._queue.clear()
+            self._queued.clear()
+
+
+drift_monitor = DriftMonitor()
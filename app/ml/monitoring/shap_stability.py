@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+"""
+SHAP feature stability (roadmap: SHAP stability & pruning)
+- At every training run: global importance (mean |SHAP| on the validation rows) of the
+  classifier and the regressor, appended to shap_{TICKER}_{h}d.json; the last N retrain
+  windows are kept, so the file is the per-artifact importance history (read from disk, never
+  recomputed)
+- Report over all artifacts: per feature, the mean share of total importance, its spread across
+  tickers (coefficient of variation of the latest window) and across retrain windows (std of the
+  feature's rank, averaged over artifacts)
+- A feature is unstable when either spread crosses its threshold; unstable features with a
+  small share are pruning candidates
+"""
+
+import glob
+import json
+import os
+import time
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from app.ml.explain.treeshap import TreeExplainer
+
+TARGETS = ("cls", "reg")
+
+
+def importance_path(art_dir: str, tag: str) -> str:
+    return os.path.join(art_dir, f"shap_{tag}.json")
+
+
+def record_importance(art_dir: str, tag: str, features: Sequence[str], models: Dict[str, object], X: np.ndarray,
+                      train_end: str | None = None, keep: int = 12) -> Dict:
+    """Explain `X` with every model in `models` ({"cls": ..., "reg": ...}) and append the window."""
+    window = {"trained_at": time.time(), "train_end": train_end, "n": int(len(X)), "features": list(features)}
+    for name, model in models.items():
+        ex = TreeExplainer.from_model(model, features)
+        window[name] = [round(float(v), 6) for v in ex.global_importance(X)]
+        window[f"{name}_expected"] = ex.expected_value
+
+    path = importance_path(art_dir, tag)
+    doc = {"tag": tag, "windows": []}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            doc = json.load(f)
+    doc["windows"] = (doc.get("windows", []) + [window])[-max(1, keep):]
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f)
+    os.replace(tmp, path)
+    return window
+
+
+def load_histories(art_dir: str) -> Dict[str, Dict]:
+    out = {}
+    for path in sorted(glob.glob(os.path.join(art_dir, "shap_*.json"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if isinstance(doc, dict) and doc.get("windows"):
+            out[doc.get("tag") or os.path.basename(path)[5:-5]] = doc
+    return out
+
+
+def _shares(window: Dict, target: str, index: Dict[str, int]) -> Optional[np.ndarray]:
+    imp = window.get(target)
+    if not imp:
+        return None
+    row = np.full(len(index), np.nan)
+    total = float(np.sum(imp))
+    for f, v in zip(window["features"], imp):
+        row[index[f]] = v / total if total > 0 else 0.0
+    return row
+
+
+def _ranks(shares: np.ndarray) -> np.ndarray:
+    """Rank per row (0 = most important); NaN (feature absent) stays NaN."""
+    filled = np.where(np.isnan(shares), -np.inf, shares)
+    ranks = np.argsort(np.argsort(-filled, axis=1, kind="stable"), axis=1).astype(np.float64)
+    return np.where(np.isnan(shares), np.nan, ranks)
+
+
+def stability_report(histories: Dict[str, Dict], target: str = "cls", min_share: float = 0.02,
+                     cv_threshold: float = 1.0, rank_std_threshold: float = 3.0) -> Dict:
+    if target not in TARGETS:
+        raise ValueError(f"target must be one of {TARGETS}")
+    features: List[str] = sorted({f for doc in histories.values() for w in doc["windows"] for f in w["features"]})
+    index = {f: i for i, f in enumerate(features)}
+
+    latest, rank_std = [], []
+    for doc in histories.values():
+        rows = [r for r in (_shares(w, target, index) for w in doc["windows"]) if r is not None]
+        if not rows:
+            continue
+        latest.append(rows[-1])
+        if len(rows) >= 2:
+            rank_std.append(np.nanstd(_ranks(np.vstack(rows)), axis=0))
+    if not latest:
+        return {"target": target, "artifacts": 0, "features": [], "generated_at": time.time()}
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        L = np.vstack(latest)
+        mean = np.nanmean(L, axis=0)
+        cv = np.where(mean > 0, np.nanstd(L, axis=0) / mean, np.nan)
+        rs = np.nanmean(np.vstack(rank_std), axis=0) if rank_std else np.full(len(features), np.nan)
+    score = np.fmax(np.nan_to_num(cv / cv_threshold, nan=0.0), np.nan_to_num(rs / rank_std_threshold, nan=0.0))
+
+    rows = []
+    for i in np.argsort(-score, kind="stable"):
+        unstable = bool(score[i] > 1.0)
+        rows.append({
+            "feature": features[i], "mean_share": round(float(mean[i]), 4),
+            "cv_tickers": None if np.isnan(cv[i]) else round(float(cv[i]), 3),
+            "rank_std_windows": None if np.isnan(rs[i]) else round(float(rs[i]), 2),
+            "instability": round(float(score[i]), 3), "unstable": unstable,
+            "prune": unstable and float(mean[i]) < min_share,
+        })
+    return {"target": target, "artifacts": len(latest), "with_history": len(rank_std), "features": rows,
+            "thresholds": {"cv_tickers": cv_threshold, "rank_std_windows": rank_std_threshold, "min_share": min_share},
+            "generated_at": time.time()}
+
+
+def write_report(art_dir: str, target: str = "cls", **kwargs) -> Dict:
+    report = stability_report(load_histories(art_dir), target, **kwargs)
+    path = os.path.join(art_dir, f"shap_stability_{target}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp, path)
+    return report
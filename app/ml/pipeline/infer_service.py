@@ -1,44 +1,209 @@
 from __future__ import annotations
-import os, json
-from typing import Dict, Any
+import os, json, time, threading
+from collections import OrderedDict
+from typing import Dict, Any, Tuple
 import numpy as np
 import pandas as pd
 from joblib import load
 from app.ml.features.indicators import add_indicators
+from app.ml.calibration.conformal import ConformalIndex
+from app.ml.calibration.tables import Calibrator, calibrator_path, expected_calibration_error, fit_calibrator
+from app.ml.monitoring.drift import drift_monitor
+from app.core.config import settings
+from app.core.metrics import FEATURES_SECONDS, INFERENCE_SECONDS, MODEL_LOAD_SECONDS, record_model_quality
 
 ART_DIR = "app/ml/artifacts"
+# (ticker, orizont) -> {path: (mtime, obiect încărcat)}: index conformal, calibrator, explainer, metrics;
+# LRU pe modele ca monitoarele de drift (un explainer TreeSHAP poate avea zeci de MB)
+_artifact_cache: "OrderedDict[Tuple[str, int], Dict[str, Any]]" = OrderedDict()
+_artifact_lock = threading.Lock()
 
 def _tag(ticker: str, horizon_days: int) -> str:
     return f"{ticker.upper()}_{horizon_days}d"
 
 def _load_models(ticker: str, horizon_days: int):
     tag = _tag(ticker, horizon_days)
-    cls = load(os.path.join(ART_DIR, f"cls_{tag}.joblib"))
-    reg = load(os.path.join(ART_DIR, f"reg_{tag}.joblib"))
+    with MODEL_LOAD_SECONDS.time():
+        cls = load(os.path.join(ART_DIR, f"cls_{tag}.joblib"))
+        reg = load(os.path.join(ART_DIR, f"reg_{tag}.joblib"))
     return cls, reg
 
-def predict_from_candles(ticker: str, horizon_days: int, candles: pd.DataFrame) -> Dict[str, Any]:
+def _model_slot(ticker: str, horizon_days: int) -> Dict[str, Any]:
+    key = (ticker.upper(), int(horizon_days))
+    with _artifact_lock:
+        slot = _artifact_cache.get(key)
+        if slot is None:
+            slot = _artifact_cache[key] = {}
+            while len(_artifact_cache) > settings.ml_artifact_cache_models:
+                _artifact_cache.popitem(last=False)
+        _artifact_cache.move_to_end(key)
+        return slot
+
+def _cached_artifact(ticker: str, horizon_days: int, path: str, loader):
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    slot = _model_slot(ticker, horizon_days)
+    hit = slot.get(path)
+    if hit is None or hit[0] != mtime:  # reantrenare => fișier nou (os.replace) => mtime nou
+        hit = slot[path] = (mtime, loader(path))
+    return hit[1]
+
+def _load_conformal(ticker: str, horizon_days: int):
+    # artefactele vechi nu au indexul conformal => fallback pe estimarea ATR
+    return _cached_artifact(ticker, horizon_days, os.path.join(ART_DIR, f"conformal_{_tag(ticker, horizon_days)}.npz"),
+                            ConformalIndex.load)
+
+def _load_calibrator(ticker: str, horizon_days: int):
+    # pickle-urile vechi (CalibratedClassifierCV) nu au calib_*.json: calibrarea e deja în cls
+    return _cached_artifact(ticker, horizon_days, calibrator_path(ART_DIR, _tag(ticker, horizon_days)), Calibrator.load)
+
+def _build_explainer(path: str):
+    from app.ml.explain.treeshap import TreeExplainer
+    model = load(path)
+    # doar GradientBoosting simplu: pickle-urile vechi (CalibratedClassifierCV) n-au estimators_, iar
+    # arborii bazei necalibrate n-ar explica probabilitatea servită => fără drivers (None e cache-uit)
+    if not hasattr(model, "estimators_"):
+        return None
+    return TreeExplainer.from_model(model)
+
+def _load_explainer(ticker: str, horizon_days: int):
+    # TreeSHAP aplatizat din clasificator, reconstruit doar când artefactul se schimbă
+    return _cached_artifact(ticker, horizon_days, os.path.join(ART_DIR, f"cls_{_tag(ticker, horizon_days)}.joblib"),
+                            _build_explainer)
+
+def _load_train_end(ticker: str, horizon_days: int):
+    # artefactele vechi nu au "train_end" în metrics => None
+    def _read(path):
+        with open(path, encoding="utf-8") as f:
+            return json.load(f).get("train_end")
+    value = _cached_artifact(ticker, horizon_days, os.path.join(ART_DIR, f"metrics_{_tag(ticker, horizon_days)}.json"),
+                             _read)
+    return pd.Timestamp(value) if value else None
+
+def _after(dates: pd.Series, ts: pd.Timestamp) -> np.ndarray:
+    d = pd.to_datetime(dates, utc=True)
+    return (d > (ts.tz_localize("UTC") if ts.tzinfo is None else ts)).to_numpy()
+
+def install_calibrator(ticker: str, horizon_days: int, calib: Calibrator) -> None:
+    """Atomic file replace + in-memory swap; the next prediction uses the new calibrator."""
+    path = calibrator_path(ART_DIR, _tag(ticker, horizon_days))
+    calib.save(path)
+    _model_slot(ticker, horizon_days)[path] = (os.path.getmtime(path), calib)
+
+def _rr_from_bands(exp_change: float, q_low: float, q_high: float) -> float:
+    # long dacă ne așteptăm la creștere: câștig = q90, risc = -q10; short invers
+    # banda întreagă de aceeași parte a lui 0 => riscul are podea 0.1% (ca proxy-ul ATR)
+    reward, risk = (q_high, -q_low) if exp_change >= 0 else (-q_low, q_high)
+    return float(max(reward, 0.0) / max(risk, 0.1))
+
+def predict_from_candles(ticker: str, horizon_days: int, candles: pd.DataFrame,
+                         coverage: float = 0.8) -> Dict[str, Any]:
     """
     candles columns: ['date','open','high','low','close','volume'] ascending by date
+    coverage: conformal band level; 0.8 => q10/q90
     """
+    with INFERENCE_SECONDS.time():
+        return _predict(ticker, horizon_days, candles, coverage)
+
+def _predict(ticker: str, horizon_days: int, candles: pd.DataFrame, coverage: float = 0.8) -> Dict[str, Any]:
     if candles is None or len(candles) < 40:
         raise ValueError("Not enough candles (min 40).")
 
     cls, reg = _load_models(ticker, horizon_days)
-    feat = add_indicators(candles).tail(1)  # last row
-    X = feat.drop(columns=["date","open","high","low","close","volume"], errors="ignore").values
-    proba = float(cls.predict_proba(X)[:,1][0])   # P(up)
+    with FEATURES_SECONDS.time(stage="infer"):
+        feat = add_indicators(candles).tail(1)  # last row
+    X_df = feat.drop(columns=["date","open","high","low","close","volume"], errors="ignore")
+    X = X_df.values
+    raw = float(cls.predict_proba(X)[:,1][0])     # P(up) din modelul de bază
+    calib = _load_calibrator(ticker, horizon_days)
+    proba = float(calib.predict(raw)) if calib is not None else raw
     exp_change = float(reg.predict(X)[0])         # % change over horizon
+    if settings.drift_enabled:
+        # un slot per bară: cereri repetate pe aceeași lumânare nu umplu fereastra cu copii
+        bar = feat["date"].iloc[0] if "date" in feat.columns else None
+        drift_monitor.observe(ticker, horizon_days, X[0], os.path.join(ART_DIR, f"drift_{_tag(ticker, horizon_days)}.npz"),
+                              bar=bar)
 
-    # Simplă estimare R:R din distribuția regresiei (proxy): raport față de ATR
     atr = float(feat["atr_14"].iloc[0])
     price = float(feat["close"].iloc[0])
-    rr = float(max(0.1, abs(exp_change)) / (atr/price*100 + 1e-6))  # ad-hoc, îl rafinăm ulterior
+    vol_pct = atr / price * 100
+
+    conformal = _load_conformal(ticker, horizon_days)
+    bands = None
+    if conformal is not None:
+        lo, hi = (1 - coverage) / 2, (1 + coverage) / 2
+        b = conformal.bands(exp_change, vol_pct, levels=(lo, 0.5, hi))
+        q_low, q_high = b[f"q{int(round(lo * 100)):02d}"], b[f"q{int(round(hi * 100)):02d}"]
+        rr = _rr_from_bands(exp_change, q_low, q_high)
+        bands = {k: round(v, 2) for k, v in b.items()}
+        bands.update({"coverage": coverage, "vol_bin": conformal.bin_of(vol_pct), "method": "split_conformal"})
+    else:
+        # Simplă estimare R:R din distribuția regresiei (proxy): raport față de ATR
+        rr = float(max(0.1, abs(exp_change)) / (vol_pct + 1e-6))
+
+    drivers = None
+    if settings.shap_top_k > 0:
+        try:
+            explainer = _load_explainer(ticker, horizon_days)
+            if explainer is not None:
+                # contribuții în log-odds la P(up) brut: + împinge spre creștere, - spre scădere
+                drivers = [{"feature": d["feature"], "value": round(d["value"], 4)}
+                           for d in explainer.top_contributions(X[0], settings.shap_top_k, list(X_df.columns))]
+        except Exception:
+            drivers = None  # explicația e opțională: nu blochează predicția (ex: arbori prea adânci)
 
     return {
         "ticker": ticker.upper(),
         "horizon_days": horizon_days,
         "probability_pct": round(proba * 100, 2),
+        "probability_raw_pct": round(raw * 100, 2),
         "expected_change_pct": round(exp_change, 2),
         "reward_to_risk": round(rr, 2),
+        "bands": bands,
+        "drivers": drivers,
+    }
+
+def recalibrate(ticker: str, horizon_days: int, candles: pd.DataFrame, window: int = 250,
+                method: str = "isotonic") -> Dict[str, Any]:
+    """
+    Online calibration: refit only the calibrator on the last `window` resolved days
+    (raw P(up) of the current model vs realized direction) and hot-swap it.
+    Only days after the model's training split (metrics "train_end") are used: on the rows it
+    was fit on the classifier is overconfident, and the calibrator would learn that.
+    """
+    from app.ml.pipeline.train_baseline import _label_targets
+
+    cls, _ = _load_models(ticker, horizon_days)
+    df = _label_targets(add_indicators(candles), horizon_days, 0.0)  # doar zile deja rezolvate
+    train_end = _load_train_end(ticker, horizon_days)
+    if train_end is not None:
+        df = df[_after(df["date"], train_end)]
+    df = df.tail(window)
+    if len(df) < 30:
+        raise ValueError("Not enough resolved out-of-sample rows for recalibration (min 30).")
+    X = df.drop(columns=["date","open","high","low","close","volume","y_reg","y_cls"], errors="ignore").values
+    raw = cls.predict_proba(X)[:, 1]
+    y = df["y_cls"].values
+
+    t0 = time.perf_counter()
+    calib = fit_calibrator(raw, y, method)
+    fit_ms = (time.perf_counter() - t0) * 1000
+    calib.source = "online"
+
+    old = _load_calibrator(ticker, horizon_days)
+    before = old.predict(raw) if old is not None else raw
+    after = calib.predict(raw)
+    install_calibrator(ticker, horizon_days, calib)
+
+    brier_before = float(np.mean((before - y) ** 2))
+    brier_after = float(np.mean((after - y) ** 2))
+    ece_after = expected_calibration_error(after, y)
+    record_model_quality(ticker, horizon_days, source="online", brier=brier_after, ece=ece_after)
+    return {
+        "ticker": ticker.upper(), "horizon_days": horizon_days, "method": calib.method, "n": int(len(y)),
+        "brier_before": round(brier_before, 4), "brier_after": round(brier_after, 4),
+        "ece_before": round(expected_calibration_error(before, y), 4), "ece_after": round(ece_after, 4),
+        "fit_ms": round(fit_ms, 2), "train_end": str(train_end) if train_end is not None else None,
     }
@@ -1,15 +1,20 @@
 ﻿from __future__ import annotations
-import os, json
+import os, json, time
 from dataclasses import dataclass
+from typing import Any, Dict, Optional
 import numpy as np
 import pandas as pd
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
-from app.ml.calibration.frozen_calibrator import calibrate_prefit_estimator
+from app.ml.calibration.tables import calibrator_path, expected_calibration_error, fit_calibrator
+from app.ml.calibration.conformal import build_conformal_index, empirical_coverage
+from app.ml.monitoring.drift import build_reference
+from app.core.config import settings
 from sklearn.calibration import CalibratedClassifierCV
 from sklearn.metrics import accuracy_score, roc_auc_score, brier_score_loss, mean_absolute_error, mean_squared_error
 from joblib import dump
 from app.ml.features.indicators import add_indicators
+from app.core.metrics import FEATURES_SECONDS, TRAIN_SECONDS, record_model_quality
 
 ART_DIR = "app/ml/artifacts"
 
@@ -21,6 +26,19 @@ class TrainConfig:
     test_ratio: float = 0.15
     val_ratio: float = 0.15
     random_state: int = 42
+    cls_params: Optional[Dict[str, Any]] = None  # hiperparametri GradientBoosting; None => default sklearn
+    reg_params: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def with_tuned(cls, ticker: str, horizon_days: int = 7, **kwargs) -> "TrainConfig":
+        """Config with the hyperparameters saved by app.ml.pipeline.tuning, if any."""
+        path = os.path.join(ART_DIR, f"tuned_{ticker.upper()}_{horizon_days}d.json")
+        if os.path.exists(path):
+            with open(path) as f:
+                tuned = json.load(f)
+            kwargs.setdefault("cls_params", tuned.get("cls_params"))
+            kwargs.setdefault("reg_params", tuned.get("reg_params"))
+        return cls(ticker=ticker, horizon_days=horizon_days, **kwargs)
 
 def _ensure_dirs():
     os.makedirs(ART_DIR, exist_ok=True)
@@ -47,7 +65,9 @@ def _prep_xy(df: pd.DataFrame):
 
 def train_on_dataframe(df_raw: pd.DataFrame, cfg: TrainConfig):
     _ensure_dirs()
-    df = add_indicators(df_raw)
+    t0 = time.perf_counter()
+    with FEATURES_SECONDS.time(stage="train"):
+        df = add_indicators(df_raw)
     df = _label_targets(df, cfg.horizon_days, cfg.direction_threshold)
     X, y_cls, y_reg, features = _prep_xy(df)
 
@@ -57,19 +77,19 @@ def train_on_dataframe(df_raw: pd.DataFrame, cfg: TrainConfig):
     Xte, yte_c, yte_r = X[te], y_cls[te], y_reg[te]
 
     # Clasificare (direcție)
-    base_cls = GradientBoostingClassifier(random_state=cfg.random_state)
+    base_cls = GradientBoostingClassifier(random_state=cfg.random_state, **(cfg.cls_params or {}))
     base_cls.fit(Xtr, ytr_c)
-    # calibrare probabilități (mai corect pentru „probability_pct”)
-    # înlocuiește CalibratedClassifierCV(..., cv=5) cu wrapperul uniform
-    cls = calibrate_prefit_estimator(base_cls, Xva, yva_c, method="isotonic")
-    cls.fit(Xva, yva_c)
+    # calibrare probabilități (mai corect pentru „probability_pct”): artefact separat, fit pe P(up) brut
+    # din validare; modelul de bază rămâne necalibrat și se poate recalibra online fără re-pickle
+    cls = base_cls
+    calib = fit_calibrator(cls.predict_proba(Xva)[:, 1], yva_c, method="isotonic")
 
     # Regresie (magnitudine %)
-    reg = GradientBoostingRegressor(random_state=cfg.random_state)
+    reg = GradientBoostingRegressor(random_state=cfg.random_state, **(cfg.reg_params or {}))
     reg.fit(Xtr, ytr_r)
 
     # Metrics
-    proba_te = cls.predict_proba(Xte)[:,1]
+    proba_te = calib.predict(cls.predict_proba(Xte)[:,1])
     pred_cls_te = (proba_te >= 0.5).astype(int)
     acc = float(accuracy_score(yte_c, pred_cls_te))
     try:
@@ -77,25 +97,49 @@ def train_on_dataframe(df_raw: pd.DataFrame, cfg: TrainConfig):
     except Exception:
       auc = float("nan")
     brier = float(brier_score_loss(yte_c, proba_te))
+    ece = expected_calibration_error(proba_te, yte_c)
 
     yhat_r = reg.predict(Xte)
     mae = float(mean_absolute_error(yte_r, yhat_r))
-    rmse = float(mean_squared_error(yte_r, yhat_r, squared=False))
+    # Split conformal: reziduurile |y - ŷ| pe validare (nefolosită la fit-ul regresiei), pe binuri de ATR%
+    vol_pct = (df["atr_14"] / df["close"] * 100.0).values
+    conformal = build_conformal_index(yva_r, reg.predict(Xva), vol_pct[va])
+    cov80 = empirical_coverage(conformal, yte_r, yhat_r, vol_pct[te], 0.8)
+    rmse = float(np.sqrt(mean_squared_error(yte_r, yhat_r)))  # `squared=` a dispărut în sklearn 1.6
 
     metrics = {
         "ticker": cfg.ticker, "horizon_days": cfg.horizon_days,
-        "cls": {"accuracy": acc, "auc": auc, "brier": brier},
+        "cls": {"accuracy": acc, "auc": auc, "brier": brier, "ece": ece, "calibration": calib.method},
         "reg": {"mae": mae, "rmse": rmse},
+        "conformal": {"n_cal": int(conformal.values.size), "vol_bins": conformal.n_bins,
+                      "coverage_80_test": cov80},
         "n_train": int(len(Xtr)), "n_val": int(len(Xva)), "n_test": int(len(Xte)),
+        # ultima zi văzută de fit-ul modelelor: recalibrarea online folosește doar zilele de după
+        "train_end": str(df["date"].iloc[tr.stop - 1]),
         "features": features,
+        "params": {"cls": cfg.cls_params, "reg": cfg.reg_params},
     }
 
     # Save artifacts
     model_tag = f"{cfg.ticker.upper()}_{cfg.horizon_days}d"
     dump(cls, os.path.join(ART_DIR, f"cls_{model_tag}.joblib"))
+    calib.save(calibrator_path(ART_DIR, model_tag))
     dump(reg, os.path.join(ART_DIR, f"reg_{model_tag}.joblib"))
+    conformal.save(os.path.join(ART_DIR, f"conformal_{model_tag}.npz"))
+    # referința pentru drift: distribuția features pe care a văzut-o modelul la antrenare
+    build_reference(Xtr, features, bins=settings.drift_bins).save(os.path.join(ART_DIR, f"drift_{model_tag}.npz"))
+    if settings.shap_enabled:
+        # importanța globală a ferestrei curente (istoric per artefact pentru raportul de stabilitate)
+        from app.ml.monitoring.shap_stability import record_importance
+        rows = Xva[-settings.shap_sample_rows:]
+        window = record_importance(ART_DIR, model_tag, features, {"cls": cls, "reg": reg}, rows,
+                                   train_end=metrics["train_end"], keep=settings.shap_history_windows)
+        metrics["shap_top"] = [features[i] for i in np.argsort(window["cls"])[::-1][:5]]
     with open(os.path.join(ART_DIR, f"metrics_{model_tag}.json"), "w") as f:
         json.dump(metrics, f, indent=2)
 
+    TRAIN_SECONDS.observe(time.perf_counter() - t0)
+    record_model_quality(cfg.ticker, cfg.horizon_days, source="test",
+                         accuracy=acc, auc=auc, brier=brier, ece=ece, mae=mae, rmse=rmse)
     return metrics
 
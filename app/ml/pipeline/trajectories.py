@@ -0,0 +1,186 @@
+from __future__ import annotations
+
+"""
+Monte Carlo trajectories 1..N days (roadmap: "Traiectorii 1..14d")
+- Per-step log-return model per ticker: drift + optional AR(1) + residuals
+  (bootstrapped from history, or normal with the residual sigma)
+- All tickers simulated together: state is a (tickers, paths) float32 tensor advanced one
+  day at a time, so memory stays O(tickers * paths) whatever the horizon
+- Geometric compounding; per horizon: P(up), expected change %, change-% quantiles
+- Seeded numpy Generator => same seed, same universe => same numbers
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence
+import numpy as np
+
+QUANTILES = (0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95)
+_PHI_CLIP = 0.5
+_MAX_RESID = 65_535  # indicii bootstrap se generează din 16 biți aleatori
+_Q_BINS = 4096
+_BLOCK_ELEMS = 1 << 17  # ~128k căi (512 KB float32) per bloc de tickere
+
+
+@dataclass
+class ReturnModel:
+    tickers: List[str]
+    mu: np.ndarray        # (T,) drift zilnic (log-return)
+    phi: np.ndarray       # (T,) coeficient AR(1); 0 => randamente independente
+    sigma: np.ndarray     # (T,) deviația standard a reziduurilor
+    resid: np.ndarray     # (T, L) reziduuri centrate, float32, completate cu 0 după `lengths`
+    lengths: np.ndarray   # (T,) câte reziduuri valide are fiecare ticker
+    last_dev: np.ndarray  # (T,) ultimul randament minus drift (starea inițială AR)
+
+
+def fit_return_model(closes: Dict[str, Sequence[float]], lookback: int = 750, ar1: bool = True,
+                     min_obs: int = 30) -> ReturnModel:
+    """Daily closes per ticker -> ReturnModel. Tickers with fewer than `min_obs` returns are skipped."""
+    lookback = min(int(lookback), _MAX_RESID)
+    rows = []
+    for t, c in closes.items():
+        c = np.asarray(c, dtype=np.float64)
+        c = c[np.isfinite(c) & (c > 0)]
+        r = np.diff(np.log(c))[-lookback:]
+        if r.size >= min_obs:
+            rows.append((t.upper(), r))
+    if not rows:
+        raise ValueError("No ticker has enough history for the return model.")
+
+    T, L = len(rows), max(r.size for _, r in rows)
+    mu, phi, sigma = np.zeros(T), np.zeros(T), np.zeros(T)
+    last_dev = np.zeros(T)
+    lengths = np.zeros(T, dtype=np.int64)
+    resid = np.zeros((T, L), dtype=np.float32)
+    for i, (_, r) in enumerate(rows):
+        mu[i] = r.mean()
+        d = r - mu[i]
+        if ar1 and d.size > 2 and d[:-1].std() > 0:
+            phi[i] = np.clip(np.corrcoef(d[:-1], d[1:])[0, 1], -_PHI_CLIP, _PHI_CLIP)
+        e = d[1:] - phi[i] * d[:-1]
+        e = e - e.mean()
+        resid[i, :e.size] = e
+        lengths[i] = e.size
+        sigma[i] = e.std()
+        last_dev[i] = d[-1]
+    return ReturnModel([t for t, _ in rows], mu, phi, sigma, resid, lengths, last_dev)
+
+
+def drift_from_prediction(expected_change_pct: float, horizon_days: int) -> float:
+    """Model's expected % change over `horizon_days` -> daily log drift."""
+    return float(np.log1p(expected_change_pct / 100.0) / max(1, horizon_days))
+
+
+def simulate(model: ReturnModel, horizons: Iterable[int] = range(1, 15), n_paths: int = 10_000,
+             seed: int | None = 42, mode: str = "bootstrap", drift: Optional[Dict[str, float]] = None,
+             quantiles: Sequence[float] = QUANTILES) -> Dict[str, List[Dict]]:
+    """
+    Simulate `n_paths` paths per ticker up to max(horizons) days.
+    mode: "bootstrap" (resample historical residuals) | "normal" (Gaussian with residual sigma).
+    drift: optional {ticker: daily log drift} overriding the historical mean (ex: from the model).
+    Returns {ticker: [{days, p_up, expected_change_pct, quantiles: {q05: ...}}, ...]}.
+    """
+    hs = sorted({int(h) for h in horizons if int(h) >= 1})
+    if not hs:
+        raise ValueError("horizons must contain at least one day >= 1")
+    if mode not in ("bootstrap", "normal"):
+        raise ValueError("mode must be 'bootstrap' or 'normal'")
+    T, N, qs = len(model.tickers), int(n_paths), np.asarray(quantiles, dtype=np.float64)
+
+    mu = model.mu.copy()
+    for i, t in enumerate(model.tickers):
+        if drift and t in drift:
+            mu[i] = drift[t]
+
+    rng = np.random.default_rng(seed)
+    p_up = np.empty((T, len(hs)))
+    mean = np.empty((T, len(hs)))
+    qv = np.empty((T, len(hs), qs.size))
+    # blocuri de tickere cât să încapă starea (block, N) în cache; același seed => aceleași numere
+    block = max(1, _BLOCK_ELEMS // max(1, N))
+    for a in range(0, T, block):
+        sl = slice(a, min(T, a + block))
+        _simulate_block(model, sl, mu[sl], hs, N, rng, mode, qs, p_up[sl], mean[sl], qv[sl])
+
+    qnames = [f"q{int(round(q * 100)):02d}" for q in qs]
+    out: Dict[str, List[Dict]] = {}
+    for i, t in enumerate(model.tickers):
+        out[t] = [
+            {
+                "days": h,
+                "p_up": round(float(p_up[i, j]), 4),
+                "expected_change_pct": round(float(mean[i, j]), 3),
+                "quantiles": {n: round(float(v), 3) for n, v in zip(qnames, qv[i, j])},
+            }
+            for j, h in enumerate(hs)
+        ]
+    return out
+
+
+def _simulate_block(model: ReturnModel, sl: slice, mu: np.ndarray, hs: List[int], N: int,
+                    rng: np.random.Generator, mode: str, qs: np.ndarray,
+                    p_up: np.ndarray, mean: np.ndarray, qv: np.ndarray) -> None:
+    """Advance (tickers in `sl`, N) paths day by day; write stats for each horizon in place."""
+    resid = model.resid[sl]
+    T = resid.shape[0]
+    mu32 = mu.astype(np.float32)[:, None]
+    phi32 = model.phi[sl].astype(np.float32)[:, None]
+    sigma32 = model.sigma[sl].astype(np.float32)[:, None]
+    lengths = model.lengths[sl].astype(np.uint32)[:, None]
+    offsets = (np.arange(T, dtype=np.uint32) * np.uint32(resid.shape[1]))[:, None]
+    resid_flat = resid.ravel()
+
+    dev = np.repeat(model.last_dev[sl].astype(np.float32)[:, None], N, axis=1)
+    cum = np.zeros((T, N), dtype=np.float32)
+    k = 0
+    for day in range(1, hs[-1] + 1):
+        if mode == "bootstrap":
+            # index uniform în [0, length) din 16 biți: (u * length) >> 16
+            idx = rng.integers(0, 1 << 16, size=(T, N), dtype=np.uint16).astype(np.uint32)
+            idx *= lengths
+            idx >>= 16
+            idx += offsets
+            eps = resid_flat[idx]
+        else:
+            eps = rng.standard_normal((T, N), dtype=np.float32) * sigma32
+        dev *= phi32
+        dev += eps
+        cum += mu32
+        cum += dev
+        if day == hs[k]:
+            p_up[:, k] = np.count_nonzero(cum > 0, axis=1) / N
+            mean[:, k] = np.expm1(cum).mean(axis=1, dtype=np.float64) * 100.0
+            # quantila lui exp(x)-1 = exp(quantila lui x)-1 (monotonă) => ajung quantilele log-returnurilor
+            qv[:, k, :] = np.expm1(row_quantiles(cum, qs)) * 100.0
+            k += 1
+
+
+def row_quantiles(x: np.ndarray, qs: Sequence[float], bins: int = _Q_BINS) -> np.ndarray:
+    """
+    Per-row quantiles of a (rows, n) array from a per-row histogram (bincount + cumsum),
+    linear inside the bin. Error <= (row max - row min) / bins; ~4x faster than np.quantile
+    on (200, 10k) because nothing is sorted or partitioned.
+    """
+    R, n = x.shape
+    qs = np.asarray(qs, dtype=np.float64)
+    lo = x.min(axis=1, keepdims=True)
+    span = (x.max(axis=1, keepdims=True) - lo).astype(np.float64)
+    span[span <= 0] = 1.0
+    b = x - lo
+    b *= (bins / span).astype(x.dtype)
+    b = b.astype(np.int32)
+    np.minimum(b, bins - 1, out=b)
+    b += (np.arange(R, dtype=np.int32) * bins)[:, None]
+    counts = np.bincount(b.ravel(), minlength=R * bins)
+    cdf = np.cumsum(counts.reshape(R, bins), axis=1)
+
+    # cdf-ul fiecărui rând se termină în n => cu offset rând*n totul e crescător: un singur searchsorted
+    row_off = (np.arange(R) * n)[:, None]
+    target = qs[None, :] * (n - 1) + 0.5                      # rang în [0.5, n-0.5]
+    pos = np.searchsorted((cdf + row_off).ravel(), (target + row_off).ravel()).reshape(R, -1)
+    pos = np.minimum(pos, (np.arange(R) * bins + bins - 1)[:, None])
+    j = pos - (np.arange(R) * bins)[:, None]                 # bin-ul care conține rangul
+    cdf_flat = cdf.ravel()
+    below = np.where(j > 0, cdf_flat[np.maximum(pos - 1, 0)], 0)
+    inside = np.maximum(counts[pos], 1)
+    frac = np.clip((target - below) / inside, 0.0, 1.0)
+    return lo + (j + frac) * (span / bins)
@@ -0,0 +1,267 @@
+from __future__ import annotations
+
+"""
+Hyperparameter search for the baseline boosters (roadmap: tuning lunar)
+- Features/labels built once per (ticker, horizon) with the same code as training, dumped to
+  .npy and opened read-only (mmap) by every worker => one copy in the page cache, no pickling
+- Random configs (depth, learning rate, subsample, min_samples_leaf) run in a process pool
+- Successive halving on n_estimators: every survivor grows with warm_start to the next rung,
+  the validation loss comes from staged predictions (best iteration inside the rung), and
+  only the best 1/eta continue => hopeless configs stop after the first rung
+- Winner saved as tuned_{TICKER}_{h}d.json next to the artifacts; TrainConfig.with_tuned() loads it
+- Report: wall time, CPU-seconds summed over workers, loss of sklearn defaults vs the winner
+
+Usage:
+    python -m app.ml.pipeline.tuning --ticker AAPL --horizon 7 [--trials 24] [--jobs 4] [--synth]
+"""
+
+import argparse
+import json
+import math
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+
+from app.ml.features.indicators import add_indicators
+from app.ml.pipeline import train_baseline
+from app.ml.pipeline.train_baseline import TrainConfig, _label_targets, _prep_xy, _time_splits
+
+SEARCH_SPACE: Dict[str, List[Any]] = {
+    "max_depth": [2, 3, 4, 5],
+    "learning_rate": [0.02, 0.05, 0.1, 0.2],
+    "subsample": [0.6, 0.8, 1.0],
+    "min_samples_leaf": [1, 10, 30, 60],
+}
+_EPS = 1e-12
+
+# matricile partajate, deschise o singură dată per proces (initializer)
+_DATA: Dict[str, np.ndarray] = {}
+
+
+# ---------------------------
+# Matrici (o singură dată per ticker/orizont)
+# ---------------------------
+
+def build_matrices(df_raw, cfg: TrainConfig, out_dir: str) -> Dict[str, Any]:
+    """add_indicators + labels + splits once; arrays saved as .npy in `out_dir`."""
+    df = _label_targets(add_indicators(df_raw), cfg.horizon_days, cfg.direction_threshold)
+    X, y_cls, y_reg, features = _prep_xy(df)
+    tr, va, te = _time_splits(len(df), cfg.val_ratio, cfg.test_ratio)
+    arrays = {"X": np.ascontiguousarray(X, dtype=np.float64), "y_cls": y_cls.astype(np.int64),
+              "y_reg": y_reg.astype(np.float64)}
+    for name, arr in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), arr)
+    return {"dir": out_dir, "features": features, "splits": [(s.start, s.stop) for s in (tr, va, te)]}
+
+
+def _attach(data_dir: str, splits: List[Tuple[int, int]]) -> None:
+    if _DATA.get("_dir") == data_dir:
+        return
+    _DATA.clear()
+    _DATA["_dir"] = data_dir
+    for name in ("X", "y_cls", "y_reg"):
+        _DATA[name] = np.load(os.path.join(data_dir, f"{name}.npy"), mmap_mode="r")
+    _DATA["splits"] = [slice(a, b) for a, b in splits]
+
+
+# ---------------------------
+# Trials
+# ---------------------------
+
+def _model(kind: str, params: Dict[str, Any], random_state: int):
+    est = GradientBoostingClassifier if kind == "cls" else GradientBoostingRegressor
+    return est(random_state=random_state, warm_start=True, **params)
+
+
+def _staged_losses(kind: str, model, X: np.ndarray, y: np.ndarray) -> np.ndarray:
+    """Validation loss after every stage: log-loss (cls) or MSE (reg)."""
+    if kind == "cls":
+        return np.array([-np.mean(y * np.log(p[:, 1] + _EPS) + (1 - y) * np.log(p[:, 0] + _EPS))
+                         for p in model.staged_predict_proba(X)])
+    return np.array([np.mean((y - p) ** 2) for p in model.staged_predict(X)])
+
+
+def _run_trial(task: Tuple) -> Dict[str, Any]:
+    """Grow one config to `n_estimators` (warm start if `model` is given) and score it on validation."""
+    trial_id, kind, params, model, n_estimators, random_state, data_dir, splits = task
+    _attach(data_dir, splits)
+    c0 = time.process_time()
+    tr, va, _ = _DATA["splits"]
+    X, y = _DATA["X"], _DATA["y_cls" if kind == "cls" else "y_reg"]
+    if model is None:
+        model = _model(kind, params, random_state)
+    model.set_params(n_estimators=n_estimators)
+    model.fit(X[tr], y[tr])
+    losses = _staged_losses(kind, model, X[va], y[va])
+    best = int(np.argmin(losses))
+    return {"trial": trial_id, "model": model, "loss": float(losses[best]), "best_iter": best + 1,
+            "cpu_s": time.process_time() - c0}
+
+
+def sample_configs(n: int, seed: int = 42) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    seen, out = set(), []
+    total = math.prod(len(v) for v in SEARCH_SPACE.values())
+    while len(out) < min(n, total):
+        cfg = {k: v[int(rng.integers(len(v)))] for k, v in SEARCH_SPACE.items()}
+        key = tuple(cfg.values())
+        if key not in seen:
+            seen.add(key)
+            out.append({k: (v.item() if hasattr(v, "item") else v) for k, v in cfg.items()})
+    return out
+
+
+def _rungs(min_estimators: int, max_estimators: int, eta: int) -> List[int]:
+    rungs, r = [], max(1, min_estimators)
+    while r < max_estimators:
+        rungs.append(r)
+        r *= eta
+    return rungs + [max_estimators]
+
+
+def successive_halving(kind: str, configs: List[Dict[str, Any]], data: Dict[str, Any], pool,
+                       min_estimators: int = 50, max_estimators: int = 400, eta: int = 2,
+                       random_state: int = 42) -> Dict[str, Any]:
+    state = {i: {"params": p, "model": None} for i, p in enumerate(configs)}
+    alive = list(state)
+    history = []
+    cpu_s = 0.0
+    trees = 0
+    prev = 0
+    for rung in _rungs(min_estimators, max_estimators, eta):
+        trees += len(alive) * (rung - prev)  # warm_start: doar arborii noi se construiesc
+        prev = rung
+        tasks = [(i, kind, state[i]["params"], state[i]["model"], rung, random_state, data["dir"], data["splits"])
+                 for i in alive]
+        results = list(pool.map(_run_trial, tasks)) if pool else [_run_trial(t) for t in tasks]
+        for r in results:
+            state[r["trial"]].update(model=r["model"], loss=r["loss"], best_iter=r["best_iter"])
+            cpu_s += r["cpu_s"]
+        results.sort(key=lambda r: r["loss"])
+        history.append({"n_estimators": rung, "trials": len(results), "best_loss": results[0]["loss"]})
+        alive = [r["trial"] for r in results[:max(1, math.ceil(len(results) / eta))]]
+
+    best = state[alive[0]]
+    winner = dict(best["params"], n_estimators=int(best["best_iter"]))
+    return {"params": winner, "val_loss": best["loss"], "rungs": history, "cpu_s": cpu_s,
+            "trees": trees, "trees_without_pruning": len(configs) * max_estimators}
+
+
+def _test_loss(kind: str, params: Dict[str, Any], random_state: int) -> Tuple[float, float]:
+    """Fit on train with `params`, return (validation loss, test loss) at the final stage."""
+    tr, va, te = _DATA["splits"]
+    X, y = _DATA["X"], _DATA["y_cls" if kind == "cls" else "y_reg"]
+    est = GradientBoostingClassifier if kind == "cls" else GradientBoostingRegressor
+    m = est(random_state=random_state, **params).fit(X[tr], y[tr])
+    return float(_staged_losses(kind, m, X[va], y[va])[-1]), float(_staged_losses(kind, m, X[te], y[te])[-1])
+
+
+# ---------------------------
+# Entry point
+# ---------------------------
+
+def tune(df_raw, cfg: TrainConfig, n_trials: int = 24, n_jobs: Optional[int] = None,
+         min_estimators: int = 50, max_estimators: int = 400, eta: int = 2, seed: int = 42,
+         kinds: Tuple[str, ...] = ("cls", "reg"), save: bool = True) -> Dict[str, Any]:
+    n_jobs = max(1, int(n_jobs or os.cpu_count() or 1))
+    t0 = time.perf_counter()
+    c0 = time.process_time()
+    tmp = tempfile.mkdtemp(prefix="tune-")
+    try:
+        data = build_matrices(df_raw, cfg, tmp)
+        _attach(data["dir"], data["splits"])
+        build_s = time.perf_counter() - t0
+        configs = sample_configs(n_trials, seed)
+        pool = (ProcessPoolExecutor(max_workers=n_jobs, initializer=_attach, initargs=(data["dir"], data["splits"]))
+                if n_jobs > 1 else None)
+        try:
+            studies = {kind: successive_halving(kind, configs, data, pool, min_estimators, max_estimators,
+                                                eta, cfg.random_state)
+                       for kind in kinds}
+        finally:
+            if pool:
+                pool.shutdown()
+
+        report: Dict[str, Any] = {"ticker": cfg.ticker.upper(), "horizon_days": cfg.horizon_days,
+                                  "n_jobs": n_jobs, "n_trials": len(configs), "build_matrices_s": build_s,
+                                  "n_rows": int(_DATA["X"].shape[0]), "features": data["features"]}
+        workers_cpu = 0.0
+        for kind, st in studies.items():
+            default_val, default_test = _test_loss(kind, {}, cfg.random_state)
+            best_val, best_test = _test_loss(kind, st["params"], cfg.random_state)
+            workers_cpu += st["cpu_s"] if pool else 0.0
+            report[kind] = {
+                "params": st["params"], "loss": "log_loss" if kind == "cls" else "mse",
+                "default": {"val": default_val, "test": default_test},
+                "tuned": {"val": best_val, "test": best_test},
+                "test_gain_pct": (default_test - best_test) / default_test * 100 if default_test else 0.0,
+                "rungs": st["rungs"], "trees": st["trees"], "trees_without_pruning": st["trees_without_pruning"],
+            }
+        report["wall_s"] = time.perf_counter() - t0
+        # procesele din pool își raportează singure timpul CPU; procesul părinte îl adaugă pe al lui
+        report["cpu_s"] = time.process_time() - c0 + workers_cpu
+    finally:
+        _DATA.clear()
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    if save:
+        save_tuned(cfg.ticker, cfg.horizon_days, report)
+    return report
+
+
+def tuned_path(ticker: str, horizon_days: int) -> str:
+    return os.path.join(train_baseline.ART_DIR, f"tuned_{ticker.upper()}_{horizon_days}d.json")
+
+
+def save_tuned(ticker: str, horizon_days: int, report: Dict[str, Any]) -> str:
+    os.makedirs(train_baseline.ART_DIR, exist_ok=True)
+    path = tuned_path(ticker, horizon_days)
+    doc = {"cls_params": report.get("cls", {}).get("params"), "reg_params": report.get("reg", {}).get("params"),
+           "tuned_at": time.time(), "report": report}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(doc, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def main(argv: List[str] | None = None) -> Dict[str, Any]:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--ticker", required=True)
+    ap.add_argument("--horizon", type=int, default=7)
+    ap.add_argument("--trials", type=int, default=24)
+    ap.add_argument("--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    ap.add_argument("--min-estimators", type=int, default=50)
+    ap.add_argument("--max-estimators", type=int, default=400)
+    ap.add_argument("--eta", type=int, default=2)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--synth", action="store_true", help="synthetic candles instead of provider history")
+    args = ap.parse_args(argv)
+
+    if args.synth:
+        from app.ml.data.synth import synth_candles
+        df = synth_candles(n=1500, seed=11)
+    else:
+        from app.services.ml_integration import _history_df
+        df = _history_df(args.ticker.upper(), period="5y", interval="1d")
+
+    report = tune(df, TrainConfig(ticker=args.ticker, horizon_days=args.horizon), n_trials=args.trials,
+                  n_jobs=args.jobs, min_estimators=args.min_estimators, max_estimators=args.max_estimators,
+                  eta=args.eta, seed=args.seed)
+    for kind in ("cls", "reg"):
+        r = report[kind]
+        print(f"{kind}: {r['params']}  {r['loss']} test {r['default']['test']:.4f} -> {r['tuned']['test']:.4f} "
+              f"({r['test_gain_pct']:+.1f}%), trees {r['trees']}/{r['trees_without_pruning']}")
+    print(f"wall {report['wall_s']:.1f} s, cpu {report['cpu_s']:.1f} s, jobs {report['n_jobs']}")
+    print("saved ->", tuned_path(args.ticker, args.horizon))
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+from __future__ import annotations
+
+"""
+Buy / hold / sell thresholds that maximize expected value after costs (roadmap: EV optimizer)
+- Inputs: resolved predictions (P(up), expected change %, reward-to-risk) and the realized
+  change % over the horizon; a trade earns realized - cost (buy) or -realized - cost (sell)
+- Buy fires when every threshold is met on (P(up), exp, rr); sell mirrors it on
+  (P(down), -exp, rr). Both sides need P >= 0.5, so they never overlap
+- One feature: rows sorted by score once, every cut evaluated with one cumsum (exact, O(n log n))
+- Several features: gains and counts accumulated per cell of a quantile grid; a suffix sum per
+  axis gives the EV and trade count of every threshold combination at once
+  (O(n + cells) instead of O(n x cells) for a brute-force grid)
+- Incremental: the per-cell tables are additive, so new outcomes are added and rows leaving the
+  rolling window subtracted without rescanning the window; the grid is rebuilt when the window
+  has changed size a lot since its quantiles were taken
+- Artifacts: policy_{h}d.json (thresholds, a few hundred bytes, atomic write) and
+  policy_{h}d.npz (grid + tables for the next incremental update)
+"""
+
+import json
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+FEATURES = ("prob", "exp", "rr")
+SIDES = ("buy", "sell")
+_FLOORS = {"prob": 0.5}  # P(up) >= 0.5 pentru buy, P(down) >= 0.5 pentru sell => laturi disjuncte
+
+
+def side_features(prob: np.ndarray, exp: np.ndarray, rr: np.ndarray, side: str,
+                  features: Sequence[str] = FEATURES) -> np.ndarray:
+    """(n, len(features)) scores where higher = stronger signal for `side` (prob as 0..1)."""
+    prob = np.asarray(prob, dtype=np.float64)
+    exp = np.asarray(exp, dtype=np.float64)
+    cols = {"prob": prob if side == "buy" else 1.0 - prob,
+            "exp": exp if side == "buy" else -exp,
+            "rr": np.asarray(rr, dtype=np.float64)}
+    return np.column_stack([cols[f] for f in features])
+
+
+def _candidates(prob: np.ndarray, exp: np.ndarray, rr: np.ndarray, side: str,
+                features: Sequence[str]) -> np.ndarray:
+    """side_features with rows below the side's P >= 0.5 floor set to NaN (never traded on that side)."""
+    X = side_features(prob, exp, rr, side, features)
+    p = side_features(prob, exp, rr, side, ("prob",))[:, 0]
+    X[~(p >= _FLOORS["prob"])] = np.nan
+    return X
+
+
+def side_gain(realized: np.ndarray, side: str, cost_pct: float) -> np.ndarray:
+    r = np.asarray(realized, dtype=np.float64)
+    return (r if side == "buy" else -r) - cost_pct
+
+
+# ---------------------------
+# One feature: sort + cumsum
+# ---------------------------
+
+def best_cut_1d(score: np.ndarray, gain: np.ndarray, min_trades: int = 1) -> Tuple[Optional[float], float, int]:
+    """
+    Threshold t maximizing sum(gain[score >= t]) -> (t, ev_sum, trades).
+    (None, 0, 0) when no cut with at least `min_trades` trades has a positive EV.
+    """
+    score = np.asarray(score, dtype=np.float64)
+    gain = np.asarray(gain, dtype=np.float64)
+    ok = ~np.isnan(score) & ~np.isnan(gain)
+    score, gain = score[ok], gain[ok]
+    order = np.argsort(-score, kind="stable")
+    s, cs = score[order], np.cumsum(gain[order])
+    # doar ultimul rând din fiecare grup de scoruri egale (pragul le ia pe toate sau pe niciunul)
+    ends = np.flatnonzero(np.r_[s[1:] != s[:-1], True]) if len(s) else np.empty(0, dtype=np.int64)
+    ends = ends[ends + 1 >= max(1, min_trades)]
+    if not len(ends):
+        return None, 0.0, 0
+    k = ends[int(np.argmax(cs[ends]))]
+    if cs[k] <= 0:
+        return None, 0.0, 0
+    return float(s[k]), float(cs[k]), int(k + 1)
+
+
+# ---------------------------
+# Several features: prefix-sum tables
+# ---------------------------
+
+def candidate_edges(x: np.ndarray, bins: int, floor: float | None = None) -> np.ndarray:
+    """Ascending candidate thresholds: the floor (or -inf = no filter) plus inner quantiles of x."""
+    lo = -np.inf if floor is None else float(floor)
+    x = np.asarray(x, dtype=np.float64)
+    x = x[~np.isnan(x) & (x >= lo)]
+    q = np.quantile(x, np.linspace(0, 1, max(2, bins), endpoint=False)[1:]) if len(x) else np.empty(0)
+    return np.unique(np.r_[lo, q[q > lo]])
+
+
+def _suffix_sum(a: np.ndarray) -> np.ndarray:
+    for ax in range(a.ndim):
+        a = np.flip(np.cumsum(np.flip(a, ax), axis=ax), ax)
+    return a
+
+
+class ThresholdTable:
+    """
+    Gain sum and row count per grid cell; cell k on an axis holds edges[k] <= x < edges[k+1].
+    After a suffix sum, entry (k1, k2, ...) = all rows with x_j >= edges[j][k_j] for every j.
+    """
+
+    def __init__(self, edges: Sequence[np.ndarray]):
+        self.edges = [np.asarray(e, dtype=np.float64) for e in edges]
+        self.shape = tuple(len(e) for e in self.edges)
+        self.gain = np.zeros(self.shape, dtype=np.float64)
+        self.count = np.zeros(self.shape, dtype=np.int64)
+
+    @property
+    def cells(self) -> int:
+        return int(self.gain.size)
+
+    def _flat(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        idx = [np.searchsorted(e, X[:, j], side="right") - 1 for j, e in enumerate(self.edges)]
+        keep = ~np.isnan(X).any(axis=1)
+        for i in idx:
+            keep &= i >= 0  # sub podea (ex: P < 0.5) => rândul nu e candidat pentru latura asta
+        return np.ravel_multi_index(tuple(i[keep] for i in idx), self.shape), keep
+
+    def add(self, X: np.ndarray, gain: np.ndarray, sign: int = 1) -> None:
+        """Accumulate rows (sign=-1 removes rows added earlier, ex: leaving the window)."""
+        flat, keep = self._flat(np.asarray(X, dtype=np.float64))
+        g = np.asarray(gain, dtype=np.float64)[keep]
+        self.gain += sign * np.bincount(flat, weights=g, minlength=self.cells).reshape(self.shape)
+        self.count += sign * np.bincount(flat, minlength=self.cells).reshape(self.shape)
+
+    def solve(self, min_trades: int = 1) -> Tuple[Optional[List[float]], float, int]:
+        """Best threshold per axis -> (thresholds, ev_sum, trades); None when no positive EV."""
+        ev = _suffix_sum(self.gain)
+        n = _suffix_sum(self.count)
+        ev = np.where(n >= max(1, min_trades), ev, -np.inf)
+        k = np.unravel_index(int(np.argmax(ev)), self.shape)
+        if not ev[k] > 0:
+            return None, 0.0, 0
+        return [float(e[i]) for e, i in zip(self.edges, k)], float(ev[k]), int(n[k])
+
+
+# ---------------------------
+# Policy (persisted thresholds)
+# ---------------------------
+
+@dataclass
+class Policy:
+    horizon_days: int
+    features: List[str] = field(default_factory=lambda: list(FEATURES))
+    buy: Optional[Dict[str, float]] = None   # prag minim per feature; cheie lipsă = fără filtru; None = niciodată
+    sell: Optional[Dict[str, float]] = None  # pe (P(down), -exp, rr)
+    cost_pct: float = 0.0
+    stats: Dict = field(default_factory=dict)  # ev_pct / trades per latură, n, fereastra
+    fitted_at: float = 0.0
+
+    def decide(self, prob: np.ndarray, exp: np.ndarray, rr: np.ndarray) -> np.ndarray:
+        """'buy' | 'sell' | 'hold' per row (prob as 0..1)."""
+        prob = np.atleast_1d(np.asarray(prob, dtype=np.float64))
+        out = np.full(len(prob), "hold", dtype=object)
+        for side in ("sell", "buy"):
+            th = getattr(self, side)
+            if th is None:
+                continue
+            X = _candidates(prob, np.atleast_1d(exp), np.atleast_1d(rr), side, FEATURES)
+            hit = ~np.isnan(X[:, 0])
+            for j, f in enumerate(FEATURES):
+                if f in th:
+                    hit &= X[:, j] >= th[f]
+            out[hit] = side
+        return out
+
+    def to_dict(self) -> Dict:
+        return {"horizon_days": self.horizon_days, "features": self.features, "buy": self.buy,
+                "sell": self.sell, "cost_pct": self.cost_pct, "stats": self.stats, "fitted_at": self.fitted_at}
+
+    @classmethod
+    def from_dict(cls, d: Dict) -> "Policy":
+        return cls(horizon_days=int(d["horizon_days"]), features=list(d.get("features", FEATURES)),
+                   buy=d.get("buy"), sell=d.get("sell"), cost_pct=float(d.get("cost_pct", 0.0)),
+                   stats=dict(d.get("stats", {})), fitted_at=float(d.get("fitted_at", 0.0)))
+
+    def save(self, path: str) -> None:
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Policy":
+        with open(path, encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+
+def _thresholds(features: Sequence[str], values: Optional[Sequence[float]]) -> Optional[Dict[str, float]]:
+    if values is None:
+        return None
+    # -inf = fără filtru; podeaua lui prob e implicită în decide()
+    return {f: round(v, 6) for f, v in zip(features, values) if np.isfinite(v) and v > _FLOORS.get(f, -np.inf)}
+
+
+def smooth(old: Optional[Policy], new: Policy, alpha: float) -> Policy:
+    """
+    Move thresholds only `alpha` of the way towards the new optimum (less churn from one noisy
+    window). A side switched off by the optimizer stays off; features new to a side are taken as is.
+    """
+    if old is None or alpha >= 1.0:
+        return new
+    for side in SIDES:
+        th, prev = getattr(new, side), getattr(old, side)
+        if th is None or prev is None:
+            continue
+        setattr(new, side, {f: round(prev[f] + alpha * (v - prev[f]), 6) if f in prev else v
+                            for f, v in th.items()})
+    return new
+
+
+def fit_policy(horizon_days: int, prob: np.ndarray, exp: np.ndarray, rr: np.ndarray, realized: np.ndarray,
+               cost_pct: float, features: Sequence[str] = FEATURES, bins: int = 32,
+               min_trades: int = 30) -> Policy:
+    """Full (non-incremental) fit: exact sort + cumsum for one feature, prefix-sum grid otherwise."""
+    features = list(features)
+    if len(features) > 1:
+        opt = PolicyOptimizer.build(horizon_days, prob, exp, rr, realized, cost_pct, features, bins)
+        return opt.solve(min_trades)
+    f = features[0]
+    pol = Policy(horizon_days, features, cost_pct=cost_pct, stats={"n": int(len(realized))}, fitted_at=time.time())
+    for side in SIDES:
+        score = _candidates(prob, exp, rr, side, features)[:, 0]
+        t, ev, trades = best_cut_1d(score, side_gain(realized, side, cost_pct), min_trades)
+        setattr(pol, side, _thresholds(features, None if t is None else [t]))
+        pol.stats[side] = {"ev_pct": round(ev, 4), "trades": trades}
+    return pol
+
+
+class PolicyOptimizer:
+    """Per-horizon grid tables for both sides, updated as outcomes enter and leave the window."""
+
+    def __init__(self, horizon_days: int, features: Sequence[str], edges: Dict[str, List[np.ndarray]],
+                 cost_pct: float):
+        self.horizon_days = int(horizon_days)
+        self.features = list(features)
+        self.cost_pct = float(cost_pct)
+        self.tables = {side: ThresholdTable(edges[side]) for side in SIDES}
+        self.n = 0
+        self.n_built = 0  # rânduri la momentul în care s-au luat cuantilele grilei
+        self.start = 0.0  # fereastra acoperită [start, until) pe created_at (epoch s)
+        self.until = 0.0
+
+    @classmethod
+    def build(cls, horizon_days: int, prob: np.ndarray, exp: np.ndarray, rr: np.ndarray, realized: np.ndarray,
+              cost_pct: float, features: Sequence[str] = FEATURES, bins: int = 32) -> "PolicyOptimizer":
+        edges = {}
+        for side in SIDES:
+            X = _candidates(prob, exp, rr, side, features)
+            edges[side] = [candidate_edges(X[:, j], bins, _FLOORS.get(f)) for j, f in enumerate(features)]
+        opt = cls(horizon_days, features, edges, cost_pct)
+        opt.update(prob, exp, rr, realized)
+        opt.n_built = opt.n
+        return opt
+
+    def update(self, prob: np.ndarray, exp: np.ndarray, rr: np.ndarray, realized: np.ndarray, sign: int = 1) -> None:
+        for side in SIDES:
+            self.tables[side].add(_candidates(prob, exp, rr, side, self.features),
+                                  side_gain(realized, side, self.cost_pct), sign)
+        self.n += sign * len(realized)
+
+    @property
+    def stale(self) -> bool:
+        """Grid quantiles no longer describe the window (it doubled or halved since the build)."""
+        return self.n > 2 * self.n_built or 2 * self.n < self.n_built
+
+    def solve(self, min_trades: int = 30) -> Policy:
+        pol = Policy(self.horizon_days, self.features, cost_pct=self.cost_pct, fitted_at=time.time(),
+                     stats={"n": self.n, "window": [self.start, self.until]})
+        for side in SIDES:
+            values, ev, trades = self.tables[side].solve(min_trades)
+            setattr(pol, side, _thresholds(self.features, values))
+            pol.stats[side] = {"ev_pct": round(ev, 4), "trades": trades}
+        return pol
+
+    def save(self, path: str) -> None:
+        arrays = {}
+        for side, tab in self.tables.items():
+            for j, e in enumerate(tab.edges):
+                arrays[f"{side}_edges_{j}"] = e
+            arrays[f"{side}_gain"], arrays[f"{side}_count"] = tab.gain, tab.count
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, features=np.array(self.features), horizon_days=self.horizon_days, cost_pct=self.cost_pct,
+                 n=self.n, n_built=self.n_built, start=self.start, until=self.until, **arrays)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> "PolicyOptimizer":
+        with np.load(path) as z:
+            features = [str(f) for f in z["features"]]
+            edges = {side: [z[f"{side}_edges_{j}"] for j in range(len(features))] for side in SIDES}
+            opt = cls(int(z["horizon_days"]), features, edges, float(z["cost_pct"]))
+            for side in SIDES:
+                opt.tables[side].gain[...] = z[f"{side}_gain"]
+                opt.tables[side].count[...] = z[f"{side}_count"]
+            opt.n, opt.n_built = int(z["n"]), int(z["n_built"])
+            opt.start, opt.until = float(z["start"]), float(z["until"])
+        return opt
+
+
+def policy_path(art_dir: str, horizon_days: int) -> str:
+    return os.path.join(art_dir, f"policy_{int(horizon_days)}d.json")
+
+
+def optimizer_path(art_dir: str, horizon_days: int) -> str:
+    return os.path.join(art_dir, f"policy_{int(horizon_days)}d.npz")
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, ConfigDict
 from datetime import datetime
+from typing import Any, Dict, Optional
 
 class PredictionIn(BaseModel):
     ticker: str = Field(..., min_length=1, max_length=16)
@@ -15,5 +16,7 @@ class PredictionOut(BaseModel):
     reward_to_risk: float
     rationale: str
     created_at: datetime
+    # benzi conformal (q10/q50/q90 în %, coverage, vol_bin); None când artefactul nu are index
+    bands: Optional[Dict[str, Any]] = None
 
     model_config = ConfigDict(from_attributes=True)
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+"""
+Intraday bars from the live quote stream (roadmap: 1-5m micro-model, intraday views)
+- Fed by the shared quote poller (quote_hub) for the current universe: one subscription,
+  no extra upstream calls; each price change updates the ticker's current 1m and 5m bar
+- Per ticker: two fixed-size NumPy rings (1m, 5m) => memory bounded per ticker, and at most
+  `max_tickers` tickers (LRU)
+- Reads: binary search for the window start + copy of the requested bars (O(bars requested));
+  2m is resampled from 1m, 15m/30m/60m/90m/1h from 5m, on the fly (session-aware, resample.py)
+- Provider history only backfills what the stream did not see (before the feed started or
+  before a ticker's first quote today); merged once, then served from memory
+- Only symbols the feed is subscribed to are served (and only once quoted): anything else
+  (outside today's universe / this worker's shard) gets None => provider, never frozen bars
+- Quotes carry no volume: live bars have v=0, backfilled bars keep the provider's volume
+"""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.resample import resample
+
+_COLS = ("o", "h", "l", "c", "v")
+# interval cerut -> (ring sursă, secunde per bară)
+ROLLUPS = {
+    "1m": ("1m", 60), "2m": ("1m", 120), "5m": ("5m", 300), "15m": ("5m", 900),
+    "30m": ("5m", 1800), "60m": ("5m", 3600), "1h": ("5m", 3600), "90m": ("5m", 5400),
+}
+
+BackfillFetcher = Callable[[str, str], Optional[Dict[str, np.ndarray]]]
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    out = {"t": np.empty(0, dtype="int64")}
+    out.update({k: np.empty(0, dtype="float64") for k in _COLS})
+    return out
+
+
+class BarRing:
+    """Last `capacity` bars of one interval; t is strictly increasing in logical order."""
+
+    def __init__(self, seconds: int, capacity: int):
+        self.seconds = int(seconds)
+        self.capacity = int(capacity)
+        self.t = np.zeros(self.capacity, dtype=np.int64)
+        self.x = np.zeros((5, self.capacity), dtype=np.float64)  # o, h, l, c, v
+        self._start = 0
+        self.n = 0
+        self.covered_from: Optional[int] = None  # de aici încolo seria e completă (stream/backfill)
+
+    @property
+    def nbytes(self) -> int:
+        return self.t.nbytes + self.x.nbytes
+
+    def _last(self) -> int:
+        return (self._start + self.n - 1) % self.capacity
+
+    def update(self, ts: float, price: float) -> None:
+        bucket = int(ts) - int(ts) % self.seconds
+        if self.n:
+            i = self._last()
+            last_t = int(self.t[i])
+            if bucket == last_t:
+                x = self.x[:, i]
+                x[1] = max(x[1], price)
+                x[2] = min(x[2], price)
+                x[3] = price
+                return
+            if bucket < last_t or price == self.x[3, i]:
+                return  # citire întârziată / fără schimbare de preț => nicio bară nouă
+        if self.n == self.capacity:
+            i = self._start
+            self._start = (self._start + 1) % self.capacity
+        else:
+            i = (self._start + self.n) % self.capacity
+            self.n += 1
+        self.t[i] = bucket
+        self.x[:, i] = (price, price, price, price, 0.0)
+
+    def _segments(self):
+        end = self._start + self.n
+        if end <= self.capacity:
+            return [(self._start, end)]
+        return [(self._start, self.capacity), (0, end - self.capacity)]
+
+    def window(self, since: int = 0) -> Dict[str, np.ndarray]:
+        """Bars with t >= since, oldest first."""
+        parts = []
+        for a, b in self._segments():
+            k = a + int(np.searchsorted(self.t[a:b], since, side="left"))
+            if k < b:
+                parts.append((k, b))
+        if not parts:
+            return _empty()
+        t = np.concatenate([self.t[a:b] for a, b in parts])
+        x = np.concatenate([self.x[:, a:b] for a, b in parts], axis=1)
+        out = {"t": t}
+        out.update({k: x[j] for j, k in enumerate(_COLS)})
+        return out
+
+    def first_t(self) -> Optional[int]:
+        return int(self.t[self._start]) if self.n else None
+
+    def replace(self, cols: Dict[str, np.ndarray]) -> None:
+        """Reload from sorted columns (keeps the newest `capacity` bars)."""
+        t = np.asarray(cols["t"], dtype=np.int64)[-self.capacity:]
+        self.n = len(t)
+        self._start = 0
+        self.t[:self.n] = t
+        for j, k in enumerate(_COLS):
+            self.x[j, :self.n] = np.asarray(cols[k], dtype=np.float64)[-self.capacity:]
+
+
+def rollup(cols: Dict[str, np.ndarray], seconds: int) -> Dict[str, np.ndarray]:
+    """Epoch-aligned `seconds` buckets (fills the 5m ring from 1m bars, same grid as live updates)."""
+    t = cols["t"]
+    if len(t) == 0:
+        return cols
+    key = t - t % seconds
+    idx = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    last = np.r_[idx[1:] - 1, len(t) - 1]
+    return {
+        "t": key[idx], "o": cols["o"][idx], "c": cols["c"][last],
+        "h": np.maximum.reduceat(cols["h"], idx), "l": np.minimum.reduceat(cols["l"], idx),
+        "v": np.add.reduceat(cols["v"], idx),
+    }
+
+
+def merge_backfill(live: Dict[str, np.ndarray], hist: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """
+    Union by bar time. Provider bars win for completed bars (real volume); the newest live
+    bar stays, it is still being built.
+    """
+    if len(live["t"]) == 0:
+        return hist
+    cutoff = int(live["t"][-1])
+    keep_hist = hist["t"] < cutoff
+    keep_live = ~np.isin(live["t"], hist["t"][keep_hist])
+    t = np.concatenate([hist["t"][keep_hist], live["t"][keep_live]])
+    order = np.argsort(t, kind="stable")
+    out = {"t": t[order]}
+    for k in _COLS:
+        out[k] = np.concatenate([hist[k][keep_hist], live[k][keep_live]])[order]
+    return out
+
+
+class BarAggregator:
+    def __init__(self, cap_1m: int | None = None, cap_5m: int | None = None, max_tickers: int | None = None,
+                 clock: Callable[[], float] = time.time):
+        self.cap_1m = int(cap_1m or settings.bars_1m_capacity)
+        self.cap_5m = int(cap_5m or settings.bars_5m_capacity)
+        self.max_tickers = int(max_tickers or settings.bars_max_tickers)
+        self._clock = clock
+        self._series: "OrderedDict[str, Dict[str, BarRing]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.live_since: Optional[float] = None  # None => feed oprit, citirile merg la provider
+        self.symbols: frozenset = frozenset()  # simbolurile abonate de feed; restul => provider
+        self.backfills = 0
+
+    @property
+    def live(self) -> bool:
+        return self.live_since is not None
+
+    def start(self, symbols: Iterable[str] = ()) -> None:
+        with self._lock:
+            self.live_since = self._clock()
+            self.symbols = frozenset(t.upper() for t in symbols)
+            # ce s-a întâmplat cât feed-ul a fost oprit e o gaură => backfill la următoarea citire
+            for rings in self._series.values():
+                for r in rings.values():
+                    r.covered_from = None
+
+    def set_symbols(self, symbols: Iterable[str]) -> None:
+        """New subscription set (universe refresh); re-added symbols missed quotes meanwhile."""
+        fresh = frozenset(t.upper() for t in symbols)
+        with self._lock:
+            for t in fresh - self.symbols:
+                for r in self._series.get(t, {}).values():
+                    r.covered_from = None
+            self.symbols = fresh
+
+    def stop(self) -> None:
+        self.live_since = None
+        self.symbols = frozenset()
+
+    def _get(self, ticker: str) -> Dict[str, BarRing]:
+        s = self._series.get(ticker)
+        if s is None:
+            s = {"1m": BarRing(60, self.cap_1m), "5m": BarRing(300, self.cap_5m)}
+            self._series[ticker] = s
+            while len(self._series) > self.max_tickers:
+                self._series.popitem(last=False)
+        self._series.move_to_end(ticker)
+        return s
+
+    def on_quotes(self, prices: Dict[str, float | None], ts: float | None = None) -> None:
+        ts = self._clock() if ts is None else ts
+        with self._lock:
+            for t, p in prices.items():
+                if p is not None and p == p:  # fără None / NaN
+                    for r in self._get(t.upper()).values():
+                        r.update(ts, float(p))
+
+    def history_columns(self, ticker: str, interval: str, since: int | None = None,
+                        backfill: Optional[BackfillFetcher] = None) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Bars for `interval` from `since` (default: start of the current UTC day), or None when
+        the interval is not intraday, the feed is off, the ticker is not subscribed or not quoted
+        yet, or there is nothing to serve.
+        """
+        if interval not in ROLLUPS or not self.live:
+            return None
+        base, seconds = ROLLUPS[interval]
+        t = ticker.strip().upper()
+        now = self._clock()
+        since = int(now - now % 86400) if since is None else int(since)
+        with self._lock:
+            # citirea nu alocă inele: un simbol neabonat n-ar mai primi cotații => bare înghețate
+            rings = self._series.get(t) if t in self.symbols else None
+            if rings is None:
+                return None
+            self._series.move_to_end(t)
+            ring = rings[base]
+            covered = ring.covered_from
+            if covered is None:
+                covered = max(int(self.live_since), ring.first_t() or int(now))
+        if covered > since and backfill is not None:
+            self._backfill(t, base, rings, since, backfill)
+        with self._lock:
+            cols = ring.window(since)
+        if len(cols["t"]) == 0:
+            return None
+        return cols if seconds == ring.seconds else resample(cols, interval)
+
+    def _backfill(self, ticker: str, base: str, rings: Dict[str, BarRing], since: int,
+                  fetch: BackfillFetcher) -> None:
+        try:
+            hist = fetch(ticker, base)
+        except Exception as e:
+            hist = None
+            logger.info("Bar backfill failed for {} ({}): {}", ticker, base, e)
+        # 1m acoperă și inelul de 5m; invers nu se poate
+        targets = [base, "5m"] if base == "1m" else [base]
+        with self._lock:
+            if hist is not None and len(hist["t"]):
+                self.backfills += 1
+                for name in targets:
+                    r = rings[name]
+                    h = hist if name == base else rollup(hist, r.seconds)
+                    r.replace(merge_backfill(r.window(0), h))
+            for name in targets:
+                # și când providerul nu are nimic: nu reîncercăm la fiecare citire
+                rings[name].covered_from = since
+
+    def stats(self) -> Dict:
+        with self._lock:
+            n = len(self._series)
+            nbytes = sum(r.nbytes for s in self._series.values() for r in s.values())
+        return {"live": self.live, "live_since": self.live_since, "tickers": n,
+                "bytes": nbytes, "backfills": self.backfills}
+
+
+bar_aggregator = BarAggregator()
+
+
+# ---------------------------
+# Feed
+# ---------------------------
+
+async def feed_loop(agg: BarAggregator | None = None, symbols: Callable[[], Iterable[str]] | None = None,
+                    refresh_seconds: float | None = None) -> None:
+    """Subscribe to quote_hub for the (local) universe and push every price batch into `agg`."""
+    from app.services.quote_stream import quote_hub
+
+    if symbols is None:
+        from app.services.sharding import local_universe
+        symbols = local_universe
+    agg = agg or bar_aggregator
+    refresh = float(refresh_seconds or settings.bars_universe_refresh_seconds)
+    current: List[str] = sorted(await asyncio.to_thread(lambda: list(symbols())))
+    sub = await quote_hub.subscribe(current)
+    agg.start(current)
+    logger.info("Bar aggregator fed from quote stream ({} symbols)", len(current))
+    next_refresh = time.monotonic() + refresh
+    try:
+        while True:
+            try:
+                batch = await asyncio.wait_for(sub.get(), timeout=refresh)
+                agg.on_quotes(batch)
+            except asyncio.TimeoutError:
+                pass
+            if time.monotonic() >= next_refresh:
+                next_refresh = time.monotonic() + refresh
+                fresh = sorted(await asyncio.to_thread(lambda: list(symbols())))
+                if fresh != current:
+                    quote_hub.unsubscribe(sub)
+                    current, sub = fresh, await quote_hub.subscribe(fresh)
+                    agg.set_symbols(current)
+    finally:
+        quote_hub.unsubscribe(sub)
+        agg.stop()
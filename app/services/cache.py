@@ -1,6 +1,34 @@
 from __future__ import annotations
+
+"""
+Cache backends
+- TTLCache: in-process dict (default, per worker)
+- SQLiteCache: file-based, shared by all workers on one host, no extra services
+- RedisCache: minimal RESP client (GET/SET PX/SCAN/DEL), shared across hosts
+- Values for shared backends use a compact codec: JSON header + raw NumPy buffers
+  (no pickle), so cached candle columns round-trip without per-row objects
+- make_cache() picks the backend from settings.cache_backend
+"""
+
+import json
+import os
+import socket
+import sqlite3
+import struct
+import threading
 import time
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Protocol, Tuple
+from urllib.parse import urlparse
+
+import numpy as np
+
+
+class CacheBackend(Protocol):
+    ttl: int
+    def get(self, key: str) -> Any: ...
+    def set(self, key: str, value: Any) -> None: ...
+    def clear(self) -> None: ...
+
 
 class TTLCache:
     def __init__(self, ttl_seconds: int = 5, maxsize: int = 2048):
@@ -25,3 +53,274 @@ class TTLCache:
         self._store[key] = (time.time(), value)
 
     def clear(self): self._store.clear()
+
+
+# ---------------------------
+# Value codec (shared backends)
+# ---------------------------
+
+_MAGIC = b"AC1"
+_ND = "__nd__"
+
+
+def encode_value(value: Any) -> bytes:
+    """
+    bytes = MAGIC | u32 header_len | JSON header | raw array buffers.
+    Arrays anywhere in dict/list values are replaced by {"__nd__": i} in the header.
+    """
+    arrays: List[np.ndarray] = []
+
+    def walk(v):
+        if isinstance(v, np.ndarray):
+            arrays.append(np.ascontiguousarray(v))
+            return {_ND: len(arrays) - 1}
+        if isinstance(v, dict):
+            return {str(k): walk(x) for k, x in v.items()}
+        if isinstance(v, (list, tuple)):
+            return [walk(x) for x in v]
+        if isinstance(v, np.generic):
+            return v.item()
+        return v
+
+    body = walk(value)
+    meta = [(a.dtype.str, list(a.shape)) for a in arrays]
+    header = json.dumps({"v": body, "a": meta}, separators=(",", ":")).encode("utf-8")
+    return b"".join([_MAGIC, struct.pack("<I", len(header)), header] + [a.tobytes() for a in arrays])
+
+
+def decode_value(raw: bytes) -> Any:
+    if raw[:3] != _MAGIC:
+        raise ValueError("unknown cache value encoding")
+    (hlen,) = struct.unpack_from("<I", raw, 3)
+    start = 7 + hlen
+    header = json.loads(raw[7:start])
+    mv = memoryview(raw)
+    arrays: List[np.ndarray] = []
+    offset = start
+    for dtype, shape in header["a"]:
+        dt = np.dtype(dtype)
+        count = int(np.prod(shape)) if shape else 1
+        # copy => array scriibil, independent de buffer-ul brut
+        arr = np.frombuffer(mv[offset:offset + count * dt.itemsize], dtype=dt).reshape(shape).copy()
+        arrays.append(arr)
+        offset += count * dt.itemsize
+
+    def walk(v):
+        if isinstance(v, dict):
+            if len(v) == 1 and _ND in v:
+                return arrays[v[_ND]]
+            return {k: walk(x) for k, x in v.items()}
+        if isinstance(v, list):
+            return [walk(x) for x in v]
+        return v
+
+    return walk(header["v"])
+
+
+# ---------------------------
+# SQLite (one host, many workers)
+# ---------------------------
+
+class SQLiteCache:
+    def __init__(self, path: str, ttl_seconds: int = 5, namespace: str = "default", maxsize: int = 100_000):
+        self.ttl = ttl_seconds
+        self.maxsize = maxsize
+        self.path = path
+        self.ns = namespace + ":"
+        self._local = threading.local()
+        self._sets = 0
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, expires REAL NOT NULL, v BLOB NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS cache_expires ON cache(expires)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str):
+        row = self._conn().execute(
+            "SELECT v FROM cache WHERE k = ? AND expires > ?", (self.ns + key, time.time())
+        ).fetchone()
+        return decode_value(row[0]) if row else None
+
+    def set(self, key: str, value: Any):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (k, expires, v) VALUES (?, ?, ?)",
+            (self.ns + key, time.time() + self.ttl, encode_value(value)),
+        )
+        self._sets += 1
+        if self._sets % 256 == 0:
+            # curățenie periodică: expirate + plafon de mărime
+            conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+            conn.execute(
+                "DELETE FROM cache WHERE k IN (SELECT k FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,),
+            )
+
+    def clear(self):
+        self._conn().execute("DELETE FROM cache WHERE k LIKE ?", (self.ns + "%",))
+
+
+# ---------------------------
+# Redis protocol (RESP2), no client library needed
+# ---------------------------
+
+class RedisCache:
+    def __init__(self, url: str, ttl_seconds: int = 5, namespace: str = "default", timeout: float = 2.0):
+        u = urlparse(url)
+        self.ttl = ttl_seconds
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 6379
+        self.db = int((u.path or "/0").lstrip("/") or 0)
+        self.password = u.password
+        self.timeout = timeout
+        self.ns = namespace + ":"
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._rfile = None
+
+    # --------------- low-level ---------------
+
+    def _connect(self):
+        s = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._sock, self._rfile = s, s.makefile("rb")
+        if self.password:
+            self._roundtrip("AUTH", self.password)
+        if self.db:
+            self._roundtrip("SELECT", str(self.db))
+
+    def _close(self):
+        try:
+            if self._sock is not None:
+                self._sock.close()
+        finally:
+            self._sock, self._rfile = None, None
+
+    @staticmethod
+    def _pack(*args) -> bytes:
+        out = [b"*%d\r\n" % len(args)]
+        for a in args:
+            b = a if isinstance(a, bytes) else str(a).encode("utf-8")
+            out.append(b"$%d\r\n%s\r\n" % (len(b), b))
+        return b"".join(out)
+
+    def _read(self):
+        line = self._rfile.readline()
+        if not line:
+            raise ConnectionError("redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise RuntimeError("redis error: " + rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            n = int(rest)
+            if n < 0:
+                return None
+            data = self._rfile.read(n + 2)
+            return data[:-2]
+        if kind == b"*":
+            n = int(rest)
+            return None if n < 0 else [self._read() for _ in range(n)]
+        raise RuntimeError(f"unexpected RESP reply: {line!r}")
+
+    def _roundtrip(self, *args):
+        self._sock.sendall(self._pack(*args))
+        return self._read()
+
+    def command(self, *args):
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._roundtrip(*args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt:
+                        raise
+
+    # --------------- cache API ---------------
+
+    def get(self, key: str):
+        raw = self.command("GET", self.ns + key)
+        return decode_value(raw) if raw else None
+
+    def set(self, key: str, value: Any):
+        self.command("SET", self.ns + key, encode_value(value), "PX", str(int(self.ttl * 1000)))
+
+    def clear(self):
+        cursor = "0"
+        while True:
+            cursor, keys = self.command("SCAN", cursor, "MATCH", self.ns + "*", "COUNT", "500")
+            cursor = cursor.decode() if isinstance(cursor, bytes) else str(cursor)
+            if keys:
+                self.command("DEL", *keys)
+            if cursor == "0":
+                break
+
+
+# ---------------------------
+# Factory
+# ---------------------------
+
+class _SafeCache:
+    """A shared backend outage must not break requests: errors => miss / no-op."""
+
+    def __init__(self, inner: CacheBackend, name: str):
+        self._inner = inner
+        self._name = name
+        self.ttl = inner.ttl
+
+    def get(self, key: str):
+        try:
+            return self._inner.get(key)
+        except Exception as e:
+            _warn(f"cache get failed on {self._name}: {e}")
+            return None
+
+    def set(self, key: str, value: Any):
+        try:
+            self._inner.set(key, value)
+        except Exception as e:
+            _warn(f"cache set failed on {self._name}: {e}")
+
+    def clear(self):
+        try:
+            self._inner.clear()
+        except Exception as e:
+            _warn(f"cache clear failed on {self._name}: {e}")
+
+
+def _warn(msg: str):
+    from app.core.logging import logger
+    logger.warning(msg)
+
+
+def make_cache(namespace: str, ttl_seconds: int, maxsize: int = 2048) -> CacheBackend:
+    """
+    settings.cache_backend: memory (default) | sqlite | redis
+    settings.cache_url: sqlite file path or redis://host:port/db
+    """
+    from app.core.config import settings
+
+    kind = (settings.cache_backend or "memory").strip().lower()
+    if kind == "sqlite":
+        path = settings.cache_url or "data/cache.sqlite3"
+        return _SafeCache(SQLiteCache(path, ttl_seconds, namespace=namespace), "sqlite")
+    if kind == "redis":
+        url = settings.cache_url or "redis://127.0.0.1:6379/0"
+        return _SafeCache(RedisCache(url, ttl_seconds, namespace=namespace), "redis")
+    return TTLCache(ttl_seconds=ttl_seconds, maxsize=maxsize)
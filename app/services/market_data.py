@@ -5,21 +5,34 @@ Market data orchestrator (enterprise-grade)
 - Provider registry driven by settings (order + availability)
 - Robust fallback on errors AND empty series
 - Canonical period/interval normalization
-- TTL cache for quotes
+- TTL cache for quotes and history (pluggable backend, shareable across workers)
+- Every series is trimmed to the requested period (searchsorted on t) before it is cached
+  or serialized; providers may return more (AV full output, a wider retry)
+- One base series per (ticker, period) from the providers (1d, or the finest intraday interval
+  they serve for the period); coarser intervals are resampled locally (resample.py)
+- max_points: chart-bound responses decimated (min/max OHLC buckets or LTTB), cached next
+  to their source series; only when asked for: MARKET_HISTORY_MAX_POINTS is applied by the
+  HTTP routes (chart_points_limit), internal/ML callers always get the full series
+- Today's intraday bars (period=1d, 1m..90m) served from the in-memory bar aggregator
+  when its quote feed is running; providers only backfill what it missed
 - Structured logging & consistent HTTP errors
 """
 
 from typing import Iterable, List, Dict, Tuple
 from dataclasses import asdict
+from datetime import datetime, timezone
+import time
+import numpy as np
 from fastapi import HTTPException
 
 from app.core.config import settings
-from app.core.logging import logger
+from app.core.logging import enabled as log_enabled, logger
+from app.core.metrics import CACHE_REQUESTS, HISTORY_ATTEMPTS, PROVIDER_LATENCY
 
-from .cache import TTLCache
+from .bar_aggregator import bar_aggregator
+from .cache import make_cache
+from .resample import base_interval, broader_period, derive, downsample, trim_period
 from .providers.base import Quote, Candle, MarketProvider
-from .providers.yahoo_provider import YahooProvider
-from .providers.alpha_vantage_provider import AlphaVantageProvider
 
 
 # ---------------------------
@@ -33,6 +46,12 @@ _ALLOWED_INTERVALS = {
     "1m","2m","5m","15m","30m","60m","90m","1h","1d","5d","1wk","1mo","3mo"
 }
 
+# Durata unei bare (secunde); pentru >= 1d datele se schimbă cel mult o dată pe zi
+_INTERVAL_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600,
+    "1d": 86400, "5d": 86400, "1wk": 86400, "1mo": 86400, "3mo": 86400,
+}
+
 def _normalize_period_interval(period: str, interval: str) -> Tuple[str, str]:
     p = (period or "1y").lower().strip()
     i = (interval or "1d").lower().strip()
@@ -56,37 +75,56 @@ def _build_providers() -> List[MarketProvider]:
     """
     Instantiate providers in the order declared in settings.MARKET_PROVIDER_ORDER.
     Unknown names are ignored. AlphaVantage is added only if API key is present.
-    Fallback to Yahoo if list ends up empty.
+    Fallback to Yahoo if list ends up empty. "replay" = offline ReplayProvider (load tests).
+    Provider modules (yfinance/pandas, httpx) are imported here, not at module load.
     """
+    from .providers.yahoo_provider import YahooProvider
+    from .providers.alpha_vantage_provider import AlphaVantageProvider
+
     order = [s.strip().lower() for s in (settings.market_provider_order or "").split(",") if s.strip()]
     providers: List[MarketProvider] = []
     for name in order:
         if name == "yahoo":
             providers.append(YahooProvider())
+        elif name == "replay":
+            from .providers.replay_provider import ReplayProvider
+            providers.append(ReplayProvider.from_settings(settings))
         elif name in ("alpha_vantage", "alphavantage", "av"):
             if settings.alpha_vantage_api_key:
                 providers.append(AlphaVantageProvider(settings.alpha_vantage_api_key))
             else:
                 logger.warning("AlphaVantage in provider order but API key is missing; skipping.")
         else:
-            logger.warning("Unknown market provider in order: %s (skipped)", name)
+            logger.warning("Unknown market provider in order: {} (skipped)", name)
 
     if not providers:
         logger.warning("No providers configured — falling back to YahooProvider only.")
         providers.append(YahooProvider())
 
     names = [getattr(p, "name", p.__class__.__name__) for p in providers]
-    logger.info("Market providers initialized (order): %s", names)
+    logger.info("Market providers initialized (order): {}", names)
     return providers
 
-_PROVIDERS: List[MarketProvider] = _build_providers()
+# Construit leneș (prima utilizare) sau explicit în lifespan-ul aplicației (init_providers)
+_PROVIDERS: List[MarketProvider] | None = None
+
+def init_providers() -> List[MarketProvider]:
+    global _PROVIDERS
+    if _PROVIDERS is None:
+        _PROVIDERS = _build_providers()
+    return _PROVIDERS
+
+def _providers() -> List[MarketProvider]:
+    return _PROVIDERS if _PROVIDERS is not None else init_providers()
 
 
 # ---------------------------
-# Caching for quotes
+# Caching for quotes & history
 # ---------------------------
 
-_quote_cache = TTLCache(ttl_seconds=settings.market_cache_ttl_seconds, maxsize=4096)
+# Backend din settings.cache_backend (memory | sqlite | redis); sqlite/redis sunt comune între workeri
+_quote_cache = make_cache("quotes", ttl_seconds=settings.market_cache_ttl_seconds, maxsize=4096)
+_history_cache = make_cache("history", ttl_seconds=settings.market_history_cache_ttl_seconds, maxsize=1024)
 
 
 # ---------------------------
@@ -104,21 +142,23 @@ def get_quotes(tickers: Iterable[str]) -> Dict[str, float | None]:
 
     key = "quotes:" + ",".join(uniq)
     cached = _quote_cache.get(key)
+    CACHE_REQUESTS.inc(cache="quotes", result="miss" if cached is None else "hit")
     if cached is not None:
         return cached
 
     last_err: Exception | None = None
-    for p in _PROVIDERS:
+    for p in _providers():
         try:
-            quotes = p.get_quotes(uniq)
+            quotes = _timed(p.name, "quotes", p.get_quotes, uniq)
             result = {q.ticker: q.price for q in quotes}
             # Cache even None to avoid loops for symbols unavailable at the provider
             _quote_cache.set(key, result)
-            logger.debug("Quotes from %s for %s", p.name, uniq)
+            if log_enabled("DEBUG"):
+                logger.debug("Quotes from {} for {}", p.name, uniq)
             return result
         except Exception as e:
             last_err = e
-            logger.warning("get_quotes failed on provider '%s': %s", p.name, e)
+            logger.warning("get_quotes failed on provider '{}': {}", p.name, e)
             continue
 
     # No provider succeeded
@@ -127,11 +167,12 @@ def get_quotes(tickers: Iterable[str]) -> Dict[str, float | None]:
     raise HTTPException(status_code=502, detail=msg)
 
 
-def get_history(ticker: str, period: str, interval: str) -> List[Dict]:
+def _fetch_history(ticker: str, period: str, interval: str) -> Tuple[str, List[Candle]]:
     """
-    Return OHLCV as list[dict] with ISO dates; tries providers in order.
+    Provider loop shared by get_history / get_history_columns.
     If a provider returns an empty series, it's treated as failure and we try the next.
-    We also attempt a second try per provider with a broader period when possible.
+    We also attempt a second try per provider with the next wider period (one step, within
+    the interval's provider limit); callers trim the answer back to the requested period.
     """
     t = (ticker or "").strip().upper()
     if not t:
@@ -140,33 +181,44 @@ def get_history(ticker: str, period: str, interval: str) -> List[Dict]:
     p_norm, i_norm = _normalize_period_interval(period, interval)
     last_err: Exception | None = None
 
-    for provider in _PROVIDERS:
+    for provider in _providers():
         # Attempt 1: requested (normalized) period/interval
+        candles = None
         try:
-            candles = provider.get_history(t, p_norm, i_norm)
+            candles = _timed(provider.name, "history", provider.get_history, t, p_norm, i_norm)
+            HISTORY_ATTEMPTS.inc(provider=provider.name, attempt="1", outcome="ok" if candles else "empty")
             if not candles:
                 raise RuntimeError(f"{provider.name} returned empty history")
-            logger.debug("History OK from %s (%s/%s) for %s: %d rows",
-                         provider.name, p_norm, i_norm, t, len(candles))
-            return [_candle_dict(c) for c in candles]
+            if log_enabled("DEBUG"):
+                logger.debug("History OK from {} ({}/{}) for {}: {} rows",
+                             provider.name, p_norm, i_norm, t, len(candles))
+            return t, candles
         except Exception as e:
             last_err = e
-            logger.info("History attempt#1 failed on %s for %s (%s/%s): %s",
+            if candles is None:  # providerul a aruncat (gol e deja numărat)
+                HISTORY_ATTEMPTS.inc(provider=provider.name, attempt="1", outcome="error")
+            logger.info("History attempt#1 failed on {} for {} ({}/{}): {}",
                         provider.name, t, p_norm, i_norm, e)
 
-        # Attempt 2: broaden period, keep interval (only if first failed and period != 'max')
-        if p_norm != "max":
+        # Attempt 2: one step wider period, keep interval (not 'max': 20 ani pentru un 1mo gol)
+        wider = broader_period(p_norm, i_norm)
+        if wider is not None:
             try:
-                candles = provider.get_history(t, "max", i_norm)
+                candles = None
+                candles = _timed(provider.name, "history", provider.get_history, t, wider, i_norm)
+                HISTORY_ATTEMPTS.inc(provider=provider.name, attempt="2", outcome="ok" if candles else "empty")
                 if not candles:
                     raise RuntimeError(f"{provider.name} returned empty history (broadened)")
-                logger.debug("History OK from %s (max/%s) for %s: %d rows",
-                             provider.name, i_norm, t, len(candles))
-                return [_candle_dict(c) for c in candles]
+                if log_enabled("DEBUG"):
+                    logger.debug("History OK from {} ({}/{}) for {}: {} rows",
+                                 provider.name, wider, i_norm, t, len(candles))
+                return t, candles
             except Exception as e2:
                 last_err = e2
-                logger.info("History attempt#2 failed on %s for %s (max/%s): %s",
-                            provider.name, t, i_norm, e2)
+                if candles is None:
+                    HISTORY_ATTEMPTS.inc(provider=provider.name, attempt="2", outcome="error")
+                logger.info("History attempt#2 failed on {} for {} ({}/{}): {}",
+                            provider.name, t, wider, i_norm, e2)
 
         # Otherwise continue to next provider
 
@@ -175,16 +227,173 @@ def get_history(ticker: str, period: str, interval: str) -> List[Dict]:
     raise HTTPException(status_code=502, detail=msg)
 
 
+def _history_columns(ticker: str, period: str, interval: str, max_points: int | None = None,
+                     downsample_method: str = "minmax") -> Dict[str, np.ndarray]:
+    t = (ticker or "").strip().upper()
+    if not t:
+        raise HTTPException(status_code=400, detail="ticker missing")
+    p_norm, i_norm = _normalize_period_interval(period, interval)
+    limit = max_points or None
+
+    if p_norm == "1d" and bar_aggregator.live:
+        cols = bar_aggregator.history_columns(t, i_norm, backfill=_backfill_bars)
+        if cols is not None:
+            CACHE_REQUESTS.inc(cache="bars", result="hit")
+            return downsample(cols, limit, downsample_method)
+
+    base = _base_interval(p_norm, i_norm)
+    key = f"history:{t}:{p_norm}:{base}"
+    src = _history_cache.get(key)
+    CACHE_REQUESTS.inc(cache="history", result="miss" if src is None else "hit")
+    if src is None:
+        _, candles = _fetch_history(t, p_norm, base)
+        src = trim_period(_candle_columns(candles), p_norm)
+        _history_cache.set(key, src)
+
+    cols = derive(src, base, i_norm)
+    if not limit or len(cols["t"]) <= limit:
+        return cols
+    # varianta decimată stă lângă sursă; lungimea + ultima bară o leagă de versiunea sursei
+    n = len(src["t"])
+    dkey = f"{key}:{i_norm}:{downsample_method}{limit}:{n}:{int(src['t'][-1]) if n else 0}"
+    small = _history_cache.get(dkey)
+    if small is None:
+        small = downsample(cols, limit, downsample_method)
+        _history_cache.set(dkey, small)
+    return small
+
+
+def chart_points_limit(max_points: int | None) -> int | None:
+    """max_points for an HTTP response: the requested value, capped by MARKET_HISTORY_MAX_POINTS."""
+    cap = settings.market_history_max_points
+    if not max_points:
+        return cap or None
+    return min(max_points, cap) if cap else max_points
+
+
+def get_history(ticker: str, period: str, interval: str, max_points: int | None = None,
+                downsample_method: str = "minmax") -> List[Dict]:
+    """
+    Return OHLCV as list[dict] with ISO dates; tries providers in order.
+    max_points: decimate for charts (first/last bar kept); None => full series.
+    """
+    return _column_dicts(_history_columns(ticker, period, interval, max_points, downsample_method))
+
+
+def get_history_columns(ticker: str, period: str, interval: str, max_points: int | None = None,
+                        downsample_method: str = "minmax") -> Dict[str, np.ndarray]:
+    """
+    Same series as get_history, as columns: t (epoch seconds, int64) and o/h/l/c/v (float64).
+    No per-row dicts, so it can be encoded directly (orjson / .npy).
+    """
+    return _history_columns(ticker, period, interval, max_points, downsample_method)
+
+
+def get_history_many(tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Dict]]:
+    """
+    Batched get_history for many symbols (universe warm-up / refresh).
+    Cached series are served first; the rest go to each provider's get_history_many
+    in order, and only symbols a provider could not return move on to the next one.
+    Symbols no provider could return are left out of the result.
+    """
+    return {t: _column_dicts(cols) for t, cols in get_history_many_columns(tickers, period, interval).items()}
+
+
+def get_history_many_columns(tickers: Iterable[str], period: str, interval: str) -> Dict[str, Dict[str, np.ndarray]]:
+    """get_history_many as columns per ticker (t, o, h, l, c, v), like get_history_columns."""
+    uniq = sorted({t.strip().upper() for t in tickers if t and t.strip()})
+    p_norm, i_norm = _normalize_period_interval(period, interval)
+    base = _base_interval(p_norm, i_norm)
+
+    cols_by_ticker: Dict[str, Dict[str, np.ndarray]] = {}
+    missing: List[str] = []
+    for t in uniq:
+        cached = _history_cache.get(f"history:{t}:{p_norm}:{base}")
+        CACHE_REQUESTS.inc(cache="history", result="miss" if cached is None else "hit")
+        if cached is not None:
+            cols_by_ticker[t] = cached
+        else:
+            missing.append(t)
+
+    for provider in _providers():
+        if not missing:
+            break
+        try:
+            batch = _timed(provider.name, "history_many", _provider_history_many, provider, missing, p_norm, base)
+        except Exception as e:
+            logger.warning("get_history_many failed on provider '{}': {}", provider.name, e)
+            continue
+        for t, candles in batch.items():
+            if not candles:
+                continue
+            cols = trim_period(_candle_columns(candles), p_norm)
+            _history_cache.set(f"history:{t}:{p_norm}:{base}", cols)
+            cols_by_ticker[t] = cols
+        missing = [t for t in missing if t not in cols_by_ticker]
+        if log_enabled("DEBUG"):
+            logger.debug("History batch from {} ({}/{}): {} ok, {} missing",
+                         provider.name, p_norm, base, len(batch), len(missing))
+
+    if missing:
+        logger.warning("History batch: no provider returned data for {}", missing)
+    return {t: derive(cols, base, i_norm) for t, cols in cols_by_ticker.items()}
+
+
+def _base_interval(period: str, interval: str) -> str:
+    return base_interval(period, interval) if settings.market_resample_enabled else interval
+
+
+def _backfill_bars(ticker: str, interval: str) -> Dict[str, np.ndarray]:
+    _, candles = _fetch_history(ticker, "1d", interval)
+    return _candle_columns(candles)
+
+
+def _provider_history_many(provider: MarketProvider, tickers: List[str], period: str, interval: str) -> Dict[str, List[Candle]]:
+    many = getattr(provider, "get_history_many", None)
+    if many is not None:
+        return many(tickers, period, interval)
+    # provider fără batch: serial, sărim peste simbolurile care eșuează
+    out: Dict[str, List[Candle]] = {}
+    for t in tickers:
+        try:
+            out[t] = provider.get_history(t, period, interval)
+        except Exception:
+            continue
+    return out
+
+
 # ---------------------------
 # Helpers
 # ---------------------------
 
-def _candle_dict(c: Candle) -> Dict:
+def _timed(provider_name: str, op: str, fn, *args):
+    """Call a provider method, recording latency by provider/op/outcome (ok | empty | error)."""
+    t0 = time.perf_counter()
+    outcome = "error"
+    try:
+        out = fn(*args)
+        outcome = "ok" if out else "empty"
+        return out
+    finally:
+        PROVIDER_LATENCY.observe(time.perf_counter() - t0, provider=provider_name, op=op, outcome=outcome)
+
+
+def _column_dicts(cols: Dict[str, np.ndarray]) -> List[Dict]:
+    dates = [datetime.fromtimestamp(x, tz=timezone.utc).isoformat() for x in cols["t"].tolist()]
+    return [
+        {"date": d, "open": o, "high": h, "low": l, "close": c, "volume": v}
+        for d, o, h, l, c, v in zip(dates, cols["o"].tolist(), cols["h"].tolist(), cols["l"].tolist(),
+                                     cols["c"].tolist(), cols["v"].tolist())
+    ]
+
+
+def _candle_columns(candles: List[Candle]) -> Dict[str, np.ndarray]:
+    n = len(candles)
     return {
-        "date": c.date.isoformat(),
-        "open": float(c.open),
-        "high": float(c.high),
-        "low": float(c.low),
-        "close": float(c.close),
-        "volume": float(c.volume),
+        "t": np.fromiter((int(c.date.timestamp()) for c in candles), dtype="int64", count=n),
+        "o": np.fromiter((c.open for c in candles), dtype="float64", count=n),
+        "h": np.fromiter((c.high for c in candles), dtype="float64", count=n),
+        "l": np.fromiter((c.low for c in candles), dtype="float64", count=n),
+        "c": np.fromiter((c.close for c in candles), dtype="float64", count=n),
+        "v": np.fromiter((c.volume for c in candles), dtype="float64", count=n),
     }
@@ -1,29 +1,30 @@
 from __future__ import annotations
-from typing import Dict, Any, Tuple
-import pandas as pd
+import time
+from typing import Dict, Any, Iterable, List, Tuple, TYPE_CHECKING
 
-from app.services.market_data import get_history
-from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
-from app.ml.pipeline.infer_service import predict_from_candles
-import os
-from joblib import load
+from app.core.logging import logger
+from app.services.market_data import get_history, get_history_many_columns
 
+# pandas / sklearn / joblib se importă la prima predicție, nu la pornirea aplicației
+if TYPE_CHECKING:
+    import numpy as np
+    import pandas as pd
 
-def _history_df(ticker: str, period: str, interval: str) -> pd.DataFrame:
+
+def _history_df(ticker: str, period: str, interval: str) -> "pd.DataFrame":
     js = get_history(ticker, period, interval)  # list[dict]
     if not js:
         raise RuntimeError(f"Fără istoric pentru {ticker} ({period}/{interval}).")
-    df = pd.DataFrame(js)
-    # normalizăm coloanele
-    df["date"] = pd.to_datetime(df["date"])
-    df = df[["date","open","high","low","close","volume"]].sort_values("date").reset_index(drop=True)
-    return df
+    return _rows_df(js)
 
 def ensure_model_and_predict(ticker: str, horizon_days: int = 7) -> Dict[str, Any]:
     """
     1) încearcă să prezică cu modelul existent (dacă e antrenat);
     2) dacă lipsesc artefactele, antrenează rapid pe istoric real, apoi prezice.
     """
+    from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
+    from app.ml.pipeline.infer_service import predict_from_candles
+
     ticker = ticker.upper()
 
     # Pas 1: avem destule date? (încercăm 5 ani daily; dacă nu, 1 an)
@@ -38,7 +39,278 @@ def ensure_model_and_predict(ticker: str, horizon_days: int = 7) -> Dict[str, An
         return pred
     except FileNotFoundError:
         # artefactele lipsesc -> antrenăm rapid, apoi prezicem
-        cfg = TrainConfig(ticker=ticker, horizon_days=horizon_days)
+        cfg = TrainConfig.with_tuned(ticker, horizon_days)
         train_on_dataframe(df, cfg)
         pred = predict_from_candles(ticker, horizon_days, df)
         return pred
+
+
+def recalibrate_online(ticker: str, horizon_days: int = 7, window: int = 250,
+                       method: str = "isotonic") -> Dict[str, Any]:
+    """Refit only the probability calibrator on recent resolved history (base model untouched)."""
+    from app.ml.pipeline.infer_service import recalibrate
+
+    df = _history_df(ticker.upper(), period="2y", interval="1d")
+    return recalibrate(ticker, horizon_days, df, window=window, method=method)
+
+
+def retrain_drifted(max_jobs: int = 1) -> List[Tuple[str, int]]:
+    """Pop up to `max_jobs` (ticker, horizon) entries queued by the drift monitor and retrain them."""
+    from app.ml.monitoring.drift import drift_monitor
+    from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
+
+    done = []
+    for _ in range(max_jobs):
+        key = drift_monitor.pop_retrain()
+        if key is None:
+            break
+        ticker, horizon_days = key
+        try:
+            df = _history_df(ticker, period="5y", interval="1d")
+            train_on_dataframe(df, TrainConfig.with_tuned(ticker, horizon_days))
+            done.append(key)
+        except Exception as e:
+            logger.warning("Drift retrain failed for {} {}d: {}", ticker, horizon_days, e)
+    return done
+
+
+async def drift_retrain_loop(interval_seconds: float) -> None:
+    """Background worker: one queued retrain per interval, off the event loop."""
+    import asyncio
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        await asyncio.to_thread(retrain_drifted, 1)
+
+
+# ---------------------------
+# Policy: praguri buy/hold/sell pe predicțiile rezolvate
+# ---------------------------
+
+_DAY = 86400
+
+
+def _resolve_lag_seconds(horizon_days: int) -> float:
+    # orizontul e în ședințe: ~7/5 zile calendaristice per ședință + marjă pentru sărbători
+    return (horizon_days * 7 / 5 + 3) * _DAY
+
+
+def _history_period(days: float) -> str:
+    for period, span in (("1y", 365), ("2y", 730), ("5y", 1826)):
+        if days <= span:
+            return period
+    return "10y"
+
+
+def _epoch(dt) -> float:
+    from datetime import timezone
+
+    return (dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)).timestamp()  # naive = UTC (func.now())
+
+
+def _resolved_outcomes(horizon_days: int, start: float, until: float) -> Tuple["np.ndarray", ...]:
+    """
+    (prob 0..1, exp %, rr, realized %) for predictions created in [start, until); realized =
+    close `horizon_days` sessions after the baseline vs the baseline: the last daily bar that had
+    closed when the prediction was made (bars are stamped at session start, so the bar stamped
+    on the prediction's day is still open). One batched history fetch; rows without both closes
+    are dropped.
+    """
+    from datetime import datetime, timezone
+
+    import numpy as np
+    from sqlalchemy import select
+
+    from app.db.session import SessionLocal
+    from app.models.prediction import StockPrediction as P
+
+    naive = lambda x: datetime.fromtimestamp(x, tz=timezone.utc).replace(tzinfo=None)
+    with SessionLocal() as db:
+        rows = db.execute(
+            select(P.ticker, P.created_at, P.probability_pct, P.expected_change_pct, P.reward_to_risk)
+            .where(P.horizon_days == horizon_days, P.created_at >= naive(start), P.created_at < naive(until))
+        ).all()
+    if not rows:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    tickers, created, prob, exp, rr = zip(*rows)
+    ts = np.fromiter((_epoch(c) for c in created), dtype=np.float64, count=len(rows))
+    prob = np.asarray(prob, dtype=np.float64) / 100.0
+    exp, rr = np.asarray(exp, dtype=np.float64), np.asarray(rr, dtype=np.float64)
+
+    uniq, inv = np.unique(np.asarray(tickers, dtype=str), return_inverse=True)
+    hist = get_history_many_columns(list(uniq), _history_period((time.time() - start) / _DAY), "1d")
+    realized = np.full(len(rows), np.nan)
+    order = np.argsort(inv, kind="stable")
+    bounds = np.searchsorted(inv[order], np.arange(len(uniq) + 1))
+    for k, t in enumerate(uniq):
+        cols = hist.get(t.upper())
+        if cols is None or not len(cols["t"]):
+            continue
+        idx = order[bounds[k]:bounds[k + 1]]
+        # bara zilnică t se închide cel târziu la t + 1 zi: ultima bară cu t + 1 zi <= momentul predicției
+        i = np.searchsorted(cols["t"], ts[idx] - _DAY, side="right") - 1
+        j = i + horizon_days
+        ok = (i >= 0) & (j < len(cols["c"]))
+        c = cols["c"]
+        realized[idx[ok]] = (c[j[ok]] / c[i[ok]] - 1.0) * 100.0
+    keep = ~np.isnan(realized)
+    return prob[keep], exp[keep], rr[keep], realized[keep]
+
+
+def optimize_policy(horizon_days: int = 7, full: bool = False) -> Dict[str, Any]:
+    """
+    Re-optimize the buy/sell thresholds for one horizon on the rolling window of resolved
+    predictions. Incremental by default: only outcomes resolved since the last run are added
+    and those that left the window subtracted from the saved grid tables.
+    """
+    import os
+
+    from app.core.config import settings
+    from app.ml.pipeline.infer_service import ART_DIR
+    from app.ml.policy.thresholds import Policy, PolicyOptimizer, fit_policy, optimizer_path, policy_path, smooth
+
+    features = [f.strip() for f in settings.policy_features.split(",") if f.strip()]
+    until = time.time() - _resolve_lag_seconds(horizon_days)
+    start = until - settings.policy_window_days * _DAY
+    state_path = optimizer_path(ART_DIR, horizon_days)
+    t0 = time.perf_counter()
+
+    opt, added, expired = None, 0, 0
+    if not full and len(features) > 1 and os.path.exists(state_path):
+        opt = PolicyOptimizer.load(state_path)
+        if opt.features != features or opt.cost_pct != settings.policy_cost_pct or start >= opt.until:
+            opt = None  # alți parametri / fereastra s-a rotit complet => reconstruim
+    if opt is not None:
+        new = _resolved_outcomes(horizon_days, opt.until, until)
+        old = _resolved_outcomes(horizon_days, opt.start, start) if start > opt.start else ()
+        opt.update(*new)
+        if old:
+            opt.update(*old, sign=-1)
+        added, expired = len(new[0]), len(old[0]) if old else 0
+        opt.start, opt.until = max(opt.start, start), until
+        if opt.stale:
+            opt = None
+    mode = "incremental" if opt is not None else "full"
+    if opt is None:
+        outcomes = _resolved_outcomes(horizon_days, start, until)
+        added = len(outcomes[0])
+        if added < settings.policy_min_trades:
+            raise ValueError(f"Not enough resolved predictions for {horizon_days}d (have {added}, "
+                             f"min {settings.policy_min_trades}).")
+        if len(features) > 1:
+            opt = PolicyOptimizer.build(horizon_days, *outcomes, settings.policy_cost_pct, features, settings.policy_bins)
+            opt.start, opt.until = start, until
+        else:
+            policy = fit_policy(horizon_days, *outcomes, settings.policy_cost_pct, features,
+                                min_trades=settings.policy_min_trades)
+            policy.stats["window"] = [start, until]
+    if opt is not None:
+        opt.save(state_path)
+        policy = opt.solve(settings.policy_min_trades)
+
+    path = policy_path(ART_DIR, horizon_days)
+    previous = Policy.load(path) if os.path.exists(path) else None
+    policy = smooth(previous, policy, settings.policy_smoothing)
+    policy.save(path)
+    return {"policy": policy.to_dict(), "mode": mode, "added": added, "expired": expired,
+            "elapsed_ms": round((time.perf_counter() - t0) * 1000, 1)}
+
+
+def refresh_policies() -> List[int]:
+    """Incremental re-optimization for every horizon that has predictions."""
+    from sqlalchemy import distinct, select
+
+    from app.db.session import SessionLocal
+    from app.models.prediction import StockPrediction as P
+
+    with SessionLocal() as db:
+        horizons = sorted(h for (h,) in db.execute(select(distinct(P.horizon_days))).all())
+    done = []
+    for h in horizons:
+        try:
+            optimize_policy(h)
+            done.append(h)
+        except ValueError as e:
+            logger.info("Policy {}d not refreshed: {}", h, e)
+        except Exception as e:
+            logger.warning("Policy refresh failed for {}d: {}", h, e)
+    return done
+
+
+async def policy_refresh_loop(interval_seconds: float) -> None:
+    """Background worker: re-optimizes the thresholds as new outcomes resolve."""
+    import asyncio
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await asyncio.to_thread(refresh_policies)
+        except Exception as e:
+            logger.warning("Policy refresh loop iteration failed: {}", e)
+
+
+async def shap_report_loop(interval_seconds: float) -> None:
+    """Background worker: rewrites the SHAP stability reports (shap_stability_{cls,reg}.json)."""
+    import asyncio
+
+    from app.ml.monitoring.shap_stability import TARGETS, write_report
+    from app.ml.pipeline.infer_service import ART_DIR
+
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for target in TARGETS:
+            try:
+                await asyncio.to_thread(write_report, ART_DIR, target)
+            except Exception as e:
+                logger.warning("SHAP stability report ({}) failed: {}", target, e)
+
+
+def trajectories_for(tickers: Iterable[str], horizons: Iterable[int] = range(1, 15), n_paths: int = 10_000,
+                     seed: int | None = 42, mode: str = "bootstrap", ar1: bool = True,
+                     model_horizon_days: int | None = None) -> Dict[str, Any]:
+    """
+    Monte Carlo trajectories for many tickers at once (1 batched history fetch + 1 simulation).
+    model_horizon_days: if set, tickers with a trained model for that horizon use the model's
+    expected change as drift instead of the historical mean.
+    """
+    from app.ml.pipeline.trajectories import drift_from_prediction, fit_return_model, simulate
+
+    uniq = sorted({t.strip().upper() for t in tickers if t and t.strip()})
+    hist = get_history_many_columns(uniq, "5y", "1d")
+    model = fit_return_model({t: cols["c"] for t, cols in hist.items()}, ar1=ar1)
+
+    drift: Dict[str, float] = {}
+    if model_horizon_days:
+        from app.ml.pipeline.infer_service import predict_from_candles
+        for t in model.tickers:
+            try:
+                pred = predict_from_candles(t, model_horizon_days, _columns_df(hist[t]))
+            except (FileNotFoundError, ValueError):
+                continue
+            drift[t] = drift_from_prediction(pred["expected_change_pct"], model_horizon_days)
+
+    paths = simulate(model, horizons=horizons, n_paths=n_paths, seed=seed, mode=mode, drift=drift)
+    return {
+        "tickers": paths,
+        "skipped": [t for t in uniq if t not in paths],
+        "model_drift": sorted(drift),
+    }
+
+
+def _columns_df(cols: Dict[str, "np.ndarray"]) -> "pd.DataFrame":
+    import pandas as pd
+
+    return pd.DataFrame({
+        "date": pd.to_datetime(cols["t"], unit="s", utc=True),
+        "open": cols["o"], "high": cols["h"], "low": cols["l"], "close": cols["c"], "volume": cols["v"],
+    })
+
+
+def _rows_df(rows: List[Dict]) -> "pd.DataFrame":
+    import pandas as pd
+
+    df = pd.DataFrame(rows)
+    # normalizăm coloanele
+    df["date"] = pd.to_datetime(df["date"])
+    return df[["date","open","high","low","close","volume"]].sort_values("date").reset_index(drop=True)
@@ -0,0 +1,425 @@
+from __future__ import annotations
+
+"""
+Streaming news ingestion (roadmap: News & Macro -> features)
+- Pluggable sources yield raw article dicts; JsonlSource reads local .jsonl files (offline)
+- Generator stages, one article in flight per stage (batches only for fingerprinting):
+  normalize -> map_tickers -> score -> dedupe -> NewsAggregator
+- Near-duplicate stories: 64-bit SimHash over title + lead words (per-word ±1 bit rows cached
+  in a bounded vocabulary, one sparse matmul per batch); SimHashIndex keeps the
+  last `capacity` fingerprints in fixed arrays (4 bands x 16 bits => Hamming <= 3 found by
+  pigeonhole), so memory does not grow with the number of articles
+- Aggregation: per (ticker, UTC day) article count, mentions (incl. duplicates) and
+  lexicon sentiment; join_news_features() adds them to add_indicators output by date
+
+Raw article fields (JSONL): id, ts|published_at (ISO or epoch), title, body|summary,
+source, tickers (optional list; cashtags and company aliases are detected too).
+"""
+
+import glob
+import json
+import re
+import time
+import zlib
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple, Union
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.serialization import HAS_ORJSON, orjson
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z0-9'.-]*")
+_CASHTAG = re.compile(r"\$([A-Za-z]{1,5}(?:\.[A-Za-z])?)\b")
+_LEAD_CHARS = 280
+_DAY = 86400
+
+# lexicon financiar minimal; scorul = (pozitive - negative) / (pozitive + negative)
+POSITIVE = frozenset("""
+beat beats surge surges soar soars jump jumps rally rallies gain gains record upgrade upgraded upgrades
+raise raises raised growth profit profits strong outperform bullish buyback approval approved wins win
+exceeds exceeded rebound rebounds boost boosts expands expansion dividend
+""".split())
+NEGATIVE = frozenset("""
+miss misses missed fall falls drop drops plunge plunges slump slumps loss losses weak downgrade downgraded
+downgrades cut cuts lawsuit probe investigation recall recalls bearish layoffs layoff bankruptcy fraud
+warning warns fine fined decline declines halt halted delay delays default sell-off selloff
+""".split())
+
+
+@dataclass(slots=True)
+class Article:
+    id: str
+    ts: float  # epoch secunde, UTC
+    title: str
+    body: str
+    source: str
+    tickers: List[str] = field(default_factory=list)
+    sentiment: float = 0.0
+    fingerprint: int = 0
+    duplicate: bool = False
+
+
+# ---------------------------
+# Sources
+# ---------------------------
+
+class JsonlSource:
+    """Raw dicts from .jsonl files (path or glob) or from any iterable of JSON lines."""
+    name = "jsonl"
+
+    def __init__(self, paths: Union[str, Iterable[str], None] = None, lines: Optional[Iterable[str]] = None):
+        self.paths = sorted(glob.glob(paths)) if isinstance(paths, str) else list(paths or [])
+        self.lines = lines
+        self.bad_lines = 0
+
+    def _parse(self, lines: Union[TextIO, Iterable[str]]) -> Iterator[Dict]:
+        loads = orjson.loads if HAS_ORJSON else json.loads
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                yield loads(line)
+            except ValueError:  # orjson.JSONDecodeError e subclasă de ValueError
+                self.bad_lines += 1
+
+    def __iter__(self) -> Iterator[Dict]:
+        if self.lines is not None:
+            yield from self._parse(self.lines)
+        for p in self.paths:
+            with open(p, encoding="utf-8") as f:
+                yield from self._parse(f)
+
+
+class IterableSource:
+    """Raw dicts already in memory (tests, other services)."""
+    name = "iterable"
+
+    def __init__(self, records: Iterable[Dict]):
+        self.records = records
+
+    def __iter__(self) -> Iterator[Dict]:
+        return iter(self.records)
+
+
+def make_sources(spec: str | None = None) -> List[object]:
+    """NEWS_SOURCES, ex: "jsonl:data/news/*.jsonl,jsonl:/mnt/feeds/today.jsonl"."""
+    out: List[object] = []
+    for part in (spec if spec is not None else settings.news_sources or "").split(","):
+        kind, _, arg = part.strip().partition(":")
+        if not kind:
+            continue
+        if kind == "jsonl":
+            out.append(JsonlSource(arg))
+        else:
+            logger.warning("Unknown news source: {}", kind)
+    return out
+
+
+# ---------------------------
+# Stages
+# ---------------------------
+
+def _parse_ts(v) -> Optional[float]:
+    if v is None or v == "":
+        return None
+    if isinstance(v, (int, float)):
+        return float(v) / 1000.0 if v > 1e11 else float(v)  # milisecunde => secunde
+    from datetime import datetime, timezone
+    try:
+        d = datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if d.tzinfo is None:
+        d = d.replace(tzinfo=timezone.utc)
+    return d.timestamp()
+
+
+def normalize(records: Iterable[Dict], stats: Dict[str, int]) -> Iterator[Article]:
+    for r in records:
+        stats["read"] += 1
+        title = (r.get("title") or r.get("headline") or "").strip()
+        ts = _parse_ts(r.get("ts", r.get("published_at")))
+        if not title or ts is None:
+            stats["invalid"] += 1
+            continue
+        body = r.get("body") or r.get("summary") or ""
+        tickers = r.get("tickers") or []
+        if isinstance(tickers, str):
+            tickers = tickers.split(",")
+        yield Article(id=str(r.get("id") or r.get("url") or stats["read"]), ts=ts, title=title,
+                      body=body[:_LEAD_CHARS], source=str(r.get("source") or ""),
+                      tickers=[t.strip().upper() for t in tickers if t and t.strip()])
+
+
+def map_tickers(articles: Iterable[Article], stats: Dict[str, int], universe: Optional[Set[str]] = None,
+                aliases: Optional[Dict[str, str]] = None) -> Iterator[Article]:
+    """
+    Tickers = explicit field + $CASHTAGS + all-caps title words that are in the universe
+    (>= 3 chars, avoids "A"/"T"/"AI") + company aliases ({"APPLE": "AAPL"}).
+    Without a universe only explicit tickers and cashtags are kept.
+    """
+    alias = {k.upper(): v.upper() for k, v in (aliases or {}).items()}
+    for a in articles:
+        found = list(a.tickers)
+        found += [m.upper() for m in _CASHTAG.findall(a.title)]
+        if universe or alias:
+            for w in _WORD.findall(a.title):
+                u = w.upper()
+                if universe and len(w) >= 3 and w.isupper() and u in universe:
+                    found.append(u)
+                elif u in alias:
+                    found.append(alias[u])
+        if universe:
+            found = [t for t in found if t in universe]
+        if not found:
+            stats["unmapped"] += 1
+            continue
+        a.tickers = list(dict.fromkeys(found))
+        yield a
+
+
+def score(articles: Iterable[Article]) -> Iterator[Article]:
+    for a in articles:
+        words = [w.lower() for w in _WORD.findall(a.title)]
+        pos = sum(w in POSITIVE for w in words)
+        neg = sum(w in NEGATIVE for w in words)
+        a.sentiment = (pos - neg) / (pos + neg) if pos + neg else 0.0
+        yield a
+
+
+class WordBits:
+    """
+    Word -> row of ±1 (float32) from two crc32 of the word (64 bits, stable across processes).
+    Rows are cached; past `max_words` the cache restarts (bounded memory, same values). The
+    restart happens only between batches (`trim`): ids handed out for a batch must stay valid
+    until its product with `table` is done, so a batch may overshoot the limit.
+    """
+
+    def __init__(self, max_words: int = 200_000):
+        self.max_words = int(max_words)
+        self._ids: Dict[str, int] = {}
+        self._rows = np.empty((1024, 64), dtype=np.float32)
+
+    def ids(self, words: List[str]) -> List[int]:
+        get, out = self._ids.get, []
+        for w in words:
+            i = get(w)
+            if i is None:
+                i = self._add(w)
+            out.append(i)
+        return out
+
+    def trim(self) -> None:
+        if len(self._ids) >= self.max_words:
+            self._ids.clear()
+
+    def _add(self, w: str) -> int:
+        i = len(self._ids)
+        if i >= len(self._rows):
+            grown = np.empty((2 * len(self._rows), 64), dtype=np.float32)
+            grown[:i] = self._rows[:i]
+            self._rows = grown
+        b = w.encode()
+        h = np.array([(zlib.crc32(b) << 32) | zlib.crc32(b, 0x9E3779B9)], dtype=np.uint64)
+        self._rows[i] = np.unpackbits(h.view(np.uint8), bitorder="little").astype(np.float32) * 2 - 1
+        self._ids[w] = i
+        return i
+
+    @property
+    def table(self) -> np.ndarray:
+        return self._rows[:len(self._ids)]
+
+
+def simhash_batch(texts: List[str], words: Optional[WordBits] = None) -> np.ndarray:
+    """
+    SimHash-64 for a batch of texts: bit j of text i = sign(sum over its words of ±1 row[j]).
+    The per-text sums are one sparse (texts x vocab) @ (vocab x 64) product.
+    """
+    from scipy.sparse import csr_matrix  # vine cu scikit-learn
+
+    words = words or WordBits()
+    words.trim()  # nu în mijlocul batch-ului: id-urile de mai jos indexează `table`
+    indptr = [0]
+    ids: List[int] = []
+    for t in texts:
+        ids.extend(words.ids(_WORD.findall(t.lower())))
+        indptr.append(len(ids))
+    out = np.zeros(len(texts), dtype=np.uint64)
+    if not ids:
+        return out
+    table = words.table
+    m = csr_matrix((np.ones(len(ids), dtype=np.float32), np.asarray(ids, dtype=np.int64), np.asarray(indptr)),
+                   shape=(len(texts), table.shape[0]))
+    sums = np.asarray(m @ table)
+    packed = np.packbits(sums > 0, axis=1, bitorder="little").view(np.uint64).ravel()
+    nonempty = np.diff(indptr) > 0
+    out[nonempty] = packed[nonempty]
+    return out
+
+
+class SimHashIndex:
+    """
+    Bounded near-duplicate index. The last `capacity` fingerprints live in a ring; each of the
+    4 16-bit bands has a 65536-bucket table holding the `slots` most recent ring positions.
+    Two fingerprints within Hamming distance 3 share at least one band (pigeonhole).
+    Memory: capacity * 8 B + 4 * 65536 * slots * 4 B (~4 MB for slots=4), fixed.
+    """
+
+    BANDS = 4
+    _BAND_BITS = 16
+
+    def __init__(self, capacity: int = 200_000, max_distance: int = 3, slots: int = 4):
+        if not 0 <= max_distance <= self.BANDS - 1:
+            raise ValueError("max_distance must be in [0, 3] with 4 bands")
+        self.capacity = int(capacity)
+        self.max_distance = int(max_distance)
+        self.slots = int(slots)
+        self._fps = array("Q", bytes(8 * self.capacity))
+        self._table = array("i", [-1]) * (self.BANDS * (1 << self._BAND_BITS) * self.slots)
+        self._next = 0
+        self.size = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self._fps.itemsize * len(self._fps) + self._table.itemsize * len(self._table)
+
+    def seen_or_add(self, fp: int) -> bool:
+        """True if a near-duplicate is in the window; otherwise the fingerprint is added."""
+        fps, table, slots, d = self._fps, self._table, self.slots, self.max_distance
+        bases = []
+        for b in range(self.BANDS):
+            base = ((b << self._BAND_BITS) | ((fp >> (self._BAND_BITS * b)) & 0xFFFF)) * slots
+            for s in table[base:base + slots]:
+                # poziție suprascrisă între timp => comparăm cu un articol recent oarecare; inofensiv
+                if s >= 0 and (fps[s] ^ fp).bit_count() <= d:
+                    return True
+            bases.append(base)
+        pos = self._next
+        fps[pos] = fp
+        for base in bases:
+            table[base + 1:base + slots] = table[base:base + slots - 1]
+            table[base] = pos
+        self._next = (pos + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+        return False
+
+
+def dedupe(articles: Iterable[Article], index: SimHashIndex, stats: Dict[str, int],
+           batch_size: int = 2048, words: Optional[WordBits] = None) -> Iterator[Article]:
+    """Flags near-duplicates (kept for mention counts); fingerprints are computed per batch."""
+    batch: List[Article] = []
+    words = words or WordBits()
+
+    def flush():
+        fps = simhash_batch([a.title + " " + a.body for a in batch], words).tolist()
+        for a, fp in zip(batch, fps):
+            a.fingerprint = fp
+            a.duplicate = index.seen_or_add(fp)
+            stats["duplicates"] += a.duplicate
+            yield a
+
+    for a in articles:
+        batch.append(a)
+        if len(batch) >= batch_size:
+            yield from flush()
+            batch = []
+    if batch:
+        yield from flush()
+
+
+# ---------------------------
+# Aggregation / join
+# ---------------------------
+
+class NewsAggregator:
+    """Per (ticker, bucket) counters; memory ~ tickers x buckets, not articles."""
+
+    def __init__(self, bucket_seconds: int = _DAY):
+        self.bucket_seconds = int(bucket_seconds)
+        # (ticker, bucket start) -> [articole unice, mențiuni cu duplicate, suma sentiment, |sentiment|]
+        self.cells: Dict[Tuple[str, int], List[float]] = {}
+
+    def add(self, a: Article) -> None:
+        bucket = int(a.ts // self.bucket_seconds) * self.bucket_seconds
+        for t in a.tickers:
+            c = self.cells.get((t, bucket))
+            if c is None:
+                c = self.cells[(t, bucket)] = [0, 0, 0.0, 0.0]
+            c[1] += 1
+            if not a.duplicate:
+                c[0] += 1
+                c[2] += a.sentiment
+                c[3] += abs(a.sentiment)
+
+    def tickers(self) -> List[str]:
+        return sorted({t for t, _ in self.cells})
+
+    def frame(self, ticker: str):
+        """DataFrame[date, news_count, news_mentions, news_sentiment, news_sentiment_abs] for one ticker."""
+        import pandas as pd
+
+        t = ticker.upper()
+        rows = sorted((b, *v) for (tk, b), v in self.cells.items() if tk == t)
+        df = pd.DataFrame(rows, columns=["bucket", "news_count", "news_mentions", "sent_sum", "sent_abs"])
+        df["date"] = pd.to_datetime(df["bucket"], unit="s", utc=True)
+        n = df["news_count"].where(df["news_count"] > 0)
+        df["news_sentiment"] = (df["sent_sum"] / n).fillna(0.0)
+        df["news_sentiment_abs"] = (df["sent_abs"] / n).fillna(0.0)
+        return df[["date", "news_count", "news_mentions", "news_sentiment", "news_sentiment_abs"]]
+
+
+def join_news_features(df, news, lag_days: int = 1, shock_window: int = 20):
+    """
+    Left-join daily news features onto add_indicators output by date.
+    lag_days=1: bar of day D sees news up to the end of D-1 (no look-ahead from after-close news).
+    news_shock = today's count / trailing mean count (news days with no coverage count as 0).
+    """
+    import pandas as pd
+
+    out = df.copy()
+    day = pd.to_datetime(out["date"], utc=True).dt.floor("D")
+    cols = ["news_count", "news_mentions", "news_sentiment", "news_sentiment_abs"]
+    if news is None or len(news) == 0:
+        for c in cols + ["news_shock"]:
+            out[c] = 0.0
+        return out
+    n = news.set_index(pd.to_datetime(news["date"], utc=True).dt.floor("D"))[cols]
+    n = n.groupby(level=0).sum().asfreq("D", fill_value=0)
+    base = n["news_count"].rolling(shock_window, min_periods=1).mean().shift(1)
+    n["news_shock"] = (n["news_count"] / base.replace(0, np.nan)).fillna(0.0)
+    n.index = n.index + pd.Timedelta(days=lag_days)
+    joined = n.reindex(pd.DatetimeIndex(day)).fillna(0.0)
+    for c in cols + ["news_shock"]:
+        out[c] = joined[c].to_numpy()
+    return out
+
+
+# ---------------------------
+# Pipeline
+# ---------------------------
+
+def run_pipeline(sources: Iterable[Iterable[Dict]], universe: Optional[Iterable[str]] = None,
+                 aliases: Optional[Dict[str, str]] = None, index: Optional[SimHashIndex] = None,
+                 aggregator: Optional[NewsAggregator] = None, batch_size: int = 2048) -> Dict:
+    """Stream every source through the stages into `aggregator`; returns counters + timing."""
+    stats = {"read": 0, "invalid": 0, "unmapped": 0, "duplicates": 0, "kept": 0}
+    index = index or SimHashIndex(settings.news_dedup_capacity)
+    aggregator = aggregator or NewsAggregator()
+    uni = {t.upper() for t in universe} if universe else None
+
+    def records():
+        for src in sources:
+            yield from src
+
+    t0 = time.perf_counter()
+    stream = dedupe(score(map_tickers(normalize(records(), stats), stats, uni, aliases)), index, stats, batch_size)
+    for a in stream:
+        aggregator.add(a)
+        stats["kept"] += 1
+    elapsed = time.perf_counter() - t0
+    stats.update(elapsed_s=elapsed, articles_per_s=stats["read"] / elapsed if elapsed else 0.0,
+                 index_bytes=index.nbytes, cells=len(aggregator.cells))
+    return {"stats": stats, "aggregator": aggregator, "index": index}
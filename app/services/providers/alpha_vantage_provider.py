@@ -5,6 +5,7 @@ Alpha Vantage provider (enterprise-grade)
 - Shared HTTPX client with timeouts
 - Retry with exponential backoff on rate-limit / transient errors
 - Proper interval mapping (our canonical -> AV)
+- outputsize=compact (latest 100 points) when the requested period fits in it, full otherwise
 - Raise on empty series so orchestrator can fallback
 """
 
@@ -13,6 +14,7 @@ from datetime import datetime, timezone
 import time
 import httpx
 
+from app.core.metrics import PROVIDER_UPSTREAM
 from .base import MarketProvider, Quote, Candle
 
 
@@ -21,6 +23,23 @@ _INTRADAY_MAP = {  # our canonical -> AV expected
     "1m": "1min", "5m": "5min", "15m": "15min", "30m": "30min", "60m": "60min", "1h": "60min"
 }
 # AV only supports above granularities for intraday; daily/adjusted for others.
+_INTRADAY_SECONDS = {"1m": 60, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600}
+_COMPACT_POINTS = 100
+_PERIOD_SESSIONS = {"1d": 1, "5d": 5, "1mo": 23, "3mo": 66}  # ședințe maxime în perioadă
+_EXTENDED_HOURS = 16 * 3600  # intraday AV include pre/after-market (04:00-20:00 ET)
+
+
+def _outputsize(period: str, interval: str) -> str:
+    """'compact' when the period's bars fit in AV's latest 100 points, else 'full'."""
+    sessions = _PERIOD_SESSIONS.get(period)
+    if period == "ytd":
+        today = datetime.now(timezone.utc)
+        sessions = (today - today.replace(month=1, day=1)).days * 5 // 7 + 1
+    if sessions is None:
+        return "full"
+    per_session = _EXTENDED_HOURS // _INTRADAY_SECONDS[interval] if interval in _INTRADAY_SECONDS else 1
+    return "compact" if sessions * per_session <= _COMPACT_POINTS else "full"
+
 
 class AlphaVantageProvider(MarketProvider):
     name = "alpha_vantage"
@@ -38,23 +57,29 @@ class AlphaVantageProvider(MarketProvider):
         p["apikey"] = self.api_key
 
         # Basic retry for transient errors / throttling
+        endpoint = p.get("function", "?")
         last_err: Exception | None = None
         for attempt in range(3):
+            outcome = "error"
             try:
                 r = self._client.get(_BASE_URL, params=p)
                 r.raise_for_status()
                 j = r.json()
                 if "Note" in j:
                     # rate limit -> retry with backoff
+                    outcome = "rate_limit"
                     raise RuntimeError("rate_limit: " + j["Note"][:200])
                 if "Error Message" in j:
                     # permanent error for this symbol/request
                     raise RuntimeError(j["Error Message"])
+                outcome = "ok"
                 return j
             except Exception as e:
                 last_err = e
                 # small backoff; last attempt will bubble up
                 time.sleep(0.6 * (attempt + 1))
+            finally:
+                PROVIDER_UPSTREAM.inc(provider=self.name, endpoint=endpoint, outcome=outcome)
         raise RuntimeError(f"AlphaVantage request failed: {last_err}")
 
     # --------------- quotes ---------------
@@ -78,8 +103,8 @@ class AlphaVantageProvider(MarketProvider):
     def get_history(self, ticker: str, period: str, interval: str) -> List[Candle]:
         """
         Return candles in ascending time order. Raises on empty series.
-        'period' is not enforced server-side for AV; we return full series
-        and let the orchestrator trim if needed.
+        AV has no period parameter: we ask for the compact output when the period fits
+        in it and the orchestrator trims to the exact period.
         """
         ticker = ticker.upper()
 
@@ -90,7 +115,7 @@ class AlphaVantageProvider(MarketProvider):
                 "function": "TIME_SERIES_INTRADAY",
                 "symbol": ticker,
                 "interval": av_interval,
-                "outputsize": "full",
+                "outputsize": _outputsize(period, interval),
                 "datatype": "json",
             })
             key = next((k for k in j.keys() if "Time Series" in k and "Intraday" in k), None)
@@ -102,7 +127,7 @@ class AlphaVantageProvider(MarketProvider):
             j = self._get({
                 "function": "TIME_SERIES_DAILY_ADJUSTED",
                 "symbol": ticker,
-                "outputsize": "full",
+                "outputsize": _outputsize(period, interval),
                 "datatype": "json",
             })
             series = j.get("Time Series (Daily)", {}) or {}
@@ -114,6 +139,19 @@ class AlphaVantageProvider(MarketProvider):
 
         return candles
 
+    def get_history_many(self, tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Candle]]:
+        """
+        AV has no multi-symbol endpoint: one request per ticker. Symbols that fail
+        are left out so the orchestrator can try them on the next provider.
+        """
+        out: Dict[str, List[Candle]] = {}
+        for t in sorted({t.upper() for t in tickers if t}):
+            try:
+                out[t] = self.get_history(t, period, interval)
+            except Exception:
+                continue
+        return out
+
     # --------------- helpers ---------------
 
     @staticmethod
@@ -24,3 +24,4 @@ class MarketProvider(Protocol):
     name: str
     def get_quotes(self, tickers: Iterable[str]) -> List[Quote]: ...
     def get_history(self, ticker: str, period: str, interval: str) -> List[Candle]: ...
+    def get_history_many(self, tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Candle]]: ...
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+"""
+Replay provider (load tests / offline dev, no upstream traffic)
+- Serves recorded candles from REPLAY_DATA_DIR/{TICKER}_{interval}.csv when present,
+  otherwise a deterministic synthetic series (seeded per ticker, ends at "now")
+- Fault injection per call: latency distribution, upstream errors, empty series and
+  Alpha Vantage style rate-limit "Note" payloads (raised like the AV client does)
+- Enabled with MARKET_PROVIDER_ORDER=replay (or e.g. "replay,yahoo")
+- record_history(): save a real provider's candles as replay CSVs
+"""
+
+import csv
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from functools import lru_cache
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.metrics import PROVIDER_UPSTREAM
+from .base import MarketProvider, Quote, Candle
+
+# bara în secunde (pentru seria sintetică și fereastra period)
+_STEP_SECONDS = {
+    "1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "90m": 5400, "1h": 3600,
+    "1d": 86400, "5d": 5 * 86400, "1wk": 7 * 86400, "1mo": 30 * 86400, "3mo": 90 * 86400,
+}
+_PERIOD_DAYS = {
+    "1d": 1, "5d": 5, "1mo": 30, "3mo": 90, "6mo": 180, "1y": 365, "2y": 730,
+    "5y": 1825, "10y": 3650, "max": 7300,
+}
+_MAX_ROWS = 20_000
+_RATE_LIMIT_NOTE = ("Thank you for using Alpha Vantage! Our standard API call frequency is "
+                    "5 calls per minute and 500 calls per day.")
+
+
+def parse_latency(spec: str | None) -> Callable[[random.Random], float]:
+    """
+    Latency spec (milliseconds) -> sampler returning seconds:
+      "0" / "" (none), "fixed:40", "uniform:20,120", "normal:80,20", "lognormal:60,0.5" (median, sigma)
+    """
+    spec = (spec or "").strip().lower()
+    if spec in ("", "0", "none"):
+        return lambda rng: 0.0
+    kind, _, args = spec.partition(":")
+    if not args:  # "40" => fixed
+        kind, args = "fixed", kind
+    try:
+        vals = [float(x) for x in args.split(",") if x.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid REPLAY_LATENCY_MS: {spec!r}")
+    if kind == "fixed" and len(vals) == 1:
+        return lambda rng: vals[0] / 1000.0
+    if kind == "uniform" and len(vals) == 2:
+        return lambda rng: rng.uniform(vals[0], vals[1]) / 1000.0
+    if kind == "normal" and len(vals) == 2:
+        return lambda rng: max(0.0, rng.gauss(vals[0], vals[1])) / 1000.0
+    if kind == "lognormal" and len(vals) == 2:
+        mu = math.log(max(vals[0], 1e-3))
+        return lambda rng: rng.lognormvariate(mu, vals[1]) / 1000.0
+    raise ValueError(f"Invalid REPLAY_LATENCY_MS: {spec!r}")
+
+
+def _ticker_seed(ticker: str) -> int:
+    return zlib.crc32(ticker.upper().encode("utf-8")) & 0x7FFFFFFF
+
+
+@lru_cache(maxsize=512)
+def _synthetic_arrays(ticker: str, interval: str) -> Tuple[np.ndarray, ...]:
+    """Fixed OHLCV arrays per (ticker, interval), long enough for period="max"."""
+    step = _STEP_SECONDS.get(interval, 86400)
+    rng = np.random.default_rng(_ticker_seed(ticker))
+    total = _rows_for("max", interval)
+    vol = 0.01 * math.sqrt(step / 86400)
+    rets = rng.normal(0.0002 * step / 86400, vol, total)
+    close = (20 + _ticker_seed(ticker) % 300) * np.exp(np.cumsum(rets))
+    open_ = np.concatenate(([close[0]], close[:-1]))
+    spread = np.abs(rng.normal(0, vol / 2, total))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = np.clip(rng.normal(1e6, 2e5, total), 1e4, None)
+    return open_, high, low, close, volume
+
+
+def _synthetic(ticker: str, interval: str, rows: int, now: float) -> List[Candle]:
+    """Last `rows` bars of the fixed series, re-stamped so the last bar is the current one."""
+    step = _STEP_SECONDS.get(interval, 86400)
+    arrays = _synthetic_arrays(ticker, interval)
+    n = min(rows, len(arrays[0]))
+    end = int(now // step) * step
+    ts = (end - step * np.arange(n - 1, -1, -1)).tolist()
+    o, h, l, c, v = (a[-n:].tolist() for a in arrays)
+    return [
+        Candle(date=datetime.fromtimestamp(t, tz=timezone.utc),
+               open=o[i], high=h[i], low=l[i], close=c[i], volume=v[i])
+        for i, t in enumerate(ts)
+    ]
+
+
+def _rows_for(period: str, interval: str) -> int:
+    step = _STEP_SECONDS.get(interval, 86400)
+    days = _PERIOD_DAYS.get(period)
+    if period == "ytd":
+        today = datetime.now(timezone.utc)
+        days = (today - today.replace(month=1, day=1)).days + 1
+    days = days or 365
+    if step >= 86400:
+        return max(1, min(_MAX_ROWS, int(days * 252 / 365 * 86400 / step)))
+    # intraday: ~6.5h de tranzacționare pe zi lucrătoare
+    return max(1, min(_MAX_ROWS, int(days * 252 / 365 * 23400 / step)))
+
+
+class ReplayProvider(MarketProvider):
+    name = "replay"
+
+    def __init__(self, data_dir: Optional[str] = None, latency_ms: str | None = None,
+                 error_rate: float = 0.0, empty_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.data_dir = data_dir
+        self._latency = parse_latency(latency_ms)
+        self.error_rate = float(error_rate)
+        self.empty_rate = float(empty_rate)
+        self.rate_limit_rate = float(rate_limit_rate)
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._recorded: Dict[Tuple[str, str], List[Candle]] = {}
+
+    @classmethod
+    def from_settings(cls, settings) -> "ReplayProvider":
+        return cls(
+            data_dir=settings.replay_data_dir,
+            latency_ms=settings.replay_latency_ms,
+            error_rate=settings.replay_error_rate,
+            empty_rate=settings.replay_empty_rate,
+            rate_limit_rate=settings.replay_rate_limit_rate,
+            seed=settings.replay_seed,
+        )
+
+    # --------------- fault injection ---------------
+
+    def _upstream(self, endpoint: str) -> bool:
+        """Simulate one upstream call. Raises on error/rate limit; returns True if the series should be empty."""
+        with self._rng_lock:
+            delay = self._latency(self._rng)
+            roll = self._rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        if roll < self.rate_limit_rate:
+            PROVIDER_UPSTREAM.inc(provider=self.name, endpoint=endpoint, outcome="rate_limit")
+            raise RuntimeError("rate_limit: " + _RATE_LIMIT_NOTE)
+        roll -= self.rate_limit_rate
+        if roll < self.error_rate:
+            PROVIDER_UPSTREAM.inc(provider=self.name, endpoint=endpoint, outcome="error")
+            raise RuntimeError(f"replay: injected upstream error ({endpoint})")
+        roll -= self.error_rate
+        PROVIDER_UPSTREAM.inc(provider=self.name, endpoint=endpoint, outcome="ok")
+        return roll < self.empty_rate
+
+    # --------------- data ---------------
+
+    def _recorded_series(self, ticker: str, interval: str) -> Optional[List[Candle]]:
+        if not self.data_dir:
+            return None
+        key = (ticker, interval)
+        if key not in self._recorded:
+            path = os.path.join(self.data_dir, f"{ticker}_{interval}.csv")
+            self._recorded[key] = _read_csv(path) if os.path.exists(path) else None
+        return self._recorded[key]
+
+    def _series(self, ticker: str, period: str, interval: str) -> List[Candle]:
+        t = ticker.upper()
+        recorded = self._recorded_series(t, interval)
+        if recorded is not None:
+            days = _PERIOD_DAYS.get(period, 365)
+            start = recorded[-1].date - timedelta(days=days) if recorded else None
+            return [c for c in recorded if start is None or c.date >= start]
+        return _synthetic(t, interval, _rows_for(period, interval), time.time())
+
+    # --------------- MarketProvider ---------------
+
+    def get_quotes(self, tickers: Iterable[str]) -> List[Quote]:
+        syms = [t.upper() for t in tickers if t]
+        if not syms:
+            return []
+        empty = self._upstream("quotes")
+        now = datetime.now(timezone.utc)
+        quotes = []
+        for t in syms:
+            price = None
+            if not empty:
+                recorded = self._recorded_series(t, "1d")
+                last = recorded[-1].close if recorded else float(_synthetic_arrays(t, "1d")[3][-1])
+                # mică mișcare deterministă în timp, ca stream-ul să vadă schimbări
+                price = round(last * (1 + 0.002 * math.sin(time.time() / 7 + _ticker_seed(t))), 4)
+            quotes.append(Quote(ticker=t, price=price, currency="USD", ts=now, provider=self.name))
+        return quotes
+
+    def get_history(self, ticker: str, period: str, interval: str) -> List[Candle]:
+        if self._upstream("history"):
+            raise RuntimeError(f"Replay empty history for {ticker} ({period}/{interval})")
+        candles = self._series(ticker, period, interval)
+        if not candles:
+            raise RuntimeError(f"Replay empty history for {ticker} ({period}/{interval})")
+        return candles
+
+    def get_history_many(self, tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Candle]]:
+        syms = sorted({t.upper() for t in tickers if t})
+        if not syms or self._upstream("history_many"):
+            return {}
+        return {t: self._series(t, period, interval) for t in syms}
+
+
+# ---------------------------
+# Recordings
+# ---------------------------
+
+_CSV_FIELDS = ["date", "open", "high", "low", "close", "volume"]
+
+
+def _read_csv(path: str) -> List[Candle]:
+    out = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            d = datetime.fromisoformat(row["date"])
+            if d.tzinfo is None:
+                d = d.replace(tzinfo=timezone.utc)
+            out.append(Candle(date=d, open=float(row["open"]), high=float(row["high"]),
+                              low=float(row["low"]), close=float(row["close"]), volume=float(row["volume"])))
+    out.sort(key=lambda c: c.date)
+    return out
+
+
+def record_history(provider: MarketProvider, tickers: Iterable[str], period: str, interval: str,
+                   data_dir: str) -> Dict[str, int]:
+    """Fetch history from a real provider once and save it as replay CSVs. Returns rows per ticker."""
+    os.makedirs(data_dir, exist_ok=True)
+    written = {}
+    for t in sorted({t.upper() for t in tickers if t}):
+        candles = provider.get_history(t, period, interval)
+        path = os.path.join(data_dir, f"{t}_{interval}.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            w = csv.writer(f)
+            w.writerow(_CSV_FIELDS)
+            for c in candles:
+                w.writerow([c.date.isoformat(), c.open, c.high, c.low, c.close, c.volume])
+        written[t] = len(candles)
+    return written
@@ -1,9 +1,11 @@
 from __future__ import annotations
-from typing import Iterable, List
+from typing import Iterable, List, Dict
 from datetime import datetime, timezone
+import numpy as np
 import pandas as pd
 import yfinance as yf
 
+from app.core.metrics import PROVIDER_UPSTREAM
 from .base import MarketProvider, Quote, Candle
 
 _PERIOD_MAP = {
@@ -22,7 +24,7 @@ class YahooProvider(MarketProvider):
         if not syms:
             return []
 
-        data = yf.download(
+        data = _upstream("download", yf.download,
             tickers=" ".join(syms),
             period="1d", interval="1m",
             group_by="ticker", progress=False, prepost=True, threads=True,
@@ -56,49 +58,101 @@ class YahooProvider(MarketProvider):
         interval = _INTERVAL_MAP.get(interval, "1d")
 
         # Încercarea 1: download
-        df = yf.download(
+        df = _upstream("download", yf.download,
             tickers=ticker, period=period, interval=interval,
             progress=False, prepost=True, threads=True, auto_adjust=False,
         )
+        if isinstance(df, pd.DataFrame) and isinstance(df.columns, pd.MultiIndex):
+            # yfinance recent întoarce MultiIndex (Price, Ticker) și pentru un singur simbol
+            df = df.droplevel(-1, axis=1)
 
         # Încercarea 2: Ticker.history (uneori revine când download e gol)
         if df is None or df.empty or df.dropna(how="all").empty:
-            df = yf.Ticker(ticker).history(period=period, interval=interval, auto_adjust=False)
+            df = _upstream("ticker_history", yf.Ticker(ticker).history,
+                           period=period, interval=interval, auto_adjust=False)
 
-        if df is None or df.empty or df.dropna(how="all").empty:
+        candles = _frame_to_candles(df)
+        if not candles:
             raise RuntimeError(f"Yahoo empty history for {ticker} ({period}/{interval})")
+        return candles
+
+    def get_history_many(self, tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Candle]]:
+        """
+        One yf.download for all symbols (group_by="ticker"), split per ticker on the column
+        MultiIndex. Ticker.history is used only for symbols that came back empty.
+        Symbols with no data at all are left out of the result.
+        """
+        syms = sorted({t.upper() for t in tickers if t})
+        if not syms:
+            return {}
+        period = _PERIOD_MAP.get(period, "1y")
+        interval = _INTERVAL_MAP.get(interval, "1d")
 
-        # Păstrăm doar coloanele necesare; toate ca vectori (scalari garantat)
-        cols = [c for c in ["Open","High","Low","Close","Volume"] if c in df.columns]
-        df = df[cols].dropna()
-
-        # Iterare pe tupluri (nu Series) ca să evităm FutureWarning
-        candles: List[Candle] = []
-        # asigură ordinea indexului
-        df = df.sort_index()
-        # extragem ca numpy pentru viteză
-        opens  = df["Open"  ].to_numpy(dtype="float64") if "Open"   in df.columns else None
-        highs  = df["High"  ].to_numpy(dtype="float64") if "High"   in df.columns else None
-        lows   = df["Low"   ].to_numpy(dtype="float64") if "Low"    in df.columns else None
-        closes = df["Close" ].to_numpy(dtype="float64") if "Close"  in df.columns else None
-        vols   = df["Volume"].to_numpy(dtype="float64") if "Volume" in df.columns else None
-
-        for idx_i, ts in enumerate(df.index):
-            # ts poate fi tz-naive; normalizăm la UTC
-            if isinstance(ts, pd.Timestamp):
-                if ts.tzinfo is None:
-                    dt = ts.tz_localize("UTC").to_pydatetime()
-                else:
-                    dt = ts.tz_convert("UTC").to_pydatetime()
-            else:
-                dt = datetime.fromtimestamp(int(pd.Timestamp(ts).timestamp()), tz=timezone.utc)
-
-            o = opens[idx_i]  if opens  is not None else float("nan")
-            h = highs[idx_i]  if highs  is not None else float("nan")
-            l = lows[idx_i]   if lows   is not None else float("nan")
-            c = closes[idx_i] if closes is not None else float("nan")
-            v = vols[idx_i]   if vols   is not None else 0.0
-
-            candles.append(Candle(date=dt, open=float(o), high=float(h), low=float(l), close=float(c), volume=float(v)))
+        data = _upstream("download", yf.download,
+            tickers=" ".join(syms), period=period, interval=interval,
+            group_by="ticker", progress=False, prepost=True, threads=True, auto_adjust=False,
+        )
 
-        return candles
+        frames: Dict[str, pd.DataFrame] = {}
+        if isinstance(data, pd.DataFrame) and not data.empty:
+            if isinstance(data.columns, pd.MultiIndex):
+                present = set(data.columns.get_level_values(0))
+                for t in syms:
+                    if t in present:
+                        frames[t] = data[t]
+            elif len(syms) == 1:
+                frames[syms[0]] = data
+
+        out: Dict[str, List[Candle]] = {}
+        for t in syms:
+            candles = _frame_to_candles(frames.get(t))
+            if not candles:
+                try:
+                    candles = _frame_to_candles(
+                        _upstream("ticker_history", yf.Ticker(t).history,
+                                  period=period, interval=interval, auto_adjust=False)
+                    )
+                except Exception:
+                    candles = []
+            if candles:
+                out[t] = candles
+        return out
+
+
+def _upstream(endpoint: str, fn, *args, **kwargs):
+    """One upstream Yahoo request, counted by endpoint/outcome."""
+    try:
+        out = fn(*args, **kwargs)
+    except Exception:
+        PROVIDER_UPSTREAM.inc(provider="yahoo", endpoint=endpoint, outcome="error")
+        raise
+    PROVIDER_UPSTREAM.inc(provider="yahoo", endpoint=endpoint, outcome="ok")
+    return out
+
+
+def _frame_to_candles(df: pd.DataFrame | None) -> List[Candle]:
+    """OHLCV frame (Yahoo column names) -> candles in ascending UTC order; vectorized per column."""
+    if df is None or df.empty or df.dropna(how="all").empty:
+        return []
+
+    # Păstrăm doar coloanele necesare; toate ca vectori (scalari garantat)
+    cols = [c for c in ["Open","High","Low","Close","Volume"] if c in df.columns]
+    df = df[cols].dropna().sort_index()
+    if df.empty:
+        return []
+
+    # ts poate fi tz-naive; normalizăm la UTC (vectorizat pe tot indexul)
+    idx = pd.DatetimeIndex(df.index)
+    idx = idx.tz_localize("UTC") if idx.tz is None else idx.tz_convert("UTC")
+    dates = idx.to_pydatetime()
+
+    n = len(df)
+    nan = np.full(n, np.nan)
+    def col(name: str, default: np.ndarray) -> list:
+        return (df[name].to_numpy(dtype="float64") if name in df.columns else default).tolist()
+
+    return [
+        Candle(date=d, open=o, high=h, low=l, close=c, volume=v)
+        for d, o, h, l, c, v in zip(dates, col("Open", nan), col("High", nan), col("Low", nan),
+                                     col("Close", nan), col("Volume", np.zeros(n)))
+    ]
@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+"""
+Quote streaming hub (server push)
+- One shared upstream poller per process: fetches the union of subscribed symbols once per tick
+- Fan-out of *changed* prices only, per subscriber
+- Backpressure by conflation: a slow subscriber keeps only the latest price per symbol,
+  so memory per subscriber is bounded by its symbol set and the poller never blocks
+- Poller starts on first subscribe and stops automatically when nobody is subscribed
+"""
+
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from app.core.config import settings
+from app.core.logging import logger
+
+QuoteFetcher = Callable[[List[str]], Dict[str, float | None]]
+
+
+def _default_fetch(symbols: List[str]) -> Dict[str, float | None]:
+    from app.services.market_data import get_quotes
+    return get_quotes(symbols)
+
+
+class Subscription:
+    """
+    A client's view of the stream. Updates are merged into `_pending` (latest wins)
+    and handed out as one batch per `get()`.
+    """
+
+    def __init__(self, symbols: Iterable[str]):
+        self.symbols: frozenset[str] = frozenset(symbols)
+        self.conflated = 0  # updates overwritten before the client read them
+        self._pending: Dict[str, float | None] = {}
+        self._event = asyncio.Event()
+
+    def offer(self, changes: Dict[str, float | None]) -> None:
+        # iterăm pe setul mai mic (de obicei simbolurile clientului)
+        if len(self.symbols) <= len(changes):
+            keys = [t for t in self.symbols if t in changes]
+        else:
+            keys = [t for t in changes if t in self.symbols]
+        if not keys:
+            return
+        for t in keys:
+            if t in self._pending:
+                self.conflated += 1
+            self._pending[t] = changes[t]
+        self._event.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    async def get(self) -> Dict[str, float | None]:
+        await self._event.wait()
+        batch, self._pending = self._pending, {}
+        self._event.clear()
+        return batch
+
+
+class QuoteStreamHub:
+    def __init__(self, fetch: Optional[QuoteFetcher] = None, interval_seconds: float | None = None):
+        self._fetch = fetch or _default_fetch
+        self.interval = float(interval_seconds if interval_seconds is not None
+                              else settings.market_stream_interval_seconds)
+        self._subs: Set[Subscription] = set()
+        self._last: Dict[str, float | None] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.ticks = 0
+        self.upstream_calls = 0
+
+    # --------------- subscriptions ---------------
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subs)
+
+    async def subscribe(self, symbols: Iterable[str]) -> Subscription:
+        sub = Subscription(t.strip().upper() for t in symbols if t and t.strip())
+        self._subs.add(sub)
+        # snapshot imediat din ultimul tick, ca UI-ul să nu aștepte un interval întreg
+        known = {t: self._last[t] for t in sub.symbols if t in self._last}
+        if known:
+            sub.offer(known)
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        # poller-ul iese singur la următorul tick dacă nu mai are abonați
+        self._subs.discard(sub)
+
+    def _symbols(self) -> List[str]:
+        union: Set[str] = set()
+        for s in self._subs:
+            union |= s.symbols
+        return sorted(union)
+
+    # --------------- poller ---------------
+
+    async def tick(self) -> Dict[str, float | None]:
+        """Fetch the union of subscribed symbols once and fan out the changed prices."""
+        syms = self._symbols()
+        if not syms:
+            return {}
+        self.upstream_calls += 1
+        prices = await asyncio.to_thread(self._fetch, syms)
+        self.ticks += 1
+
+        changes = {t: p for t, p in prices.items() if t not in self._last or self._last[t] != p}
+        self._last.update(prices)
+        if changes:
+            for sub in list(self._subs):
+                sub.offer(changes)
+        return changes
+
+    async def _run(self) -> None:
+        logger.info("Quote stream poller started (interval={}s)", self.interval)
+        try:
+            while self._subs:
+                try:
+                    await self.tick()
+                except Exception as e:
+                    logger.warning("Quote stream tick failed: {}", e)
+                await asyncio.sleep(self.interval)
+        finally:
+            self._task = None
+            # fără abonați nu păstrăm prețuri vechi; următorul abonat pornește curat
+            if not self._subs:
+                self._last.clear()
+            logger.info("Quote stream poller stopped (no subscribers).")
+
+
+quote_hub = QuoteStreamHub()
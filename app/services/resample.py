@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+"""
+Local OHLCV resampling and period trimming (one cached base series per ticker/period)
+- Daily family (5d, 1wk, 1mo, 3mo) from 1d bars; intraday (2m..90m, 1h) from the finest base
+  interval the providers serve for that period (1m <= 5d, 5m <= 1mo, 60m <= 2y)
+- Buckets: open = first, high = max, low = min, close = last, volume = sum, computed with
+  np.*.reduceat over bucket start indices (one pass, no per-bar Python)
+- Session-aware intraday buckets: anchored at each session's first bar (a gap of more than
+  SESSION_GAP_SECONDS starts a new session), so 60m bars start at 09:30, not 09:00
+- Daily bars are keyed by their calendar day even when the provider stamps local midnight
+  (ex: 22:00 UTC for Bucharest): timestamps are rounded to the nearest UTC day first
+- Period trimming: the window start is computed from the last bar (1d/5d = last 1/5 sessions,
+  ytd = 1 Jan, Nmo/Ny = calendar offset) and applied with one searchsorted
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+import numpy as np
+
+_DAY = 86400
+SESSION_GAP_SECONDS = 2 * 3600
+
+INTRADAY_SECONDS = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600, "90m": 5400}
+DAILY_FAMILY = ("1d", "5d", "1wk", "1mo", "3mo")
+
+# cea mai lungă perioadă pe care providerii o dau pentru un interval intraday (Yahoo: 1m ~7 zile,
+# < 1h ~60 zile, 1h ~730 zile)
+_PERIOD_ORDER = ["1d", "5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"]
+MAX_PERIOD = {"1m": "5d", "2m": "1mo", "5m": "1mo", "15m": "1mo", "30m": "1mo", "90m": "1mo",
+              "60m": "2y", "1h": "2y"}
+_BASES = ("1m", "5m", "15m", "30m", "60m")
+
+
+def base_interval(period: str, interval: str) -> str:
+    """Finest interval a provider serves for `period` that `interval` can be derived from."""
+    if interval in DAILY_FAMILY:
+        return "1d"
+    target = INTRADAY_SECONDS.get(interval)
+    if target is None or period not in _PERIOD_ORDER:
+        return interval
+    rank = _PERIOD_ORDER.index(period)
+    for base in _BASES:
+        sec = INTRADAY_SECONDS[base]
+        if sec <= target and target % sec == 0 and rank <= _PERIOD_ORDER.index(MAX_PERIOD[base]):
+            return base
+    return interval
+
+
+def broader_period(period: str, interval: str) -> Optional[str]:
+    """One step wider than `period` (retry after an empty answer), within the interval's limit."""
+    if period not in _PERIOD_ORDER or period == "max":
+        return None
+    nxt = _PERIOD_ORDER[_PERIOD_ORDER.index(period) + 1]
+    limit = MAX_PERIOD.get(interval)
+    if limit is not None and _PERIOD_ORDER.index(nxt) > _PERIOD_ORDER.index(limit):
+        return None
+    return nxt
+
+
+_PERIOD_MONTHS = {"1mo": 1, "3mo": 3, "6mo": 6, "1y": 12, "2y": 24, "5y": 60, "10y": 120}
+_PERIOD_SESSIONS = {"1d": 1, "5d": 5}
+
+
+def period_start(t: np.ndarray, period: str) -> Optional[int]:
+    """First timestamp (epoch s) inside `period`, measured back from the last bar; None = keep all."""
+    if len(t) == 0 or period == "max":
+        return None
+    if period in _PERIOD_SESSIONS:
+        k = _PERIOD_SESSIONS[period]
+        # sesiunile se caută doar în coada seriei (k zile + sărbători), nu în toți cei 20 de ani
+        lo = int(np.searchsorted(t, t[-1] - (k + 10) * _DAY, side="left"))
+        tail = t[lo:]
+        starts = np.flatnonzero(np.r_[True, np.diff(tail) > SESSION_GAP_SECONDS])
+        if len(starts) > k:
+            return int(tail[starts[-k]])
+        return int(tail[0]) if lo else None
+    # pe ziua calendaristică a ultimei bare (aceeași rotunjire ca la bucketele zilnice)
+    last = datetime.fromtimestamp((int(t[-1]) + _DAY // 2) // _DAY * _DAY, tz=timezone.utc)
+    if period == "ytd":
+        start = last.replace(month=1, day=1)
+    elif period in _PERIOD_MONTHS:
+        m = last.year * 12 + last.month - 1 - _PERIOD_MONTHS[period]
+        y, mo = divmod(m, 12)
+        start = last.replace(year=y, month=mo + 1, day=min(last.day, 28))
+    else:
+        return None
+    return int(start.timestamp()) - _DAY // 2  # ștampile la miezul nopții locale (până la UTC-12)
+
+
+def trim_period(cols: Optional[Dict[str, np.ndarray]], period: str) -> Optional[Dict[str, np.ndarray]]:
+    """Keep only the bars of `period` (copied, so a cached slice does not pin the full series)."""
+    if cols is None:
+        return cols
+    start = period_start(cols["t"], period)
+    if start is None:
+        return cols
+    i = int(np.searchsorted(cols["t"], start, side="left"))
+    if i == 0:
+        return cols
+    return {k: v[i:].copy() for k, v in cols.items()}
+
+
+def _bucket_keys(t: np.ndarray, interval: str) -> np.ndarray:
+    if interval in INTRADAY_SECONDS:
+        sec = INTRADAY_SECONDS[interval]
+        new_session = np.r_[True, np.diff(t) > SESSION_GAP_SECONDS]
+        anchor = t[np.maximum.accumulate(np.where(new_session, np.arange(len(t)), 0))]
+        return anchor + (t - anchor) // sec * sec
+    day = (t + _DAY // 2) // _DAY  # cea mai apropiată zi UTC (miezul nopții local, orice fus)
+    if interval == "1d":
+        return day
+    if interval == "5d":
+        return np.arange(len(t)) // 5  # câte 5 ședințe consecutive
+    if interval == "1wk":
+        return day - (day + 3) % 7  # luni; 1970-01-01 a fost joi
+    months = day.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+    if interval == "1mo":
+        return months
+    if interval == "3mo":
+        return months // 3
+    raise ValueError(f"cannot resample to {interval}")
+
+
+def resample(cols: Dict[str, np.ndarray], interval: str) -> Dict[str, np.ndarray]:
+    """Aggregate columnar bars (t, o, h, l, c, v; sorted by t) into `interval` buckets."""
+    t = cols["t"]
+    if len(t) == 0:
+        return cols
+    key = _bucket_keys(t, interval)
+    idx = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    last = np.r_[idx[1:] - 1, len(t) - 1]
+    return {
+        "t": t[idx],  # bara agregată poartă timpul primei bare din bucket (ca la provider)
+        "o": cols["o"][idx],
+        "h": np.maximum.reduceat(cols["h"], idx),
+        "l": np.minimum.reduceat(cols["l"], idx),
+        "c": cols["c"][last],
+        "v": np.add.reduceat(cols["v"], idx),
+    }
+
+
+def derive(cols: Optional[Dict[str, np.ndarray]], base: str, interval: str) -> Optional[Dict[str, np.ndarray]]:
+    if cols is None or base == interval:
+        return cols
+    return resample(cols, interval)
+
+
+# ---------------------------
+# Chart downsampling
+# ---------------------------
+
+DOWNSAMPLE_METHODS = ("minmax", "lttb")
+
+
+def _interior_edges(n: int, max_points: int) -> np.ndarray:
+    """Bucket starts for rows 1..n-2 in max_points-2 buckets (first/last rows stay alone)."""
+    return np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+
+
+def _minmax(cols: Dict[str, np.ndarray], max_points: int) -> Dict[str, np.ndarray]:
+    n = len(cols["t"])
+    starts = np.r_[0, _interior_edges(n, max_points)[:-1], n - 1]
+    last = np.r_[starts[1:] - 1, n - 1]
+    return {
+        "t": cols["t"][starts], "o": cols["o"][starts],
+        "h": np.maximum.reduceat(cols["h"], starts), "l": np.minimum.reduceat(cols["l"], starts),
+        "c": cols["c"][last], "v": np.add.reduceat(cols["v"], starts),
+    }
+
+
+def _lttb(cols: Dict[str, np.ndarray], max_points: int) -> Dict[str, np.ndarray]:
+    """
+    Largest-Triangle-Three-Buckets on close (x = bar index, like the charts draw it).
+    Each bucket's third vertex is the previous bucket's mean instead of the previously
+    selected point, so every bucket is solved in the same vectorized pass.
+    """
+    y = cols["c"]
+    n = len(y)
+    edges = _interior_edges(n, max_points)
+    starts, ends = edges[:-1], edges[1:]
+    x = np.arange(n, dtype=np.float64)
+    counts = (ends - starts).astype(np.float64)
+    # fără ultimul rând: altfel reduceat îl adună în ultimul bucket, iar media lui se deplasează
+    mx = np.add.reduceat(x[:n - 1], starts) / counts
+    my = np.add.reduceat(y[:n - 1], starts) / counts
+    ax, ay = np.r_[0.0, mx[:-1]], np.r_[y[0], my[:-1]]
+    cx, cy = np.r_[mx[1:], n - 1.0], np.r_[my[1:], y[-1]]
+
+    bucket = np.repeat(np.arange(len(starts)), ends - starts)
+    xi, yi = x[1:n - 1], y[1:n - 1]
+    area = np.abs((ax[bucket] - cx[bucket]) * (yi - ay[bucket]) - (ax[bucket] - xi) * (cy[bucket] - ay[bucket]))
+    best = np.maximum.reduceat(area, starts - 1)
+    hit = np.flatnonzero(area == best[bucket])
+    _, first = np.unique(bucket[hit], return_index=True)
+    idx = np.r_[0, hit[first] + 1, n - 1]
+    return {k: v[idx] for k, v in cols.items()}
+
+
+def downsample(cols: Dict[str, np.ndarray], max_points: Optional[int], method: str = "minmax") -> Dict[str, np.ndarray]:
+    """
+    At most `max_points` bars; the first and last bars are always kept.
+    minmax: interior rows bucketed into OHLC candles (extremes preserved);
+    lttb: the visually most significant real bars on close.
+    """
+    n = len(cols["t"])
+    if not max_points or n <= max_points:
+        return cols
+    if max_points < 3:
+        raise ValueError("max_points must be >= 3")
+    if method == "lttb":
+        return _lttb(cols, max_points)
+    if method == "minmax":
+        return _minmax(cols, max_points)
+    raise ValueError(f"unknown downsample method: {method}")
@@ -0,0 +1,292 @@
+from __future__ import annotations
+
+"""
+Universe sharding across worker processes / hosts
+- Ticker -> logical shard: stable hash mod SHARD_COUNT (same ticker, same shard, every day)
+- Logical shard -> worker: consistent-hash ring (virtual nodes) over the live workers, so a
+  worker joining or leaving moves only ~1/N of the shards; the rest keep warm caches
+- Ownership is a lease in the shard_leases table: workers heartbeat a "worker:<id>" row,
+  claim the shards the ring gives them with a conditional UPDATE (own or expired rows only)
+  and release the ones they should hand over; a dead worker's leases expire and get taken
+- Routing: ShardRoutingMiddleware sends per-ticker requests to the owner (307 or proxy)
+"""
+
+import asyncio
+import bisect
+import hashlib
+import os
+import re
+import socket
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.db.models import ShardLease
+
+FORWARDED_HEADER = "x-shard-forwarded"
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def shard_of(ticker: str, shard_count: int | None = None) -> int:
+    return _hash64(ticker.strip().upper()) % int(shard_count or settings.shard_count)
+
+
+class HashRing:
+    """Consistent hashing with `vnodes` points per node."""
+
+    def __init__(self, nodes: Iterable[str], vnodes: int = 64):
+        points = sorted((_hash64(f"{n}#{i}"), n) for n in set(nodes) for i in range(vnodes))
+        self._keys = [h for h, _ in points]
+        self._nodes = [n for _, n in points]
+
+    def owner(self, key: str) -> Optional[str]:
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash64(key)) % len(self._keys)
+        return self._nodes[i]
+
+
+class ShardCoordinator:
+    def __init__(self, worker_id: str, url: str | None = None, shard_count: int | None = None,
+                 lease_seconds: float | None = None, vnodes: int | None = None,
+                 session_factory: Callable | None = None, clock: Callable[[], float] = time.time):
+        if session_factory is None:
+            from app.db.session import SessionLocal
+            session_factory = SessionLocal
+        self.worker_id = worker_id
+        self.url = url
+        self.shard_count = int(shard_count or settings.shard_count)
+        self.lease_seconds = float(lease_seconds or settings.shard_lease_seconds)
+        self.vnodes = int(vnodes or settings.shard_vnodes)
+        self._session = session_factory
+        self._clock = clock
+        self.owned: set = set()
+        # instantaneul ultimului heartbeat: shard -> (owner, url)
+        self.assignments: Dict[int, Tuple[str, Optional[str]]] = {}
+        self.live_workers: List[str] = []
+
+    # --------------- leases ---------------
+
+    def _claim(self, db, key: str, now: float) -> bool:
+        exp = now + self.lease_seconds
+        renewed = db.execute(
+            update(ShardLease).where(ShardLease.key == key, ShardLease.owner == self.worker_id)
+            .values(expires_at=exp, owner_url=self.url)
+        ).rowcount
+        if renewed:
+            return True
+        taken = db.execute(
+            update(ShardLease).where(ShardLease.key == key, ShardLease.expires_at < now)
+            .values(owner=self.worker_id, owner_url=self.url, expires_at=exp, version=ShardLease.version + 1)
+        ).rowcount
+        if taken:
+            return True
+        if db.get(ShardLease, key) is not None:
+            return False  # deținut de altcineva, încă valid
+        db.commit()  # ce am preluat deja nu se pierde dacă insertul pică
+        try:
+            db.add(ShardLease(key=key, owner=self.worker_id, owner_url=self.url, expires_at=exp, version=1))
+            db.commit()
+            return True
+        except IntegrityError:
+            db.rollback()
+            return False  # alt worker a inserat între timp
+
+    def heartbeat(self) -> Dict[str, int]:
+        """Renew membership, claim/release shards per the ring, refresh the routing snapshot."""
+        now = self._clock()
+        acquired = released = 0
+        with self._session() as db:
+            self._claim(db, f"worker:{self.worker_id}", now)
+            db.commit()
+
+            rows = db.execute(select(ShardLease)).scalars().all()
+            self.live_workers = sorted(r.owner for r in rows if r.key.startswith("worker:") and r.expires_at >= now)
+            ring = HashRing(self.live_workers, self.vnodes)
+            leases = {r.key: r for r in rows if r.key.startswith("shard:")}
+
+            owned = set()
+            for s in range(self.shard_count):
+                key = f"shard:{s}"
+                lease = leases.get(key)
+                mine = lease is not None and lease.owner == self.worker_id and lease.expires_at >= now
+                if ring.owner(key) == self.worker_id:
+                    if self._claim(db, key, now):
+                        owned.add(s)
+                        acquired += not mine
+                elif mine:
+                    # predare: expiră acum, noul owner din ring o preia la următorul lui heartbeat
+                    db.execute(update(ShardLease).where(ShardLease.key == key, ShardLease.owner == self.worker_id)
+                               .values(expires_at=0.0))
+                    released += 1
+            db.commit()
+
+            rows = db.execute(select(ShardLease).where(ShardLease.key.like("shard:%"))).scalars().all()
+            self.assignments = {int(r.key.split(":", 1)[1]): (r.owner, r.owner_url)
+                                for r in rows if r.expires_at >= now}
+        if acquired or released:
+            logger.info("Shard leases: {} owns {} shards (+{} / -{}), {} live workers",
+                        self.worker_id, len(owned), acquired, released, len(self.live_workers))
+        self.owned = owned
+        return {"owned": len(owned), "acquired": acquired, "released": released}
+
+    def release_all(self) -> None:
+        with self._session() as db:
+            db.execute(update(ShardLease).where(ShardLease.owner == self.worker_id).values(expires_at=0.0))
+            db.commit()
+        self.owned = set()
+
+    # --------------- lookups ---------------
+
+    def owner_of(self, ticker: str) -> Tuple[Optional[str], Optional[str]]:
+        """(worker_id, url) holding the ticker's shard; (None, None) while unassigned."""
+        return self.assignments.get(shard_of(ticker, self.shard_count), (None, None))
+
+    def is_local(self, ticker: str) -> bool:
+        owner, _ = self.owner_of(ticker)
+        return owner is None or owner == self.worker_id
+
+    def local_tickers(self, tickers: Iterable[str]) -> List[str]:
+        return [t for t in tickers if shard_of(t, self.shard_count) in self.owned]
+
+
+# ---------------------------
+# Proces curent
+# ---------------------------
+
+coordinator: Optional[ShardCoordinator] = None
+
+
+def default_worker_id() -> str:
+    return settings.shard_worker_id or f"{socket.gethostname()}:{os.getpid()}"
+
+
+def init_sharding() -> Optional[ShardCoordinator]:
+    global coordinator
+    if not settings.shard_enabled:
+        return None
+    coordinator = ShardCoordinator(default_worker_id(), settings.shard_url)
+    coordinator.heartbeat()
+    return coordinator
+
+
+async def heartbeat_loop(coord: ShardCoordinator) -> None:
+    try:
+        while True:
+            await asyncio.sleep(coord.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(coord.heartbeat)
+            except Exception as e:
+                logger.warning("Shard heartbeat failed: {}", e)
+    finally:
+        await asyncio.to_thread(coord.release_all)
+
+
+def local_universe(dt=None) -> List[str]:
+    """Today's universe restricted to this worker's shards (everything when sharding is off)."""
+    from app.services.universe import today_universe
+
+    tickers = today_universe(dt)["all"]
+    return coordinator.local_tickers(tickers) if coordinator is not None else tickers
+
+
+# ---------------------------
+# Routing
+# ---------------------------
+
+_TICKER_PATHS = [re.compile(r"^/api/predictions/([^/]+)$")]
+_TICKER_QUERY_PREFIXES = ("/api/market/history", "/api/ml/")
+_HOP_HEADERS = {b"connection", b"keep-alive", b"transfer-encoding", b"content-length", b"host"}
+
+
+def ticker_for(path: str, query_string: bytes) -> Optional[str]:
+    for rx in _TICKER_PATHS:
+        m = rx.match(path)
+        if m:
+            return m.group(1).upper()
+    if path.startswith(_TICKER_QUERY_PREFIXES) and b"ticker=" in query_string:
+        vals = parse_qs(query_string.decode("latin-1")).get("ticker")
+        if vals and "," not in vals[0]:
+            return vals[0].strip().upper()
+    return None
+
+
+class ShardRoutingMiddleware:
+    """
+    Pure ASGI. SHARD_ROUTING=redirect => 307 to the owner, proxy => forward the request
+    (one hop, marked with X-Shard-Forwarded so it is never forwarded twice).
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._client = None
+
+    async def __call__(self, scope, receive, send):
+        coord = coordinator
+        mode = settings.shard_routing
+        if scope["type"] != "http" or coord is None or mode == "off":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        ticker = ticker_for(scope["path"], scope.get("query_string", b""))
+        if ticker is None or FORWARDED_HEADER.encode() in headers:
+            await self.app(scope, receive, send)
+            return
+        owner, url = coord.owner_of(ticker)
+        if owner is None or owner == coord.worker_id or not url:
+            await self.app(scope, receive, send)
+            return
+
+        target = url.rstrip("/") + scope["path"]
+        if scope.get("query_string"):
+            target += "?" + scope["query_string"].decode("latin-1")
+        if mode == "redirect":
+            await send({"type": "http.response.start", "status": 307,
+                        "headers": [(b"location", target.encode("latin-1")), (b"x-shard-owner", owner.encode())]})
+            await send({"type": "http.response.body", "body": b""})
+            return
+        await self._proxy(scope, receive, send, target, owner)
+
+    async def _proxy(self, scope, receive, send, target: str, owner: str) -> None:
+        import httpx
+
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=30.0)
+        body = b""
+        more = True
+        while more:
+            message = await receive()
+            body += message.get("body", b"")
+            more = message.get("more_body", False)
+        fwd = [(k, v) for k, v in scope.get("headers") or [] if k.lower() not in _HOP_HEADERS]
+        fwd.append((FORWARDED_HEADER.encode(), coordinator.worker_id.encode() if coordinator else b"1"))
+        try:
+            r = await self._client.request(scope["method"], target, headers=fwd, content=body)
+        except httpx.HTTPError as e:
+            logger.warning("Shard proxy to {} failed: {}", owner, e)
+            await self.app(scope, _replay(body), send)  # owner indisponibil => servim local
+            return
+        out = [(k, v) for k, v in r.headers.raw if k.lower() not in _HOP_HEADERS]
+        out += [(b"content-length", str(len(r.content)).encode()), (b"x-shard-owner", owner.encode())]
+        await send({"type": "http.response.start", "status": r.status_code, "headers": out})
+        await send({"type": "http.response.body", "body": r.content})
+
+
+def _replay(body: bytes):
+    sent = False
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            return {"type": "http.disconnect"}
+        sent = True
+        return {"type": "http.request", "body": body, "more_body": False}
+    return receive
@@ -6,7 +6,9 @@ import { toast } from "./toast.js";
 
 export async function openDetails(ticker){
   try {
-    const data = await getPredictionDetails(ticker, { period:"6mo", interval:"1d", limit:12 });
+    // modalul lg are cel mult ~1000px; un punct per pixel fizic ajunge pentru sparkline
+    const chartPx = Math.min(window.innerWidth || 1000, 1000) * (window.devicePixelRatio || 1);
+    const data = await getPredictionDetails(ticker, { period:"6mo", interval:"1d", limit:12, maxPoints: chartPx });
 
     const root = document.createElement("div");
     root.innerHTML = `
@@ -1,10 +1,32 @@
-﻿export async function getPredictions() {
-  const r = await fetch("/api/predictions");
-  if (!r.ok) {
+﻿// Cache HTTP condiționat: păstrăm ultimul body + ETag per URL și respectăm max-age local;
+// la revalidare serverul răspunde 304 fără body (și fără lucru la provider/DB).
+const httpCache = new Map(); // url -> { etag, body, freshUntil }
+
+function maxAgeMs(r){
+  const m = /max-age=(\d+)/.exec(r.headers.get("Cache-Control") || "");
+  return m ? Number(m[1]) * 1000 : 0;
+}
+
+async function getJSON(url){
+  const hit = httpCache.get(url);
+  if (hit && hit.freshUntil > Date.now()) return hit.body;
+  const r = await fetch(url, { cache: "no-store", headers: hit ? { "If-None-Match": hit.etag } : {} });
+  if (r.status === 304 && hit){
+    hit.freshUntil = Date.now() + maxAgeMs(r);
+    return hit.body;
+  }
+  if (!r.ok){
     const t = await r.text().catch(()=> "");
-    throw new Error(`GET /api/predictions failed: ${r.status} ${r.statusText} ${t?.slice(0,120)}`);
+    throw new Error(`GET ${url} failed: ${r.status} ${r.statusText} ${t?.slice(0,120)}`);
   }
-  return r.json();
+  const body = await r.json();
+  const etag = r.headers.get("ETag");
+  if (etag) httpCache.set(url, { etag, body, freshUntil: Date.now() + maxAgeMs(r) });
+  return body;
+}
+
+export async function getPredictions() {
+  return getJSON("/api/predictions");
 }
 
 export async function createPrediction(ticker, horizon_days=7) {
@@ -17,11 +39,12 @@ export async function createPrediction(ticker, horizon_days=7) {
     const t = await r.text().catch(()=> "");
     throw new Error(`POST /api/predictions failed: ${r.status} ${r.statusText} ${t?.slice(0,120)}`);
   }
+  httpCache.clear(); // o predicție nouă invalidează listele/detaliile memorate
   return r.json();
 }
 
 export async function getQuotes(tickers) {
-  const uniq = [.....new Set(tickers.map(t => t.toUpperCase()))];
+  const uniq = [...new Set(tickers.map(t => t.toUpperCase()))];
   if (!uniq.length) return {};
   const r = await fetch(`/api/market/quotes?tickers=${encodeURIComponent(uniq.join(","))}`);
   if (!r.ok) {
@@ -34,13 +57,22 @@ export async function getQuotes(tickers) {
   return map;
 }
 
-export async function getPredictionDetails(ticker, { period="6mo", interval="1d", limit=12 } = {}){
-  const url = `/api/predictions/${encodeURIComponent(ticker)}?period=${encodeURIComponent(period)}&interval=${encodeURIComponent(interval)}&limit=${limit}`;
-  const r = await fetch(url);
-  if (!r.ok){
-    const t = await r.text().catch(()=> "");
-    throw new Error(`GET ${url} failed: ${r.status} ${r.statusText} ${t?.slice(0,120)}`);
-  }
-  return r.json();
+// Server push: un singur poller pe server pentru toți clienții; primim doar prețurile schimbate.
+export function streamQuotes(tickers, onQuotes, onError){
+  const uniq = [...new Set(tickers.map(t => t.toUpperCase()))];
+  if (!uniq.length || typeof EventSource === "undefined") return null;
+  const es = new EventSource(`/api/market/stream?tickers=${encodeURIComponent(uniq.join(","))}`);
+  es.onmessage = (ev) => {
+    try { onQuotes(JSON.parse(ev.data).quotes || {}); } catch {}
+  };
+  if (onError) es.onerror = onError;
+  return es;
+}
+
+export async function getPredictionDetails(ticker, { period="6mo", interval="1d", limit=12, maxPoints=null } = {}){
+  let url = `/api/predictions/${encodeURIComponent(ticker)}?period=${encodeURIComponent(period)}&interval=${encodeURIComponent(interval)}&limit=${limit}`;
+  // graficul nu are nevoie de mai multe puncte decât pixeli; serverul decimează (LTTB)
+  if (maxPoints) url += `&max_points=${Math.max(3, Math.round(maxPoints))}`;
+  return getJSON(url);
 }
 
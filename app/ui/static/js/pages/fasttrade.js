@@ -1,5 +1,5 @@
-import { fmt, qs } from "../core/utils.js";
-import { getPredictions, getQuotes } from "../core/api.js";
+import { fmt, qs, qsa } from "../core/utils.js";
+import { getPredictions, getQuotes, streamQuotes } from "../core/api.js";
 import { toast } from "../components/toast.js";
 
 function decideSignal(prob, exp, rr){
@@ -17,9 +17,12 @@ function probCell(pct){
   return `<div class="prob"><span class="pill">${Math.round(v)}%</span><span class="meter"><i style="width:${v}%"></i></span></div>`;
 }
 
+let tickers = [];
+
 async function loadOnce(){
   const body = qs("#ftBody"); if (!body) return;
   const data = await getPredictions();
+  tickers = [...new Set(data.slice(0, 25).map(x => x.ticker))];
   const quotes = await getQuotes(data.map(x=>x.ticker));
   body.innerHTML = "";
   for (const p of data.slice(0, 25)){
@@ -29,7 +32,7 @@ async function loadOnce(){
     const tr = document.createElement("tr");
     tr.innerHTML = `
       <td class="font-bold">${p.ticker}</td>
-      <td>${price==null?"-":fmt.price(price)}</td>
+      <td data-price="${p.ticker}">${price==null?"-":fmt.price(price)}</td>
       <td class="${p.expected_change_pct>=0?"text-green":"text-red"}">${fmt.pct(p.expected_change_pct)}</td>
       <td>${probCell(p.probability_pct)}</td>
       <td><span class="${out.cls} badge">${out.t}</span></td>
@@ -41,11 +44,37 @@ async function loadOnce(){
   }
 }
 
-let timer = null;
+function applyQuotes(quotes){
+  for (const [t, price] of Object.entries(quotes)){
+    for (const td of qsa(`td[data-price="${t}"]`)) td.textContent = price==null ? "-" : fmt.price(price);
+  }
+}
+
+// Prețurile vin prin SSE (/api/market/stream); predicțiile se reîncarcă rar.
+// Fallback pe polling dacă browserul nu are EventSource.
+let stream = null, timer = null;
+function stopLive(){
+  if (stream){ stream.close(); stream = null; }
+  if (timer){ clearInterval(timer); timer = null; }
+}
+async function startLive(){
+  await loadOnce();
+  stream = streamQuotes(tickers, applyQuotes);
+  timer = setInterval(stream ? refreshPredictions : loadOnce, stream ? 60000 : 5000);
+}
+async function refreshPredictions(){
+  const before = tickers.join(",");
+  await loadOnce();
+  if (stream && tickers.join(",") !== before){
+    stream.close();
+    stream = streamQuotes(tickers, applyQuotes);
+  }
+}
+
 qs("#ftStart").addEventListener("click", () => {
-  if (!timer){ loadOnce().catch(()=>{}); timer = setInterval(loadOnce, 5000); toast("Fast Trade: started", "success"); }
+  if (!stream && !timer){ startLive().catch(e => toast(e.message, "error")); toast("Fast Trade: started", "success"); }
 });
 qs("#ftStop").addEventListener("click", () => {
-  if (timer){ clearInterval(timer); timer = null; toast("Fast Trade: stopped", "info"); }
+  if (stream || timer){ stopLive(); toast("Fast Trade: stopped", "info"); }
 });
 loadOnce().catch(e => toast(e.message, "error"));
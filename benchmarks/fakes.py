@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+"""
+Deterministic offline market data for benchmarks
+- SynthProvider: MarketProvider over app/ml/data/synth.py::synth_candles
+- Same ticker/period => same candles (seed derived from the ticker); candles are built once
+  and memoized, so timings measure the orchestration, not the generator
+- RecordedLatencyProvider: the same candles behind a recorded upstream cost per request
+  (fixed round trip + per-symbol payload, like yf.download), for serial vs batched fetches
+"""
+
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Tuple
+
+import pandas as pd
+
+from app.ml.data.synth import synth_candles
+from app.services.providers.base import Candle, Quote
+
+# rânduri daily aproximative per period (252 zile de tranzacționare / an)
+PERIOD_ROWS = {
+    "1mo": 21, "3mo": 63, "6mo": 126, "1y": 252, "2y": 504,
+    "5y": 1260, "10y": 2520, "ytd": 200, "max": 5000,
+}
+
+
+def ticker_seed(ticker: str) -> int:
+    return zlib.crc32(ticker.upper().encode("utf-8")) & 0x7FFFFFFF
+
+
+def synth_frame(ticker: str, rows: int):
+    return synth_candles(n=rows, seed=ticker_seed(ticker))
+
+
+_BLOCK = 50_000  # peste ~60k zile lucrătoare date_range depășește limita Timestamp (2262)
+
+
+def candles_frame(n: int, seed: int = 7) -> pd.DataFrame:
+    """
+    synth_candles for any n: independent blocks of <= 50k rows (each restarts near 100).
+    Above one block the dates become a 1-minute range (features don't depend on spacing).
+    """
+    if n <= _BLOCK:
+        return synth_candles(n=n, seed=seed)
+    parts = [synth_candles(n=min(_BLOCK, n - start), seed=seed + i)
+             for i, start in enumerate(range(0, n, _BLOCK))]
+    df = pd.concat(parts, ignore_index=True)
+    df["date"] = pd.date_range("2018-01-01", periods=n, freq="min")
+    return df
+
+
+class SynthProvider:
+    """Offline MarketProvider; counts calls like the real ones would hit upstream."""
+    name = "synth"
+
+    def __init__(self, rows: int | None = None):
+        self.rows = rows  # None => după period
+        self.history_calls = 0
+        self.quote_calls = 0
+        self._memo: Dict[Tuple[str, int], List[Candle]] = {}
+
+    def _candles(self, ticker: str, rows: int) -> List[Candle]:
+        key = (ticker.upper(), rows)
+        if key not in self._memo:
+            df = synth_frame(ticker, rows)
+            dates = pd.DatetimeIndex(df["date"]).tz_localize(timezone.utc).to_pydatetime()
+            cols = [df[c].to_numpy(dtype=float).tolist() for c in ("open", "high", "low", "close", "volume")]
+            self._memo[key] = [Candle(d, o, h, l, c, v) for d, o, h, l, c, v in zip(dates, *cols)]
+        return self._memo[key]
+
+    def get_quotes(self, tickers: Iterable[str]) -> List[Quote]:
+        self.quote_calls += 1
+        now = datetime.now(timezone.utc)
+        return [Quote(ticker=t.upper(), price=self._candles(t, 63)[-1].close, ts=now, provider=self.name)
+                for t in tickers]
+
+    def get_history(self, ticker: str, period: str, interval: str) -> List[Candle]:
+        self.history_calls += 1
+        return self._candles(ticker, self.rows or PERIOD_ROWS.get(period, 252))
+
+    def get_history_many(self, tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Candle]]:
+        self.history_calls += 1  # un singur request batch
+        rows = self.rows or PERIOD_ROWS.get(period, 252)
+        return {t.upper(): self._candles(t, rows) for t in tickers}
+
+
+class RecordedLatencyProvider(SynthProvider):
+    """
+    SynthProvider with a recorded upstream cost: `call_ms` per request + `symbol_ms` per
+    symbol in it (defaults: one yf.download round trip, ~120 ms + ~2 ms per symbol).
+    """
+    name = "recorded"
+
+    def __init__(self, rows: int | None = None, call_ms: float = 120.0, symbol_ms: float = 2.0):
+        super().__init__(rows)
+        self.call_s = call_ms / 1000.0
+        self.symbol_s = symbol_ms / 1000.0
+
+    def get_history(self, ticker: str, period: str, interval: str) -> List[Candle]:
+        time.sleep(self.call_s + self.symbol_s)
+        return super().get_history(ticker, period, interval)
+
+    def get_history_many(self, tickers: Iterable[str], period: str, interval: str) -> Dict[str, List[Candle]]:
+        tickers = list(tickers)
+        time.sleep(self.call_s + self.symbol_s * len(tickers))
+        return super().get_history_many(tickers, period, interval)
+
+
+_NEWS_VERBS = ["beats", "misses", "surges", "falls", "raises guidance", "cuts outlook", "announces buyback",
+               "faces probe", "wins approval", "delays launch", "expands in Asia", "reports record sales"]
+_NEWS_WORDS = ("market investors quarter revenue analysts shares demand supply chip cloud retail energy bank "
+               "rates inflation margin growth forecast consumer tariff deal merger product factory china europe "
+               "earnings call guidance dividend board chief executive customers pricing").split()
+
+
+def synth_articles(n: int, tickers: List[str], dup_rate: float = 0.2, seed: int = 5,
+                   start_ts: float = 1_700_000_000.0):
+    """
+    JSON lines of synthetic articles, ~30 s apart. With probability `dup_rate` an article
+    re-publishes a recent story (other source, different punctuation/case, same words).
+    """
+    import json
+    import random
+
+    rng = random.Random(seed)
+    recent: List[Tuple[str, str, str]] = []
+    for i in range(n):
+        ts = start_ts + i * 30
+        if recent and rng.random() < dup_rate:
+            t, title, body = recent[rng.randrange(len(recent))]
+            title = title.upper() if rng.random() < 0.3 else title.rstrip(".") + "!"
+        else:
+            t = tickers[rng.randrange(len(tickers))]
+            title = f"{t} {rng.choice(_NEWS_VERBS)} as {' '.join(rng.sample(_NEWS_WORDS, 5))}."
+            body = " ".join(rng.choices(_NEWS_WORDS, k=40))
+            recent.append((t, title, body))
+            if len(recent) > 500:
+                recent.pop(0)
+        yield json.dumps({"id": str(i), "ts": ts, "title": title, "body": body,
+                          "source": f"wire{i % 7}", "tickers": [t]})
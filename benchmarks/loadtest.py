@@ -0,0 +1,249 @@
+from __future__ import annotations
+
+"""
+Async load driver: replays dashboard / Fast Trade / prediction traffic against a local server
+- Virtual users pick a scenario by weight (--mix dashboard=6,fasttrade=3,prediction=1)
+  and loop over its requests with think time, honouring ETags like the browser cache
+- Per route template: requests, throughput, p50/p95/p99 latency, error rate (non-2xx/304 or exception)
+- --spawn starts uvicorn with MARKET_PROVIDER_ORDER=replay (no Yahoo / Alpha Vantage traffic);
+  REPLAY_* variables (latency, error/empty/rate-limit rates) are passed through
+
+Usage (from the repo root):
+    python -m benchmarks.loadtest --spawn --users 50 --duration 60 [--json out.json]
+    python -m benchmarks.loadtest --base-url http://127.0.0.1:8000 --users 20 --think 0.5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+import httpx
+import numpy as np
+
+from benchmarks.startup import _free_port
+
+_FALLBACK_TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "TSLA", "NVDA", "AMD", "NFLX", "JPM"]
+DEFAULT_MIX = "dashboard=6,fasttrade=3,prediction=1"
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.not_modified: Dict[str, int] = defaultdict(int)
+
+    def record(self, route: str, seconds: float, status: int | None):
+        self.latencies[route].append(seconds)
+        if status is None or not (200 <= status < 300 or status == 304):
+            self.errors[route] += 1
+        elif status == 304:
+            self.not_modified[route] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        routes = {}
+        for route in sorted(self.latencies):
+            lat = np.asarray(self.latencies[route]) * 1000.0
+            p50, p95, p99 = np.percentile(lat, [50, 95, 99])
+            routes[route] = {
+                "requests": int(lat.size), "rps": lat.size / elapsed,
+                "p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "max_ms": float(lat.max()),
+                "error_rate": self.errors[route] / lat.size,
+                "not_modified_rate": self.not_modified[route] / lat.size,
+            }
+        total = sum(r["requests"] for r in routes.values())
+        errors = sum(self.errors.values())
+        return {"elapsed_s": elapsed, "requests": total, "rps": total / elapsed if elapsed else 0.0,
+                "error_rate": errors / total if total else 0.0, "routes": routes}
+
+
+class User:
+    """One browser tab: own ETag cache, shared Stats."""
+
+    def __init__(self, client: httpx.AsyncClient, stats: Stats, tickers: List[str], rng: random.Random,
+                 think: float):
+        self.client = client
+        self.stats = stats
+        self.tickers = tickers
+        self.rng = rng
+        self.think = think
+        self.etags: Dict[str, str] = {}
+        self.last_predictions: List[Dict] = []
+
+    async def request(self, method: str, route: str, url: str, **kw) -> Tuple[int | None, object]:
+        headers = {}
+        if method == "GET" and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        t0 = time.perf_counter()
+        try:
+            r = await self.client.request(method, url, headers=headers, **kw)
+            status = r.status_code
+        except httpx.HTTPError:
+            self.stats.record(route, time.perf_counter() - t0, None)
+            return None, None
+        self.stats.record(route, time.perf_counter() - t0, status)
+        if method == "GET" and r.headers.get("etag"):
+            self.etags[url] = r.headers["etag"]
+        if status == 200 and r.headers.get("content-type", "").startswith("application/json"):
+            return status, r.json()
+        return status, None
+
+    async def pause(self, factor: float = 1.0):
+        await asyncio.sleep(self.rng.uniform(0.5, 1.5) * self.think * factor)
+
+    def sample(self, k: int) -> List[str]:
+        return self.rng.sample(self.tickers, min(k, len(self.tickers)))
+
+    async def predictions_and_quotes(self):
+        status, data = await self.request("GET", "GET /api/predictions", "/api/predictions")
+        if status == 200 and isinstance(data, list):
+            self.last_predictions = data
+        tickers = [p["ticker"] for p in self.last_predictions[:25]] or self.sample(25)
+        await self.request("GET", "GET /api/market/quotes", "/api/market/quotes?tickers=" + ",".join(tickers))
+
+    # --------------- scenarios ---------------
+
+    async def dashboard(self):
+        await self.predictions_and_quotes()
+        await self.pause()
+        if self.rng.random() < 0.5:  # deschide detaliile unui rând
+            t = self.rng.choice([p["ticker"] for p in self.last_predictions[:25]] or self.tickers)
+            period = self.rng.choice(["3mo", "6mo", "1y"])
+            await self.request("GET", "GET /api/predictions/{ticker}",
+                               f"/api/predictions/{t}?period={period}&interval=1d&limit=10")
+            await self.pause()
+
+    async def fasttrade(self):
+        # polling-ul fallback din fasttrade.js: predicții + cotații la ~5 s
+        await self.predictions_and_quotes()
+        await self.pause(factor=5.0)
+
+    async def prediction(self):
+        t = self.rng.choice(self.tickers)
+        await self.request("POST", "POST /api/predictions", "/api/predictions",
+                           json={"ticker": t, "horizon_days": self.rng.choice([3, 7, 14])})
+        await self.request("GET", "GET /api/predictions/{ticker}",
+                           f"/api/predictions/{t}?period=3mo&interval=1d&limit=10")
+        await self.pause(factor=2.0)
+
+
+def parse_mix(spec: str) -> List[Tuple[str, float]]:
+    out = []
+    for part in spec.split(","):
+        name, _, w = part.partition("=")
+        name = name.strip()
+        if name not in ("dashboard", "fasttrade", "prediction"):
+            raise ValueError(f"unknown scenario: {name}")
+        out.append((name, float(w or 1)))
+    return out
+
+
+async def _universe(client: httpx.AsyncClient) -> List[str]:
+    try:
+        r = await client.get("/api/universe/today")
+        if r.status_code == 200:
+            return r.json().get("all") or _FALLBACK_TICKERS
+    except httpx.HTTPError:
+        pass
+    return _FALLBACK_TICKERS
+
+
+async def run_load(base_url: str, users: int, duration: float, mix: List[Tuple[str, float]],
+                   think: float = 1.0, seed: int = 42, timeout: float = 30.0) -> Dict:
+    stats = Stats()
+    names, weights = zip(*mix)
+    limits = httpx.Limits(max_connections=users * 2, max_keepalive_connections=users * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        tickers = (await _universe(client))[:200]
+        deadline = time.perf_counter() + duration
+
+        async def vu(i: int):
+            rng = random.Random(seed + i)
+            scenario = rng.choices(names, weights)[0]
+            user = User(client, stats, tickers, rng, think)
+            step = getattr(user, scenario)
+            await asyncio.sleep(rng.uniform(0, min(think, duration / 10)))  # ramp-up
+            while time.perf_counter() < deadline:
+                await step()
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(vu(i) for i in range(users)))
+        elapsed = time.perf_counter() - t0
+    report = stats.report(elapsed)
+    report["config"] = {"users": users, "duration_s": duration, "mix": dict(mix), "think_s": think, "seed": seed}
+    return report
+
+
+def spawn_server(port: int, extra_env: Dict[str, str] | None = None, timeout: float = 60.0) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("MARKET_PROVIDER_ORDER", "replay")
+    env.update(extra_env or {})
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            err = proc.stderr.read().decode("utf-8", "replace").strip().splitlines()
+            raise RuntimeError("uvicorn exited: " + (err[-1] if err else "no output"))
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5):
+                return proc
+        except OSError:
+            time.sleep(0.05)
+    proc.terminate()
+    raise TimeoutError("server did not become healthy")
+
+
+def print_report(report: Dict) -> None:
+    print(f"\n{report['requests']} requests in {report['elapsed_s']:.1f} s "
+          f"=> {report['rps']:.1f} req/s, errors {report['error_rate']:.1%}")
+    print(f"\n{'route':<34} {'reqs':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'err':>6} {'304':>6}")
+    for route, r in report["routes"].items():
+        print(f"{route:<34} {r['requests']:>7} {r['rps']:>8.1f} {r['p50_ms']:>8.1f} {r['p95_ms']:>8.1f} "
+              f"{r['p99_ms']:>8.1f} {r['error_rate']:>6.1%} {r['not_modified_rate']:>6.1%}")
+
+
+def main(argv: List[str] | None = None) -> Dict:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--base-url", default=None, help="target server (default: spawn one with --spawn)")
+    ap.add_argument("--spawn", action="store_true", help="start uvicorn with the replay provider")
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--duration", type=float, default=30.0)
+    ap.add_argument("--think", type=float, default=1.0, help="mean think time between steps (s)")
+    ap.add_argument("--mix", default=DEFAULT_MIX)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--json", dest="json_path")
+    args = ap.parse_args(argv)
+
+    proc = None
+    base_url = args.base_url
+    if args.spawn or not base_url:
+        port = _free_port()
+        proc = spawn_server(port)
+        base_url = f"http://127.0.0.1:{port}"
+    try:
+        report = asyncio.run(run_load(base_url, args.users, args.duration, parse_mix(args.mix),
+                                      think=args.think, seed=args.seed))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=10)
+
+    print_report(report)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,550 @@
+from __future__ import annotations
+
+"""
+Offline benchmark suite (no network: SynthProvider over synth_candles, temp DB and artifacts)
+- features: add_indicators at 1k / 10k / 100k / 1M rows
+- ml: train_on_dataframe, predict_from_candles (single-row latency, incl. artifact load)
+- market: get_history orchestration overhead (cache miss / hit), TTLCache get/set; serial
+  get_history vs one get_history_many_columns over 200 symbols behind a recorded upstream
+  latency (RecordedLatencyProvider)
+- news: streaming ingestion (parse, tickers, sentiment, SimHash dedup, aggregation) over
+  100k / 1M synthetic JSONL articles, with articles/s and RSS sampled along the stream
+- policy: EV threshold optimizer over 1M / 5M resolved predictions (exact 1-feature cut,
+  3-feature prefix-sum grid, incremental update) vs a brute-force grid scan
+- explain: TreeSHAP for a train_baseline-sized booster (100 trees, depth 3 / 5), batched vs
+  row-at-a-time, plus the stability report over 500 artifacts x 12 retrain windows
+- logging: caller-side cost of one request's log calls (history path + access log), dev
+  (text, synchronous) vs production (JSON, enqueued sink, per-site sampling), at INFO / DEBUG
+- endpoints: /api/market/history (json / columnar / npy) and POST /api/predictions via the ASGI app
+
+Usage (from the repo root):
+    python -m benchmarks.run [--quick] [--only features,market] [--out benchmarks/results/latest.json]
+                             [--baseline benchmarks/baseline.json] [--threshold 0.2]
+    python -m benchmarks.run compare BASE.json NEW.json [--threshold 0.2]
+
+`compare` (and `--baseline`) exit with status 1 when a case's median is slower than the
+baseline by more than the threshold (0.2 => +20%).
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Tuple
+
+_CASES: List[Tuple[str, Callable]] = []
+
+
+def case(group: str):
+    def deco(fn):
+        _CASES.append((group, fn))
+        return fn
+    return deco
+
+
+def case_key(name: str, params: Dict) -> str:
+    if not params:
+        return name
+    return name + "[" + ",".join(f"{k}={v}" for k, v in params.items()) + "]"
+
+
+def measure(name: str, fn: Callable, *, repeat: int = 5, number: int = 1, warmup: int = 1,
+            **params) -> Dict:
+    """Median/min/max seconds per call over `repeat` runs of `number` calls each."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - t0) / number)
+    return {
+        "key": case_key(name, params), "name": name, "params": params,
+        "median_s": statistics.median(times), "min_s": min(times), "max_s": max(times),
+        "repeat": repeat, "number": number,
+    }
+
+
+def skipped(name: str, reason: str, **params) -> Dict:
+    return {"key": case_key(name, params), "name": name, "params": params, "skipped": reason}
+
+
+# ---------------------------
+# Environment (înainte de orice import din app.*)
+# ---------------------------
+
+def _prepare_env(workdir: str) -> None:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ["DB_CREATE_ALL"] = "true"
+    os.environ["PROFILING_ENABLED"] = "false"
+
+
+def _use_synth_provider():
+    from app.services import market_data
+    from benchmarks.fakes import SynthProvider
+
+    provider = SynthProvider()
+    market_data._PROVIDERS = [provider]
+    market_data._quote_cache.clear()
+    market_data._history_cache.clear()
+    return provider
+
+
+def _use_artifact_dir(path: str) -> None:
+    from app.ml.pipeline import infer_service, train_baseline
+
+    train_baseline.ART_DIR = path
+    infer_service.ART_DIR = path
+
+
+# ---------------------------
+# Cases
+# ---------------------------
+
+@case("features")
+def bench_add_indicators(quick: bool) -> List[Dict]:
+    from app.ml.features.indicators import add_indicators
+    from benchmarks.fakes import candles_frame
+
+    sizes = (1_000, 10_000, 100_000) if quick else (1_000, 10_000, 100_000, 1_000_000)
+    out = []
+    for n in sizes:
+        df = candles_frame(n)
+        out.append(measure("features.add_indicators", lambda: add_indicators(df),
+                           repeat=3 if n >= 100_000 else 7, rows=n))
+    return out
+
+
+@case("ml")
+def bench_train_and_predict(quick: bool) -> List[Dict]:
+    from app.ml.pipeline.infer_service import predict_from_candles
+    from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
+    from benchmarks.fakes import candles_frame
+
+    out = []
+    for n in ((1_500,) if quick else (1_500, 5_000)):
+        df = candles_frame(n)
+        cfg = TrainConfig(ticker="SYN", horizon_days=7)
+        out.append(measure("ml.train_on_dataframe", lambda: train_on_dataframe(df, cfg),
+                           repeat=1 if quick else 3, warmup=0, rows=n))
+
+    recent = candles_frame(300)  # modelul SYN_7d e deja antrenat mai sus
+    out.append(measure("ml.predict_from_candles", lambda: predict_from_candles("SYN", 7, recent),
+                       repeat=5, number=10, rows=len(recent)))
+    return out
+
+
+@case("market")
+def bench_market(quick: bool) -> List[Dict]:
+    from app.services import market_data
+
+    _use_synth_provider()
+    out = []
+    for period, rows in (("1y", 252), ("5y", 1260)):
+        def miss():
+            market_data._history_cache.clear()
+            market_data.get_history("AAPL", period, "1d")
+
+        out.append(measure("market.get_history", miss, repeat=5, number=20, cache="miss", rows=rows))
+        out.append(measure("market.get_history", lambda: market_data.get_history("AAPL", period, "1d"),
+                           repeat=5, number=50, cache="hit", rows=rows))
+
+    tickers = [f"T{i}" for i in range(50)]
+
+    def quotes_miss():
+        market_data._quote_cache.clear()
+        market_data.get_quotes(tickers)
+
+    out.append(measure("market.get_quotes", quotes_miss, repeat=5, number=50, cache="miss", tickers=50))
+    return out
+
+
+@case("market")
+def bench_history_many(quick: bool) -> List[Dict]:
+    from app.services import market_data
+    from benchmarks.fakes import RecordedLatencyProvider
+
+    provider = RecordedLatencyProvider(rows=252)
+    market_data._PROVIDERS = [provider]
+    n = 40 if quick else 200
+    tickers = [f"T{i:03d}" for i in range(n)]
+
+    def serial():
+        market_data._history_cache.clear()
+        for t in tickers:
+            market_data.get_history(t, "1y", "1d")
+
+    def batch():
+        market_data._history_cache.clear()
+        market_data.get_history_many_columns(tickers, "1y", "1d")
+
+    # serial = n x (120 + 2) ms de upstream: o singură rulare, candles deja memoizate de warmup-ul batch
+    out = [measure("market.history_many", batch, repeat=3, mode="batch", tickers=n, rows=252),
+           measure("market.history_many", serial, repeat=1, warmup=0, mode="serial", tickers=n, rows=252)]
+    _use_synth_provider()
+    return out
+
+
+@case("cache")
+def bench_ttl_cache(quick: bool) -> List[Dict]:
+    from app.services.cache import TTLCache
+
+    ops = 10_000
+    keys = [f"history:T{i}:1y:1d" for i in range(ops)]
+    cache = TTLCache(ttl_seconds=60, maxsize=ops * 2)
+
+    def set_all():
+        for k in keys:
+            cache.set(k, k)
+
+    def get_all():
+        for k in keys:
+            cache.get(k)
+
+    def get_missing():
+        for k in keys:
+            cache.get(k + ":x")
+
+    set_all()
+    return [
+        measure("cache.ttl_set", set_all, repeat=5, ops=ops),
+        measure("cache.ttl_get", get_all, repeat=5, cache="hit", ops=ops),
+        measure("cache.ttl_get", get_missing, repeat=5, cache="miss", ops=ops),
+    ]
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # vârf, nu curent
+
+
+@case("news")
+def bench_news_ingest(quick: bool) -> List[Dict]:
+    from app.services.news_ingestor import JsonlSource, run_pipeline
+    from benchmarks.fakes import synth_articles
+
+    tickers = [f"T{i}" for i in range(500)]
+    out = []
+    for n in ((100_000,) if quick else (100_000, 1_000_000)):
+        # fișierul e scris înainte, generarea nu intră în timp
+        path = os.path.join(tempfile.mkdtemp(prefix="aibursa-news-"), "news.jsonl")
+        with open(path, "w", encoding="utf-8") as f:
+            for line in synth_articles(n, tickers):
+                f.write(line + "\n")
+        rss: List[float] = []
+        step = max(1, n // 10)
+
+        def sampled(src):
+            for i, r in enumerate(src):
+                if i % step == 0:
+                    rss.append(round(_rss_mb(), 1))
+                yield r
+
+        src = JsonlSource(path)
+        t0 = time.perf_counter()
+        res = run_pipeline([sampled(src)], universe=tickers)
+        dt = time.perf_counter() - t0
+        stats = res["stats"]
+        row = {"key": case_key("news.ingest", {"articles": n}), "name": "news.ingest",
+               "params": {"articles": n}, "median_s": dt, "min_s": dt, "max_s": dt,
+               "repeat": 1, "number": 1, "articles_per_s": round(n / dt),
+               "duplicates": stats["duplicates"], "index_mb": round(stats["index_bytes"] / 2**20, 1),
+               "cells": stats["cells"], "rss_mb": rss}  # celulele (ticker, zi) cresc cu intervalul acoperit
+        out.append(row)
+        os.remove(path)
+    return out
+
+
+@case("policy")
+def bench_policy(quick: bool) -> List[Dict]:
+    import itertools
+
+    import numpy as np
+
+    from app.ml.policy.thresholds import PolicyOptimizer, fit_policy, side_features
+
+    def resolved(n, seed=0):
+        rng = np.random.default_rng(seed)
+        prob, exp, rr = rng.uniform(0, 1, n), rng.normal(0, 2, n), rng.gamma(2.0, 1.0, n)
+        return prob, exp, rr, (prob - 0.5) * 4 + 0.3 * exp + rng.normal(0, 3, n)
+
+    out = []
+    for n in ((1_000_000,) if quick else (1_000_000, 5_000_000)):
+        data = resolved(n)
+        out.append(measure("policy.fit_1d", lambda: fit_policy(7, *data, 0.3, ("prob",)), repeat=3, rows=n))
+        out.append(measure("policy.fit_grid", lambda: fit_policy(7, *data, 0.3, bins=32), repeat=3,
+                           rows=n, cells=32 ** 3))
+        opt = PolicyOptimizer.build(7, *data, 0.3, bins=32)
+        day = resolved(n // 180, seed=1)  # o zi nouă de rezultate într-o fereastră de 180 de zile
+
+        def incremental():
+            opt.update(*day)
+            opt.update(*day, sign=-1)
+            opt.solve(30)
+
+        out.append(measure("policy.incremental", incremental, repeat=5, rows=n, new_rows=len(day[0])))
+
+    # referință: grila scanată combinație cu combinație (8^3 praguri, 100k rânduri)
+    prob, exp, rr, realized = resolved(100_000)
+    X, gain = side_features(prob, exp, rr, "buy"), realized - 0.3
+    edges = [np.quantile(X[:, j], np.linspace(0, 1, 8, endpoint=False)) for j in range(3)]
+
+    def brute():
+        best = -np.inf
+        for th in itertools.product(*edges):
+            best = max(best, gain[np.all(X >= th, axis=1)].sum())
+        return best
+
+    out.append(measure("policy.brute_grid", brute, repeat=1, warmup=0, rows=100_000, cells=8 ** 3))
+    out.append(measure("policy.fit_grid", lambda: fit_policy(7, prob, exp, rr, realized, 0.3, bins=8),
+                       repeat=3, rows=100_000, cells=8 ** 3))
+    return out
+
+
+@case("explain")
+def bench_explain(quick: bool) -> List[Dict]:
+    import numpy as np
+    from sklearn.ensemble import GradientBoostingClassifier
+
+    from app.ml.explain.treeshap import TreeExplainer
+    from app.ml.monitoring.shap_stability import stability_report
+
+    rng = np.random.default_rng(0)
+    F = 30  # ~ coloanele din add_indicators
+    X = rng.normal(size=(1500, F))
+    y = (X[:, 0] + 0.5 * X[:, 1] * X[:, 2] + rng.normal(0, 0.5, len(X)) > 0).astype(int)
+    out = []
+    for depth in (3, 5):
+        model = GradientBoostingClassifier(n_estimators=100, max_depth=depth, random_state=0).fit(X, y)
+        ex = TreeExplainer.from_model(model)
+        out.append(measure("explain.build", lambda: TreeExplainer.from_model(model), repeat=3, depth=depth,
+                           leaves=ex.n_leaves))
+        for n in ((1, 1000, 10_000) if quick else (1, 1000, 10_000, 100_000)):
+            rows = rng.normal(size=(n, F))
+            out.append(measure("explain.batch", lambda: ex.shap_values(rows), repeat=3, depth=depth, rows=n))
+        rows = rng.normal(size=(200, F))
+        out.append(measure("explain.row_at_a_time", lambda: [ex.shap_values(r) for r in rows], repeat=3,
+                           depth=depth, rows=200))
+
+    features = [f"f{i}" for i in range(F)]
+    histories = {}
+    for a in range(500):
+        base = rng.gamma(1.0, 1.0, F)
+        histories[f"T{a}_7d"] = {"windows": [{"features": features, "cls": list(base * rng.uniform(0.5, 1.5, F))}
+                                             for _ in range(12)]}
+    out.append(measure("explain.stability_report", lambda: stability_report(histories, "cls"), repeat=3,
+                       artifacts=500, windows=12))
+    return out
+
+
+@case("logging")
+def bench_logging(quick: bool) -> List[Dict]:
+    import logging as std_logging
+
+    from app.core.logging import setup_logging
+
+    access = std_logging.getLogger("uvicorn.access")
+    modes = {
+        "dev": dict(json_format=False, enqueue=False, sample_per_site=0),
+        "prod": dict(json_format=True, enqueue=True, sample_per_site=5),
+    }
+    path = os.path.join(tempfile.mkdtemp(prefix="aibursa-log-"), "app.log")
+    out = []
+    try:
+        for level in ("INFO", "DEBUG"):
+            for mode, kw in modes.items():
+                with open(path, "w", encoding="utf-8") as sink:
+                    log = setup_logging(level=level, sink=sink, **kw)
+
+                    def request():
+                        # ce loghează o cerere /api/market/history cu miss de cache
+                        log.debug("history cache miss for {} ({} {})", "TLV", "1y", "1d")
+                        log.debug("provider {} -> {} rows", "yahoo", 252)
+                        log.info("Fetched history for {} from {} ({} rows)", "TLV", "yahoo", 252)
+                        log.debug("trimmed {} -> {} rows", 252, 252)
+                        access.info('%s - "%s %s HTTP/1.1" %d', "127.0.0.1", "GET", "/api/market/history", 200)
+
+                    out.append(measure("logging.request", request, repeat=5, number=500 if quick else 2000,
+                                       mode=mode, level=level))
+                    log.complete()  # coada se golește în afara timpului măsurat
+                    log.remove()
+    finally:
+        setup_logging()
+    return out
+
+
+def _asgi_app():
+    """app.main if it imports in this tree, otherwise just the market router (reason returned)."""
+    try:
+        from app.main import app
+        return app, None
+    except Exception as e:  # ex: module lipsă pentru rutele de predicții
+        from fastapi import FastAPI
+        from app.api.routes.market import router as market_router
+
+        app = FastAPI()
+        app.include_router(market_router)
+        return app, f"app.main import failed: {type(e).__name__}: {e}"
+
+
+@case("endpoints")
+def bench_endpoints(quick: bool) -> List[Dict]:
+    from fastapi.testclient import TestClient
+
+    _use_synth_provider()
+    app, degraded = _asgi_app()
+    out = []
+    with TestClient(app) as client:
+        for fmt in ("json", "columnar", "npy"):
+            url = f"/api/market/history?ticker=AAPL&period=5y&interval=1d&format={fmt}"
+
+            def get(url=url):
+                r = client.get(url)
+                assert r.status_code == 200, r.text[:200]
+
+            out.append(measure("endpoint.market_history", get, repeat=5, number=20, format=fmt, rows=1260))
+
+        if degraded:
+            out.append(skipped("endpoint.create_prediction", degraded))
+        else:
+            def post():
+                r = client.post("/api/predictions", json={"ticker": "SYN", "horizon_days": 7})
+                assert r.status_code == 200, r.text[:200]
+
+            out.append(measure("endpoint.create_prediction", post, repeat=5, number=3, warmup=1))
+    return out
+
+
+# ---------------------------
+# Results / compare
+# ---------------------------
+
+def _meta(quick: bool) -> Dict:
+    def version(mod):
+        try:
+            return __import__(mod).__version__
+        except Exception:
+            return None
+
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_commit": commit, "quick": quick,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "numpy": version("numpy"), "pandas": version("pandas"), "sklearn": version("sklearn"),
+    }
+
+
+def run(groups: List[str] | None = None, quick: bool = False) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="aibursa-bench-")
+    _prepare_env(workdir)
+    _use_artifact_dir(os.path.join(workdir, "artifacts"))
+    results = []
+    for group, fn in _CASES:
+        if groups and group not in groups:
+            continue
+        print(f"[{group}] {fn.__name__} ...", file=sys.stderr)
+        results.extend(fn(quick))
+    return {"meta": _meta(quick), "results": results}
+
+
+def compare(base: Dict, new: Dict, threshold: float = 0.2) -> Tuple[List[Dict], List[Dict]]:
+    """Rows for every case present in both runs; second value = regressions beyond threshold."""
+    base_by_key = {r["key"]: r for r in base.get("results", []) if "median_s" in r}
+    rows, regressions = [], []
+    for r in new.get("results", []):
+        b = base_by_key.get(r["key"])
+        if b is None or "median_s" not in r or b["median_s"] <= 0:
+            continue
+        ratio = r["median_s"] / b["median_s"]
+        status = "regression" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else "ok"
+        row = {"key": r["key"], "base_s": b["median_s"], "new_s": r["median_s"],
+               "ratio": ratio, "status": status}
+        rows.append(row)
+        if status == "regression":
+            regressions.append(row)
+    return rows, regressions
+
+
+def _fmt_s(s: float) -> str:
+    if s >= 1:
+        return f"{s:.2f} s"
+    if s >= 1e-3:
+        return f"{s * 1e3:.2f} ms"
+    return f"{s * 1e6:.1f} us"
+
+
+def print_results(data: Dict) -> None:
+    for r in data["results"]:
+        if "skipped" in r:
+            print(f"{r['key']:<58} skipped: {r['skipped']}")
+        else:
+            print(f"{r['key']:<58} {_fmt_s(r['median_s']):>12}  (min {_fmt_s(r['min_s'])})")
+
+
+def print_compare(rows: List[Dict], threshold: float) -> None:
+    print(f"\n{'case':<58} {'base':>12} {'new':>12} {'ratio':>7}  (threshold +{threshold:.0%})")
+    for r in rows:
+        flag = "  <-- REGRESSION" if r["status"] == "regression" else ""
+        print(f"{r['key']:<58} {_fmt_s(r['base_s']):>12} {_fmt_s(r['new_s']):>12} {r['ratio']:>7.2f}{flag}")
+
+
+def _load(path: str) -> Dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv: List[str] | None = None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        ap = argparse.ArgumentParser(prog="benchmarks.run compare")
+        ap.add_argument("base")
+        ap.add_argument("new")
+        ap.add_argument("--threshold", type=float, default=0.2)
+        args = ap.parse_args(argv[1:])
+        rows, regressions = compare(_load(args.base), _load(args.new), args.threshold)
+        print_compare(rows, args.threshold)
+        return 1 if regressions else 0
+
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--quick", action="store_true", help="smaller sizes (no 1M rows, one training run)")
+    ap.add_argument("--only", help="comma-separated groups: " + ",".join(dict.fromkeys(g for g, _ in _CASES)))
+    ap.add_argument("--out", default=os.path.join("benchmarks", "results", "latest.json"))
+    ap.add_argument("--baseline", help="compare against this results file after running")
+    ap.add_argument("--threshold", type=float, default=0.2)
+    args = ap.parse_args(argv)
+
+    groups = [g.strip() for g in args.only.split(",")] if args.only else None
+    data = run(groups, quick=args.quick)
+    print_results(data)
+
+    os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    print(f"\nresults -> {args.out}")
+
+    if args.baseline:
+        rows, regressions = compare(_load(args.baseline), data, args.threshold)
+        print_compare(rows, args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
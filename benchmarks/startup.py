@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+"""
+Startup benchmark
+- Per-module import time for `import app.main` (parsed from `python -X importtime`)
+- Time from process start to the first 200 on /health (uvicorn subprocess)
+- When the app cannot be imported (ex: a missing module), both figures are reported as
+  unavailable with the error; the import times of the modules loaded before it are still listed
+
+Usage (from the repo root):
+    python -m benchmarks.startup [--module app.main] [--top 15] [--json out.json]
+"""
+
+import argparse
+import json
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+from typing import Dict, List, Optional, Tuple
+
+
+def import_times(module: str = "app.main") -> Tuple[List[Dict], Optional[str]]:
+    """
+    ([{module, self_ms, cumulative_ms}] sorted by cumulative time, descending; error or None).
+    A failed import still lists the modules that finished loading before the error.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    error = None
+    if proc.returncode != 0:
+        errors = [l for l in proc.stderr.splitlines() if l.strip() and not l.startswith("import time:")]
+        error = errors[-1].strip() if errors else "import failed"
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        # "import time:  self_us | cumulative_us | <indent>module"
+        self_us, cum_us, name = (x.strip() for x in line[len("import time:"):].split("|", 2))
+        rows.append({"module": name, "self_ms": int(self_us) / 1000, "cumulative_ms": int(cum_us) / 1000})
+    rows.sort(key=lambda r: r["cumulative_ms"], reverse=True)
+    return rows, error
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_to_first_health(timeout: float = 60.0) -> float:
+    port = _free_port()
+    t0 = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - t0 < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError("uvicorn exited before serving /health")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5) as r:
+                    if r.status == 200:
+                        return time.perf_counter() - t0
+            except OSError:
+                time.sleep(0.02)
+        raise TimeoutError("no /health response")
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def main(argv: List[str] | None = None) -> Dict:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--module", default="app.main", help="module to import (ex: app.api.routes.market)")
+    ap.add_argument("--top", type=int, default=15)
+    ap.add_argument("--json", dest="json_path")
+    args = ap.parse_args(argv)
+
+    rows, error = import_times(args.module)
+    total = None if error else next((r["cumulative_ms"] for r in rows if r["module"] == args.module), None)
+    first_health = None
+    if error is None and args.module == "app.main":
+        try:
+            first_health = time_to_first_health()
+        except (RuntimeError, TimeoutError) as e:
+            error = f"/health: {e}"
+
+    print(f"import {args.module}: " + (f"{total:.0f} ms" if total is not None else f"unavailable ({error})"))
+    if args.module == "app.main":
+        print("first /health:   " + (f"{first_health * 1000:.0f} ms" if first_health is not None else "unavailable"))
+    print(f"\n{'cumulative ms':>14} {'self ms':>9}  module")
+    for r in rows[: args.top]:
+        print(f"{r['cumulative_ms']:>14.1f} {r['self_ms']:>9.1f}  {r['module']}")
+
+    result = {"module": args.module, "import_ms": total,
+              "first_health_ms": first_health * 1000 if first_health is not None else None,
+              "error": error, "modules": rows[: args.top]}
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(result, f, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+"""
+Upstream history calls for the dashboard's period/interval selector
+- Replays every selector combination (periods x the intervals providers accept for them)
+  for a few tickers through market_data.get_history_columns, within one cache TTL
+- Counts provider history requests with local resampling off (one request per combination)
+  and on (one request per base series), per interval family
+
+Usage (from the repo root):
+    python -m benchmarks.upstream_report [--tickers 5] [--json out.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from typing import Dict, List, Tuple
+
+INTRADAY = {
+    "1m": ["1d", "5d"],
+    "2m": ["1d", "5d", "1mo"], "5m": ["1d", "5d", "1mo"], "15m": ["1d", "5d", "1mo"],
+    "30m": ["1d", "5d", "1mo"], "90m": ["1d", "5d", "1mo"],
+    "60m": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y"], "1h": ["1d", "5d", "1mo", "3mo", "6mo", "1y", "2y"],
+}
+DAILY_PERIODS = ["5d", "1mo", "3mo", "6mo", "ytd", "1y", "2y", "5y", "10y", "max"]
+DAILY = {"1d": DAILY_PERIODS, "5d": DAILY_PERIODS[1:], "1wk": DAILY_PERIODS[1:],
+         "1mo": DAILY_PERIODS[2:], "3mo": DAILY_PERIODS[4:]}
+
+
+def selector_combos() -> List[Tuple[str, str, str]]:
+    """(family, period, interval) for every combination the selector offers."""
+    out = []
+    for family, table in (("intraday", INTRADAY), ("daily", DAILY)):
+        for interval, periods in table.items():
+            out += [(family, p, interval) for p in periods]
+    return out
+
+
+def _replay(tickers: List[str], resample: bool) -> Dict:
+    from app.core.config import settings
+    from app.services import market_data
+    from benchmarks.fakes import SynthProvider
+
+    settings.market_resample_enabled = resample
+    provider = SynthProvider(rows=500)
+    market_data._PROVIDERS = [provider]
+    market_data._history_cache.clear()
+
+    calls: Counter = Counter()
+    bases = set()
+    for t in tickers:
+        for family, period, interval in selector_combos():
+            before = provider.history_calls
+            market_data.get_history_columns(t, period, interval)
+            calls[family] += provider.history_calls - before
+            bases.add((period, market_data._base_interval(period, interval)))
+    return {"calls": dict(calls), "total": sum(calls.values()), "base_series_per_ticker": len(bases)}
+
+
+def report(n_tickers: int = 5) -> Dict:
+    workdir = tempfile.mkdtemp(prefix="aibursa-upstream-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    os.environ["CACHE_BACKEND"] = "memory"
+    os.environ.setdefault("MARKET_HISTORY_CACHE_TTL_SECONDS", "3600")  # tot replay-ul într-un TTL
+
+    tickers = [f"T{i}" for i in range(n_tickers)]
+    combos = selector_combos()
+    off, on = _replay(tickers, False), _replay(tickers, True)
+    families = Counter(f for f, _, _ in combos)
+    rows = [{"family": f, "combos_per_ticker": families[f], "calls_off": off["calls"].get(f, 0),
+             "calls_on": on["calls"].get(f, 0)} for f in families]
+    return {
+        "tickers": n_tickers, "combos_per_ticker": len(combos), "families": rows,
+        "calls_off": off["total"], "calls_on": on["total"],
+        "reduction": 1 - on["total"] / off["total"] if off["total"] else 0.0,
+    }
+
+
+def main(argv: List[str] | None = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--tickers", type=int, default=5)
+    ap.add_argument("--json", help="also write the report here")
+    args = ap.parse_args(argv)
+
+    data = report(args.tickers)
+    print(f"{'family':<10} {'combos/ticker':>14} {'calls (off)':>12} {'calls (on)':>11}")
+    for r in data["families"]:
+        print(f"{r['family']:<10} {r['combos_per_ticker']:>14} {r['calls_off']:>12} {r['calls_on']:>11}")
+    print(f"{'total':<10} {data['combos_per_ticker']:>14} {data['calls_off']:>12} {data['calls_on']:>11}"
+          f"   => {data['reduction']:.0%} fewer upstream history calls ({data['tickers']} tickers)")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+        print(f"report -> {args.json}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import sys
+import types
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import pytest
+from sqlalchemy import DateTime, Float, Integer, String, Text, create_engine
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.services import market_data
+from app.services.providers.base import Candle, Quote
+
+
+class FakeProvider:
+    """Deterministic offline MarketProvider; counts upstream calls."""
+    name = "fake"
+
+    def __init__(self, rows: int = 300):
+        self.rows = rows
+        self.history_calls = 0
+        self.quote_calls = 0
+
+    def get_quotes(self, tickers):
+        self.quote_calls += 1
+        now = datetime.now(timezone.utc)
+        return [Quote(ticker=t, price=100.0 + len(t), ts=now, provider=self.name) for t in tickers]
+
+    def get_history(self, ticker, period, interval):
+        self.history_calls += 1
+        t0 = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        base = 50.0 + sum(map(ord, ticker)) % 50
+        return [
+            Candle(date=t0 + timedelta(days=i), open=base + i * 0.1, high=base + i * 0.1 + 1,
+                   low=base + i * 0.1 - 1, close=base + i * 0.1 + 0.5, volume=1e6 + i)
+            for i in range(self.rows)
+        ]
+
+
+@pytest.fixture
+def fake_provider(monkeypatch):
+    fake = FakeProvider()
+    monkeypatch.setattr(market_data, "_PROVIDERS", [fake])
+    market_data._quote_cache.clear()
+    market_data._history_cache.clear()
+    return fake
+
+
+@lru_cache(maxsize=1)
+def _prediction_model():
+    """Minimal stand-in for app.models.prediction.StockPrediction (the module is not in this tree)."""
+    class _Base(DeclarativeBase):
+        pass
+
+    class StockPrediction(_Base):
+        __tablename__ = "stock_predictions"
+        id: Mapped[int] = mapped_column(Integer, primary_key=True)
+        ticker: Mapped[str] = mapped_column(String(16), index=True)
+        horizon_days: Mapped[int] = mapped_column(Integer)
+        expected_change_pct: Mapped[float] = mapped_column(Float)
+        probability_pct: Mapped[float] = mapped_column(Float)
+        outcome: Mapped[str] = mapped_column(String(16), default="breakeven")
+        reward_to_risk: Mapped[float] = mapped_column(Float)
+        rationale: Mapped[str] = mapped_column(Text, default="")
+        created_at: Mapped[datetime] = mapped_column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+
+    return StockPrediction
+
+
+@pytest.fixture
+def prediction_db(monkeypatch):
+    """In-memory SQLite with a StockPrediction table, registered as app.models.prediction."""
+    model = _prediction_model()
+    pkg, mod = types.ModuleType("app.models"), types.ModuleType("app.models.prediction")
+    mod.StockPrediction = model
+    pkg.prediction = mod
+    monkeypatch.setitem(sys.modules, "app.models", pkg)
+    monkeypatch.setitem(sys.modules, "app.models.prediction", mod)
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    model.metadata.create_all(engine)
+    return types.SimpleNamespace(model=model, engine=engine,
+                                 Session=sessionmaker(bind=engine, autoflush=False, future=True))
@@ -0,0 +1,91 @@
+import numpy as np
+
+from app.services.bar_aggregator import BarAggregator
+
+_DAY0 = 1_700_006_400  # 2023-11-15 00:00 UTC
+
+
+class Clock:
+    def __init__(self, t):
+        self.t = float(t)
+
+    def __call__(self):
+        return self.t
+
+
+def _hist(start, n, step=60, price=100.0):
+    t = np.arange(start, start + n * step, step, dtype=np.int64)
+    c = price + np.arange(n, dtype=np.float64)
+    return {"t": t, "o": c, "h": c + 0.5, "l": c - 0.5, "c": c, "v": np.full(n, 10.0)}
+
+
+def test_bars_from_quotes_rollup_and_bounded_rings():
+    clock = Clock(_DAY0 + 10 * 3600)
+    agg = BarAggregator(cap_1m=30, cap_5m=12, max_tickers=2, clock=clock)
+    agg.start(["AAA", "BBB", "CCC"])
+    for i in range(60 * 6):  # 60 de minute, o cotație la 10s
+        clock.t = _DAY0 + 10 * 3600 + i * 10
+        agg.on_quotes({"AAA": 100.0 + (i % 7), "BBB": 50.0, "CCC": None})
+
+    m1 = agg.history_columns("AAA", "1m", since=_DAY0 + 10 * 3600)
+    assert len(m1["t"]) == 30  # inelul de 1m ține doar ultimele 30 de bare
+    assert np.all(np.diff(m1["t"]) == 60)
+    assert (m1["h"] >= m1["c"]).all() and (m1["l"] <= m1["o"]).all()
+
+    m15 = agg.history_columns("AAA", "15m", since=_DAY0 + 10 * 3600)
+    assert m15["t"].tolist() == [_DAY0 + 10 * 3600 + k * 900 for k in range(4)]
+    assert m15["h"].max() == 106.0 and m15["l"].min() == 100.0
+
+    # preț neschimbat => o singură bară, fără bare plate repetate
+    assert len(agg.history_columns("BBB", "1m", since=0)["t"]) == 1
+    assert agg.history_columns("ZZZ", "1d") is None and agg.stats()["tickers"] == 2
+
+
+def test_backfill_only_before_stream_coverage():
+    clock = Clock(_DAY0 + 12 * 3600)
+    agg = BarAggregator(cap_1m=1440, cap_5m=288, max_tickers=10, clock=clock)
+    agg.start(["AAA"])
+    calls = []
+
+    def fetch(ticker, interval):
+        calls.append((ticker, interval))
+        return _hist(_DAY0 + 9 * 3600, 180)  # 09:00-12:00 de la provider
+
+    for i in range(10):
+        clock.t = _DAY0 + 12 * 3600 + i * 60
+        agg.on_quotes({"AAA": 500.0 + i})
+
+    cols = agg.history_columns("AAA", "1m", backfill=fetch)
+    assert calls == [("AAA", "1m")]
+    assert len(cols["t"]) == 190 and np.all(np.diff(cols["t"]) == 60)
+    assert cols["v"][:180].sum() == 1800.0 and cols["c"][-1] == 509.0
+
+    # a doua citire (și 5m, umplut din același backfill) nu mai merge la provider
+    agg.history_columns("AAA", "1m", backfill=fetch)
+    assert len(agg.history_columns("AAA", "5m", backfill=fetch)["t"]) == 38
+    assert calls == [("AAA", "1m")]
+
+
+def test_unfed_ticker_is_left_to_the_provider():
+    clock = Clock(_DAY0 + 10 * 3600)
+    agg = BarAggregator(cap_1m=1440, cap_5m=288, max_tickers=10, clock=clock)
+    agg.start(["AAA"])
+    calls = []
+
+    def fetch(ticker, interval):
+        calls.append(ticker)
+        return _hist(_DAY0 + 9 * 3600, 60)
+
+    agg.on_quotes({"AAA": 10.0})
+    for hours in (0, 4):  # 4h mai târziu: tot None (nu bare înghețate din memorie)
+        clock.t = _DAY0 + (10 + hours) * 3600
+        assert agg.history_columns("XYZ", "1m", backfill=fetch) is None
+    assert calls == [] and agg.stats()["tickers"] == 1  # citirea nu a alocat inele
+
+    # ieșit din univers la refresh => provider; reintrat => backfill din nou (a pierdut cotații)
+    assert agg.history_columns("AAA", "1m", backfill=fetch) is not None and calls == ["AAA"]
+    agg.set_symbols(["BBB"])
+    assert agg.history_columns("AAA", "1m", backfill=fetch) is None
+    agg.set_symbols(["AAA", "BBB"])
+    agg.history_columns("AAA", "1m", backfill=fetch)
+    assert calls == ["AAA", "AAA"]
@@ -0,0 +1,124 @@
+import multiprocessing as mp
+import socketserver
+import threading
+import time
+
+import numpy as np
+
+from app.services.cache import RedisCache, SQLiteCache, TTLCache, decode_value, encode_value
+
+KEYS = [f"history:T{i}:1y:1d" for i in range(20)]
+
+
+def _columns(i: int):
+    return {"t": np.arange(i, i + 250, dtype="int64"), "c": np.linspace(1.0, 2.0, 250) + i}
+
+
+def test_codec_roundtrip_keeps_raw_arrays():
+    value = {"cols": _columns(3), "meta": ["x", 1, None], "px": np.float64(1.5)}
+    raw = encode_value(value)
+    assert b"pickle" not in raw and len(raw) < 250 * 16 + 200
+    out = decode_value(raw)
+    assert out["cols"]["t"].dtype == np.int64
+    np.testing.assert_array_equal(out["cols"]["c"], value["cols"]["c"])
+    assert out["meta"] == ["x", 1, None] and out["px"] == 1.5
+
+
+# ---------------- RESP stand-in ----------------
+
+class _RespHandler(socketserver.StreamRequestHandler):
+    def _read_cmd(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        n = int(line[1:-2])
+        args = []
+        for _ in range(n):
+            size = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(size + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        while True:
+            cmd = self._read_cmd()
+            if cmd is None:
+                return
+            name = cmd[0].upper()
+            if name == b"SET":
+                px = int(cmd[4]) if len(cmd) > 4 and cmd[3].upper() == b"PX" else None
+                store[cmd[1]] = (cmd[2], time.time() + px / 1000 if px else None)
+                self.wfile.write(b"+OK\r\n")
+            elif name == b"GET":
+                v = store.get(cmd[1])
+                if v is None or (v[1] is not None and v[1] < time.time()):
+                    self.wfile.write(b"$-1\r\n")
+                else:
+                    self.wfile.write(b"$%d\r\n%s\r\n" % (len(v[0]), v[0]))
+            elif name == b"SCAN":
+                prefix = cmd[3][:-1]
+                keys = [k for k in store if k.startswith(prefix)]
+                out = b"*2\r\n$1\r\n0\r\n*%d\r\n" % len(keys)
+                out += b"".join(b"$%d\r\n%s\r\n" % (len(k), k) for k in keys)
+                self.wfile.write(out)
+            elif name == b"DEL":
+                n = sum(store.pop(k, None) is not None for k in cmd[1:])
+                self.wfile.write(b":%d\r\n" % n)
+            else:
+                self.wfile.write(b"-ERR unknown command\r\n")
+
+
+def test_redis_protocol_client_against_local_stand_in():
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _RespHandler)
+    server.daemon_threads = True
+    server.store = {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        port = server.server_address[1]
+        cache = RedisCache(f"redis://127.0.0.1:{port}/0", ttl_seconds=60, namespace="history")
+        assert cache.get("k") is None
+        cache.set("k", _columns(1))
+        np.testing.assert_array_equal(cache.get("k")["t"], _columns(1)["t"])
+        cache.clear()
+        assert cache.get("k") is None
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+# ---------------- multi-process hit ratio ----------------
+
+def _worker(backend: str, path: str, out):
+    cache = SQLiteCache(path, ttl_seconds=60, namespace="history") if backend == "sqlite" else TTLCache(60)
+    hits = misses = 0
+    for _round in range(2):
+        for i, k in enumerate(KEYS):
+            if cache.get(k) is not None:
+                hits += 1
+            else:
+                misses += 1           # aici un worker real ar apela providerul
+                cache.set(k, _columns(i))
+    out.put((hits, misses))
+
+
+def _hit_ratio(backend: str, path: str, workers: int = 4) -> float:
+    ctx = mp.get_context("fork")
+    out = ctx.Queue()
+    hits = misses = 0
+    for _ in range(workers):  # workerii pornesc pe rând, ca la un rolling restart
+        p = ctx.Process(target=_worker, args=(backend, path, out))
+        p.start()
+        h, m = out.get(timeout=30)
+        p.join(timeout=30)
+        hits, misses = hits + h, misses + m
+    return hits / (hits + misses)
+
+
+def test_shared_sqlite_backend_raises_cross_worker_hit_ratio(tmp_path):
+    workers, total = 4, 4 * 2 * len(KEYS)
+    memory = _hit_ratio("memory", "", workers)
+    shared = _hit_ratio("sqlite", str(tmp_path / "cache.sqlite3"), workers)
+    # per-worker: fiecare worker își încălzește singur cache-ul => 50% hit
+    assert memory == (total - workers * len(KEYS)) / total
+    # comun: doar primul worker face miss-uri
+    assert shared == (total - len(KEYS)) / total
@@ -0,0 +1,57 @@
+import numpy as np
+from sklearn.isotonic import IsotonicRegression
+
+from app.ml.calibration.tables import Calibrator, fit_calibrator
+from app.ml.data.synth import synth_candles
+from app.ml.pipeline import infer_service, train_baseline
+from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
+
+
+def _overconfident(n, seed):
+    rng = np.random.default_rng(seed)
+    true_p = rng.uniform(0.05, 0.95, n)
+    y = (rng.uniform(size=n) < true_p).astype(int)
+    logit = np.log(true_p / (1 - true_p))
+    raw = 1 / (1 + np.exp(-(2.0 * logit - 0.5)))  # scor brut prea încrezător și deplasat
+    return raw, y, true_p
+
+
+def test_isotonic_matches_sklearn_and_roundtrips(tmp_path):
+    raw, y, _ = _overconfident(2000, 0)
+    calib = fit_calibrator(raw, y, "isotonic")
+    ref = IsotonicRegression(out_of_bounds="clip").fit(raw, y)
+    grid = np.linspace(0, 1, 501)
+    assert np.allclose(calib.predict(grid), ref.predict(grid), atol=1e-9)
+
+    path = str(tmp_path / "calib_T_7d.json")
+    calib.save(path)
+    assert np.array_equal(Calibrator.load(path).predict(grid), calib.predict(grid))
+
+
+def test_isotonic_pools_ties_like_sklearn():
+    raw, y, _ = _overconfident(3000, 2)
+    raw = np.round(raw, 2)  # scoruri discrete => multe egalități
+    rng = np.random.default_rng(3)
+    grid = np.linspace(0, 1, 501)
+    ref = IsotonicRegression(out_of_bounds="clip").fit(raw, y).predict(grid)
+    for _ in range(3):
+        perm = rng.permutation(raw.size)  # ordinea egalităților nu contează
+        assert np.allclose(fit_calibrator(raw[perm], y[perm], "isotonic").predict(grid), ref, atol=1e-9)
+
+
+def test_platt_recovers_the_distortion():
+    raw, y, true_p = _overconfident(20_000, 1)
+    calib = fit_calibrator(raw, y, "platt")
+    assert abs(calib.a - 0.5) < 0.05 and abs(calib.b - 0.25) < 0.1
+    assert np.mean((calib.predict(raw) - true_p) ** 2) < np.mean((raw - true_p) ** 2) / 5
+
+
+def test_recalibration_uses_only_rows_after_train_end(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_baseline, "ART_DIR", str(tmp_path))
+    monkeypatch.setattr(infer_service, "ART_DIR", str(tmp_path))
+    df = synth_candles(n=600, seed=4)
+    metrics = train_on_dataframe(df, TrainConfig(ticker="CAL", horizon_days=5))
+    out = infer_service.recalibrate("CAL", 5, df, window=10_000)
+    assert out["train_end"] is not None
+    # val + test (fără ultimele h zile nerezolvate) => niciun rând din split-ul de antrenare
+    assert out["n"] == metrics["n_val"] + metrics["n_test"]
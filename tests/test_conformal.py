@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.ml.calibration.conformal import ConformalIndex, build_conformal_index, empirical_coverage
+
+
+def _heteroscedastic(n, seed):
+    rng = np.random.default_rng(seed)
+    vol = rng.uniform(0.5, 4.0, n)
+    y_pred = rng.normal(0, 1, n)
+    return y_pred + rng.normal(0, 1, n) * vol, y_pred, vol
+
+
+def test_split_conformal_coverage_holds_per_volatility_bin():
+    y, yhat, vol = _heteroscedastic(3000, 0)
+    index = build_conformal_index(y, yhat, vol, max_bins=3)
+    assert index.n_bins == 3
+    # regimul volatil primește intervale mai largi
+    assert index.halfwidth(0.8, 3.5) > 2 * index.halfwidth(0.8, 0.7)
+
+    y2, yhat2, vol2 = _heteroscedastic(20_000, 1)
+    for cov in (0.5, 0.8, 0.9):
+        assert abs(empirical_coverage(index, y2, yhat2, vol2, cov) - cov) < 0.03
+
+
+def test_bands_and_roundtrip(tmp_path):
+    index = build_conformal_index(np.arange(100.0), np.zeros(100))  # reziduuri 0..99, un bin
+    assert index.halfwidth(0.8) == 80.0  # ceil(101 * 0.8) - 1 = 80
+    b = index.bands(1.0, levels=(0.1, 0.5, 0.9))
+    assert b == {"q10": -79.0, "q50": 1.0, "q90": 81.0}
+
+    path = str(tmp_path / "conformal_T_7d.npz")
+    index.save(path)
+    loaded = ConformalIndex.load(path)
+    assert loaded.halfwidth(0.95, vol=2.0) == index.halfwidth(0.95)
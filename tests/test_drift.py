@@ -0,0 +1,56 @@
+import numpy as np
+
+from app.ml.monitoring.drift import DriftMonitor, build_reference
+
+
+def _reference(tmp_path, n=5000, seed=0):
+    X = np.random.default_rng(seed).normal(0, 1, (n, 3))
+    path = str(tmp_path / "drift_T_7d.npz")
+    build_reference(X, ["a", "b", "c"], bins=10).save(path)
+    return path
+
+
+def test_stable_stream_does_not_enqueue_and_shift_does(tmp_path):
+    path = _reference(tmp_path)
+    mon = DriftMonitor(window=400, eval_every=50, min_samples=200, psi_threshold=0.25,
+                       ks_threshold=0.3, max_models=8, queue_size=4)
+    rng = np.random.default_rng(1)
+    for x in rng.normal(0, 1, (1000, 3)):
+        mon.observe("T", 7, x, path)
+    (row,) = mon.scores("T", 7)
+    assert row["samples"] == 400 and row["drifted"] == []
+    assert mon.pop_retrain() is None
+
+    # doar feature-ul "b" se mută; fereastra glisantă uită vechea distribuție
+    for x in rng.normal(0, 1, (400, 3)) + [0, 1.5, 0]:
+        mon.observe("t", 7, x, path)
+    assert mon.scores("T", 7)[0]["drifted"] == ["b"]
+    assert mon.pending_retrains() == [("T", 7)]  # deduplicat, deși s-au evaluat mai multe ferestre
+    assert mon.pop_retrain() == ("T", 7) and mon.pop_retrain() is None
+
+
+def test_monitors_are_bounded_and_skip_models_without_reference(tmp_path):
+    path = _reference(tmp_path)
+    mon = DriftMonitor(window=50, eval_every=10, min_samples=10, max_models=2, queue_size=2)
+    for t in ("A", "B", "C"):
+        mon.observe(t, 7, np.zeros(3), path)
+    mon.observe("OLD", 7, np.zeros(3), str(tmp_path / "missing.npz"))
+    assert [r["ticker"] for r in mon.scores()] == ["B", "C"]
+
+
+def test_repeated_predictions_on_one_bar_do_not_enqueue(tmp_path):
+    path = _reference(tmp_path)
+    mon = DriftMonitor(window=400, eval_every=10, min_samples=150, psi_threshold=0.25,
+                       ks_threshold=0.3, max_models=8, queue_size=4)
+    rng = np.random.default_rng(2)
+    row = rng.normal(0, 1, 3)
+    for _ in range(200):  # dashboard: aceeași zi, același rând
+        mon.observe("AAPL", 7, row, path, bar="2024-06-03")
+    (r,) = mon.scores("AAPL", 7)
+    assert r["samples"] == 1 and r["seen"] == 1 and mon.pop_retrain() is None
+
+    for day, x in enumerate(rng.normal(0, 1, (200, 3))):  # câte o bară nouă: fereastra crește normal
+        for _ in range(3):
+            mon.observe("AAPL", 7, x, path, bar=day)
+    (r,) = mon.scores("AAPL", 7)
+    assert r["samples"] == 201 and r["drifted"] == [] and mon.pop_retrain() is None
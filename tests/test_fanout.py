@@ -0,0 +1,66 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core import fanout
+from app.core.config import settings
+from app.core.fanout import fan_out
+
+
+def _sleep(s, value):
+    def fn():
+        time.sleep(s)
+        return value
+    return fn
+
+
+def test_branches_run_concurrently_and_degrade_independently():
+    pool = ThreadPoolExecutor(max_workers=4)
+    t0 = time.perf_counter()
+    res = fan_out({
+        "db": (_sleep(0.10, "rows"), 1.0, None),
+        "history": (_sleep(2.0, ["c"]), 0.15, []),  # provider lent => timeout, listă goală
+        "quotes": (lambda: 1 / 0, 1.0, None),
+        "other": (_sleep(0.10, 42), 1.0, None),
+    }, executor=pool)
+    wall = time.perf_counter() - t0
+
+    assert wall < 0.5  # ~ cea mai lentă ramură în buget, nu suma
+    assert (res["db"].value, res["db"].status) == ("rows", "ok") and res["other"].value == 42
+    assert (res["history"].value, res["history"].status) == ([], "timeout")
+    assert (res["quotes"].value, res["quotes"].status) == (None, "error")
+    assert 90 <= res["db"].ms < 400 and res["history"].ms >= 150
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def test_provider_stragglers_do_not_starve_the_db_branch(monkeypatch):
+    monkeypatch.setattr(fanout, "_pools", {})
+    monkeypatch.setattr(settings, "fanout_max_workers", 2)
+    for _ in range(2):  # provider blocat: ambele thread-uri ale pool-ului "history" rămân ocupate
+        assert fan_out({"history": (_sleep(0.6, ["c"]), 0.02, [])})["history"].status == "timeout"
+    res = fan_out({"db": (_sleep(0.02, "rows"), 0.3, None), "history": (_sleep(0.6, ["c"]), 0.05, [])})
+    assert (res["db"].value, res["db"].status) == ("rows", "ok")
+    assert res["history"].status == "timeout"
+    for pool in fanout._pools.values():
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def test_partial_details_are_not_cacheable(prediction_db, fake_provider, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routes import predictions
+    from app.db.session import get_db
+
+    app = FastAPI()
+    app.include_router(predictions.router)
+    app.dependency_overrides[get_db] = lambda: prediction_db.Session()
+    client = TestClient(app)
+
+    ok = client.get("/api/predictions/AAPL")
+    assert ok.json()["partial"] == [] and ok.headers["etag"] and "no-store" not in ok.headers["cache-control"]
+
+    def _down(tickers):
+        raise RuntimeError("rate limited")
+    monkeypatch.setattr(predictions, "get_quotes", _down)
+    r = client.get("/api/predictions/AAPL")
+    assert r.json()["partial"] == ["quotes"]
+    assert "etag" not in r.headers and r.headers["cache-control"] == "no-store"
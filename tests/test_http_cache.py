@@ -0,0 +1,60 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import market, universe
+from app.services import market_data
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(market.router)
+    app.include_router(universe.router)
+    market._history_validators.clear()
+    return TestClient(app)
+
+
+def test_dashboard_replay_serves_304_without_provider_work(fake_provider):
+    client = _client()
+    urls = [
+        "/api/universe/today",
+        "/api/market/history?ticker=AAPL&period=1y&interval=1d",
+        "/api/market/history?ticker=MSFT&period=6mo&interval=1d&format=columnar",
+    ]
+    etags = {}   # per client session: url -> ETag (what core/api.js keeps)
+    counts = {200: 0, 304: 0}
+    sent = full = 0
+    sizes = {}
+
+    for _session in range(3):
+        etags.clear()
+        for _poll in range(10):
+            for url in urls:
+                headers = {"If-None-Match": etags[url]} if url in etags else {}
+                r = client.get(url, headers=headers)
+                counts[r.status_code] += 1
+                if r.status_code == 200:
+                    etags[url] = r.headers["ETag"]
+                    sizes[url] = len(r.content)
+                    assert "max-age=" in r.headers["Cache-Control"]
+                else:
+                    assert r.content == b"" and r.headers["ETag"] == etags[url]
+                sent += len(r.content)
+                full += sizes[url]
+
+    # prima cerere din fiecare sesiune e 200, restul 304
+    assert counts == {200: 3 * len(urls), 304: 3 * 9 * len(urls)}
+    # 304-urile nu fac lucru upstream; 200-urile din sesiunile noi vin din cache-ul de istoric
+    assert fake_provider.history_calls == 2
+    assert sent / full < 0.15
+
+
+def test_changed_series_gets_new_etag(fake_provider):
+    client = _client()
+    url = "/api/market/history?ticker=AAPL&period=1y&interval=1d"
+    r1 = client.get(url)
+    fake_provider.rows += 1                 # a apărut o bară nouă
+    market._history_validators.clear()      # fereastra de prospețime a expirat
+    market_data._history_cache.clear()
+    r2 = client.get(url, headers={"If-None-Match": r1.headers["ETag"]})
+    assert r2.status_code == 200 and r2.headers["ETag"] != r1.headers["ETag"]
+    assert len(r2.json()["candles"]) == len(r1.json()["candles"]) + 1
@@ -0,0 +1,39 @@
+import io
+import json
+
+from app.core.logging import SiteSampler, enabled, setup_logging
+
+
+def test_sampler_drops_hot_site_and_reports_count():
+    buf = io.StringIO()
+    log = setup_logging(level="DEBUG", json_format=True, enqueue=False, sample_per_site=0.001, sink=buf)
+    try:
+        for i in range(10):
+            log.debug("hot {}", i)  # aceeași linie => un singur site
+        log.warning("always kept")
+        lines = [json.loads(x) for x in buf.getvalue().splitlines()]
+    finally:
+        setup_logging()
+    assert [x["msg"] for x in lines] == ["hot 0", "always kept"]
+    assert lines[0]["level"] == "DEBUG" and lines[0]["logger"] == __name__
+
+
+def test_sampler_attaches_dropped_count_to_next_kept_record():
+    sampler = SiteSampler(per_second=1.0, burst=1.0)
+    rec = lambda: {"level": type("L", (), {"no": 10})(), "name": "m", "line": 1, "extra": {}}
+    assert sampler(rec()) is True
+    assert sampler(rec()) is False and sampler(rec()) is False
+    sampler._sites[("m", 1)][0] = 1.0  # bucket reumplut
+    r = rec()
+    assert sampler(r) is True and r["extra"]["sampled_dropped"] == 2
+
+
+def test_enabled_follows_configured_level():
+    buf = io.StringIO()
+    try:
+        setup_logging(level="INFO", enqueue=False, sink=buf)
+        assert not enabled("DEBUG") and enabled("INFO") and enabled("ERROR")
+        setup_logging(level="DEBUG", enqueue=False, sink=buf)
+        assert enabled("DEBUG")
+    finally:
+        setup_logging()
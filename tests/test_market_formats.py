@@ -0,0 +1,39 @@
+import io
+from datetime import datetime
+
+import numpy as np
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import market
+
+URL = "/api/market/history?ticker=AAPL&period=1y&interval=1d"
+
+
+def _client():
+    app = FastAPI()
+    app.include_router(market.router)
+    market._history_validators.clear()
+    return TestClient(app)
+
+
+def test_columnar_and_npy_match_json_candles(fake_provider):
+    client = _client()
+    candles = client.get(URL).json()["candles"]
+
+    r = client.get(URL + "&format=columnar")
+    assert r.status_code == 200 and r.headers["content-type"].startswith("application/json")
+    body = r.json()
+    assert {"ticker", "period", "interval", "t", "o", "h", "l", "c", "v"} <= set(body)
+    assert body["ticker"] == "AAPL" and len(body["t"]) == len(candles)
+    # t = secunde epoch (întregi), aceeași bară ca în JSON-ul pe rânduri
+    assert all(isinstance(t, int) for t in body["t"])
+    assert body["t"] == [int(datetime.fromisoformat(c["date"]).timestamp()) for c in candles]
+    assert body["c"] == [c["close"] for c in candles] and body["v"] == [c["volume"] for c in candles]
+
+    r = client.get(URL + "&format=npy")
+    assert r.status_code == 200 and r.headers["content-type"] == "application/x-npy"
+    rec = np.load(io.BytesIO(r.content), allow_pickle=False)
+    assert rec.dtype.names == ("t", "o", "h", "l", "c", "v") and rec["t"].dtype == np.int64
+    assert rec["t"].tolist() == body["t"] and np.allclose(rec["o"], body["o"])
+    assert fake_provider.history_calls == 1  # toate formatele din aceeași serie din cache
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.core import metrics
+
+
+@pytest.fixture
+def metrics_on():
+    prev = metrics.enabled()
+    metrics.set_enabled(True)
+    metrics.reset()
+    yield
+    metrics.reset()
+    metrics.set_enabled(prev)
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        return {"id": item_id}
+
+    return app
+
+
+def test_render_exposition_format(metrics_on):
+    metrics.CACHE_REQUESTS.inc(cache="quote", result="hit")
+    metrics.CACHE_REQUESTS.inc(2, cache="quote", result="hit")
+    metrics.DB_QUERY_SECONDS.observe(0.003, op="SELECT")
+    out = metrics.render()
+    assert "# TYPE cache_requests_total counter" in out
+    assert 'cache_requests_total{cache="quote",result="hit"} 3' in out
+    assert 'db_query_seconds_bucket{op="SELECT",le="0.0025"} 0' in out
+    assert 'db_query_seconds_bucket{op="SELECT",le="0.005"} 1' in out
+    assert 'db_query_seconds_bucket{op="SELECT",le="+Inf"} 1' in out
+    assert 'db_query_seconds_count{op="SELECT"} 1' in out
+    assert out.endswith("\n")
+
+
+def test_middleware_labels_by_route_template(metrics_on):
+    client = TestClient(_app())
+    for i in (1, 2, 3):
+        assert client.get(f"/items/{i}").status_code == 200
+    client.get("/nope")
+    assert metrics.HTTP_LATENCY.count(method="GET", route="/items/{item_id}", status="200") == 3
+    assert metrics.HTTP_LATENCY.count(method="GET", route="<unmatched>", status="404") == 1
+    assert "/items/1" not in metrics.render()
+
+
+def test_disabled_is_noop():
+    prev = metrics.enabled()
+    metrics.set_enabled(False)
+    metrics.reset()
+    try:
+        metrics.CACHE_REQUESTS.inc(cache="quote", result="hit")
+        metrics.HTTP_LATENCY.observe(0.1, method="GET", route="/x", status="200")
+        with metrics.DB_QUERY_SECONDS.time(op="SELECT"):
+            pass
+        assert TestClient(_app()).get("/items/1").status_code == 200
+        assert metrics.CACHE_REQUESTS.value(cache="quote", result="hit") == 0
+        assert metrics.HTTP_LATENCY._values == {} and metrics.DB_QUERY_SECONDS._values == {}
+    finally:
+        metrics.set_enabled(prev)
+
+
+def test_failed_statement_does_not_leak_query_timer(metrics_on):
+    from app.db.session import engine
+
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM no_such_table"))
+            conn.rollback()
+        conn.execute(text("SELECT 1"))
+        assert conn.info.get("query_t0") == []
+    assert metrics.DB_QUERY_SECONDS.count(op="SELECT") >= 1
@@ -0,0 +1,52 @@
+import json
+
+import pandas as pd
+
+from app.services.news_ingestor import (JsonlSource, SimHashIndex, WordBits, join_news_features, run_pipeline,
+                                        simhash_batch)
+
+_DAY = 86400
+_T0 = 1_700_006_400.0  # 2023-11-15 00:00 UTC
+
+
+def _line(i, title, ts, **kw):
+    return json.dumps({"id": str(i), "ts": ts, "title": title, **kw})
+
+
+def test_pipeline_maps_tickers_dedupes_and_aggregates():
+    lines = [
+        _line(1, "Apple beats earnings estimates, shares jump", _T0 + 3600),
+        _line(2, "APPLE BEATS EARNINGS ESTIMATES, SHARES JUMP!", _T0 + 7200),  # reluare
+        _line(3, "$TSLA recalls two million cars over autopilot probe", _T0 + 9000),
+        _line(4, "BRK annual meeting draws record crowd", _T0 + _DAY),
+        _line(5, "Weather is nice today", _T0),  # fără ticker
+        "{not json",
+    ]
+    src = JsonlSource(lines=lines)
+    res = run_pipeline([src], universe=["AAPL", "TSLA", "BRK"], aliases={"apple": "aapl"},
+                       index=SimHashIndex(capacity=64))
+    stats = res["stats"]
+    assert src.bad_lines == 1
+    assert (stats["read"], stats["unmapped"], stats["duplicates"], stats["kept"]) == (5, 1, 1, 4)
+
+    aapl = res["aggregator"].frame("AAPL")
+    assert aapl["news_count"].tolist() == [1] and aapl["news_mentions"].tolist() == [2]
+    assert aapl["news_sentiment"].iloc[0] > 0
+    assert res["aggregator"].frame("TSLA")["news_sentiment"].iloc[0] < 0
+
+
+def test_join_is_lagged_by_one_day():
+    news = pd.DataFrame({"date": pd.to_datetime([_T0], unit="s", utc=True), "news_count": [3],
+                         "news_mentions": [4], "news_sentiment": [0.5], "news_sentiment_abs": [0.5]})
+    df = pd.DataFrame({"date": pd.date_range(pd.Timestamp(_T0, unit="s", tz="UTC"), periods=3, freq="D")})
+    out = join_news_features(df, news)
+    assert out["news_count"].tolist() == [0.0, 3.0, 0.0]
+
+
+def test_simhash_is_stable_when_vocabulary_overflows():
+    texts = [" ".join(f"w{i}x{j}" for j in range(6)) for i in range(40)]  # 240 cuvinte distincte
+    ref = simhash_batch(texts, WordBits(1000))
+    small = WordBits(10)
+    assert (simhash_batch(texts, small) == ref).all()        # depășire în mijlocul batch-ului
+    assert (simhash_batch(texts[:5], small) == ref[:5]).all()  # reset între batch-uri
+    assert len(small.table) < 240
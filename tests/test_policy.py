@@ -0,0 +1,149 @@
+import itertools
+
+import numpy as np
+
+from app.ml.policy.thresholds import (FEATURES, Policy, PolicyOptimizer, best_cut_1d, fit_policy,
+                                      side_features, smooth)
+
+
+def _resolved(n, seed):
+    rng = np.random.default_rng(seed)
+    prob = rng.uniform(0, 1, n)
+    exp = rng.normal(0, 2, n)
+    rr = rng.gamma(2.0, 1.0, n)
+    realized = (prob - 0.5) * 4 + 0.3 * exp + rng.normal(0, 3, n)  # semnal slab + zgomot
+    return prob, exp, rr, realized
+
+
+def test_best_cut_1d_matches_brute_force():
+    prob, _, _, realized = _resolved(3000, 0)
+    score = np.round(prob, 2)  # scoruri egale: pragul le ia pe toate sau pe niciunul
+    gain = realized - 0.3
+    t, ev, trades = best_cut_1d(score, gain, min_trades=20)
+    brute = max((gain[score >= c].sum(), c) for c in np.unique(score) if (score >= c).sum() >= 20)
+    assert t == brute[1] and np.isclose(ev, brute[0]) and trades == (score >= t).sum()
+    assert best_cut_1d(score, -np.abs(gain)) == (None, 0.0, 0)  # niciun prag cu EV pozitiv
+
+
+def test_grid_matches_brute_force_and_updates_incrementally(tmp_path):
+    prob, exp, rr, realized = _resolved(4000, 1)
+    opt = PolicyOptimizer.build(7, prob, exp, rr, realized, cost_pct=0.3, bins=6)
+    tab = opt.tables["buy"]
+    X = side_features(prob, exp, rr, "buy")
+    X[prob < 0.5] = np.nan
+    gain = realized - 0.3
+    best = max(
+        (gain[m].sum(), k) for k in itertools.product(*(range(len(e)) for e in tab.edges))
+        for m in [np.all(X >= [e[i] for e, i in zip(tab.edges, k)], axis=1)] if m.sum() >= 25
+    )
+    values, ev, _ = tab.solve(min_trades=25)
+    assert np.isclose(ev, best[0]) and values == [e[i] for e, i in zip(tab.edges, best[1])]
+
+    # adăugat + scos înapoi = tabelele inițiale; salvare/încărcare păstrează tot
+    before = tab.gain.copy(), tab.count.copy()
+    extra = _resolved(500, 2)
+    opt.update(*extra)
+    opt.update(*extra, sign=-1)
+    assert np.allclose(tab.gain, before[0]) and np.array_equal(tab.count, before[1]) and opt.n == 4000
+    opt.save(str(tmp_path / "policy_7d.npz"))
+    again = PolicyOptimizer.load(str(tmp_path / "policy_7d.npz"))
+    assert again.solve(25).to_dict()["buy"] == opt.solve(25).to_dict()["buy"]
+
+
+def test_policy_decides_disjoint_sides_and_smooths(tmp_path):
+    prob, exp, rr, realized = _resolved(5000, 3)
+    pol = fit_policy(7, prob, exp, rr, realized, cost_pct=0.3, features=("prob",), min_trades=30)
+    assert pol.buy["prob"] > 0.5 and pol.sell["prob"] > 0.5
+    d = pol.decide(prob, exp, rr)
+    assert set(d) <= {"buy", "sell", "hold"}
+    assert np.all(prob[d == "buy"] >= pol.buy["prob"]) and np.all(1 - prob[d == "sell"] >= pol.sell["prob"])
+
+    path = str(tmp_path / "policy_7d.json")
+    pol.save(path)
+    old = Policy.load(path)
+    new = Policy(7, list(FEATURES), buy={"prob": old.buy["prob"] + 0.1}, sell=None)
+    out = smooth(old, new, alpha=0.5)
+    assert np.isclose(out.buy["prob"], old.buy["prob"] + 0.05) and out.sell is None
+
+
+# ---------------------------
+# Outcomes from the predictions table (SQLite) + optimize_policy end-to-end
+# ---------------------------
+
+def _insert(prediction_db, rows):
+    from datetime import datetime
+
+    with prediction_db.Session() as s:
+        for ticker, created, prob, exp, rr in rows:
+            s.add(prediction_db.model(ticker=ticker, horizon_days=5, created_at=datetime.fromisoformat(created),
+                                      probability_pct=prob, expected_change_pct=exp, reward_to_risk=rr))
+        s.commit()
+
+
+def test_resolved_outcomes_use_the_last_closed_bar(prediction_db, fake_provider, monkeypatch):
+    from app.db import session
+    from app.services import market_data
+    from app.services.ml_integration import _resolved_outcomes
+
+    monkeypatch.setattr(session, "SessionLocal", prediction_db.Session)
+    _insert(prediction_db, [
+        ("AAA", "2024-02-10 12:00:00", 70.0, 1.0, 2.0),  # bara 02-10 (index 40) e încă deschisă => baza 39
+        ("AAA", "2024-02-10 00:00:00", 60.0, 0.5, 1.0),  # bara 39 tocmai s-a închis => baza 39
+        ("AAA", "2024-01-01 08:00:00", 55.0, 0.1, 1.0),  # nicio bară închisă => scoasă
+        ("AAA", "2024-10-25 12:00:00", 65.0, 0.2, 1.0),  # fără închidere la +5 ședințe => scoasă
+    ])
+    prob, exp, rr, realized = _resolved_outcomes(5, 0.0, 2e9)
+    c = market_data.get_history_columns("AAA", "max", "1d")["c"]
+    assert sorted(prob.tolist()) == [0.6, 0.7]
+    assert np.allclose(realized, (c[44] / c[39] - 1) * 100)
+
+
+def test_optimize_policy_end_to_end(prediction_db, fake_provider, tmp_path, monkeypatch):
+    from datetime import datetime, timedelta
+
+    from app.core.config import settings
+    from app.db import session
+    from app.ml.pipeline import infer_service
+    from app.services.ml_integration import optimize_policy, refresh_policies
+
+    monkeypatch.setattr(session, "SessionLocal", prediction_db.Session)
+    monkeypatch.setattr(infer_service, "ART_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "policy_window_days", 20_000)
+    monkeypatch.setattr(settings, "policy_min_trades", 10)
+    monkeypatch.setattr(settings, "policy_bins", 4)
+    rng = np.random.default_rng(0)
+    t0 = datetime(2024, 1, 5, 15)
+    _insert(prediction_db, [("AAA", (t0 + timedelta(days=int(d))).isoformat(" "), float(p), float(e), float(r))
+                            for d, p, e, r in zip(rng.integers(0, 250, 80), rng.uniform(30, 90, 80),
+                                                  rng.normal(0, 2, 80), rng.gamma(2.0, 1.0, 80))])
+
+    first = optimize_policy(5)
+    assert first["mode"] == "full" and first["added"] == 80
+    again = optimize_policy(5)  # nicio predicție nouă rezolvată
+    assert again["mode"] == "incremental" and again["added"] == 0
+    assert (tmp_path / "policy_5d.json").exists()
+    assert refresh_policies() == [5]
+
+
+def test_refresh_loop_survives_failing_ticks(monkeypatch):
+    import asyncio
+
+    from app.services import ml_integration
+
+    calls = []
+
+    def _boom():
+        calls.append(1)
+        raise ModuleNotFoundError("No module named 'app.models'")
+
+    monkeypatch.setattr(ml_integration, "refresh_policies", _boom)
+
+    async def _run():
+        task = asyncio.create_task(ml_integration.policy_refresh_loop(0.001))
+        while len(calls) < 3 and not task.done():
+            await asyncio.sleep(0.005)
+        assert not task.done()
+        task.cancel()
+
+    asyncio.run(_run())
+    assert len(calls) >= 3
@@ -0,0 +1,52 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.db.session import get_db
+
+BANDS = {"q10": -2.5, "q50": 1.2, "q90": 4.9, "coverage": 0.8, "vol_bin": 1, "method": "split_conformal"}
+
+
+def _client(prediction_db, monkeypatch):
+    from app.api.routes import predictions
+
+    monkeypatch.setattr(predictions, "ensure_model_and_predict", lambda t, h: {
+        "probability_pct": 61.0, "expected_change_pct": 1.2, "reward_to_risk": 1.96, "bands": BANDS, "drivers": None,
+    })
+
+    def _db():
+        s = prediction_db.Session()
+        try:
+            yield s
+        finally:
+            s.close()
+
+    app = FastAPI()
+    app.include_router(predictions.router)
+    app.dependency_overrides[get_db] = _db
+    return TestClient(app)
+
+
+def test_bands_returned_on_create_list_and_details(prediction_db, fake_provider, monkeypatch):
+    client = _client(prediction_db, monkeypatch)
+
+    created = client.post("/api/predictions", json={"ticker": "aapl", "horizon_days": 7})
+    assert created.status_code == 200, created.text
+    assert created.json()["bands"] == BANDS
+
+    # rândurile salvate: benzile vin din rationale (band80=[q10%, q90%])
+    stored = {"q10": -2.5, "q50": 1.2, "q90": 4.9, "coverage": 0.8, "method": "split_conformal"}
+    listed = client.get("/api/predictions").json()
+    assert listed[0]["bands"] == stored
+    details = client.get("/api/predictions/AAPL").json()
+    assert details["prediction"]["bands"] == stored
+
+
+def test_bands_none_without_conformal_index(prediction_db, fake_provider, monkeypatch):
+    client = _client(prediction_db, monkeypatch)
+    from app.api.routes import predictions
+
+    monkeypatch.setattr(predictions, "ensure_model_and_predict", lambda t, h: {
+        "probability_pct": 55.0, "expected_change_pct": 0.4, "reward_to_risk": 0.8,
+    })
+    assert client.post("/api/predictions", json={"ticker": "MSFT"}).json()["bands"] is None
+    assert client.get("/api/predictions/MSFT").json()["prediction"]["bands"] is None
@@ -0,0 +1,92 @@
+import time
+import tracemalloc
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.api.routes.profiles import router as profiles_router
+from app.core import profiling
+from app.core.config import settings
+
+
+def _burn_cpu():
+    t0, x = time.perf_counter(), 0
+    while time.perf_counter() - t0 < 0.15:
+        x += sum(i * i for i in range(500))
+    return x
+
+
+def _app():
+    app = FastAPI()
+    app.add_middleware(profiling.ProfilingMiddleware)
+    app.include_router(profiles_router)
+
+    @app.get("/events")
+    def events():
+        def gen():
+            yield "data: 1\n\n"
+            # la al doilea mesaj profilarea trebuie să fie deja oprită
+            yield f"data: {int(profiling._busy.locked())}{int(tracemalloc.is_tracing())}\n\n"
+        return StreamingResponse(gen(), media_type="text/event-stream")
+
+    @app.get("/slow")
+    def slow():  # sync => rulează în threadpool, nu pe thread-ul event loop-ului
+        return {"x": _burn_cpu(), "buf": len(bytearray(2_000_000))}
+    return app
+
+
+def test_explicit_profile_captures_threadpool_stack_and_is_retrievable(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profiling_allowed_clients", "testclient")
+    client = TestClient(_app())
+
+    assert "x-profile-id" not in client.get("/slow").headers          # fără trigger
+    r = client.get("/slow", headers={"X-Profile": "1"})
+    pid = r.headers["x-profile-id"]
+
+    listed = client.get("/api/profiles").json()
+    assert [p["id"] for p in listed] == [pid] and listed[0]["path"] == "/slow"
+    prof = client.get(f"/api/profiles/{pid}").json()
+    assert any("_burn_cpu" in f["frame"] for f in prof["cpu"]["top_inclusive"])
+    assert prof["memory"]["peak_bytes"] >= 2_000_000
+    # nefiltrat pe request: profilul o spune explicit și împarte sample-urile pe thread-uri
+    assert prof["cpu"]["scope"] == "process" and prof["memory"]["scope"] == "process"
+    threads = prof["cpu"]["threads"]
+    assert sum(t["samples"] for t in threads) == prof["cpu"]["samples"]
+    assert sum(t["request_thread"] for t in threads) <= 1
+    assert client.get("/api/profiles/../../etc").status_code == 404
+
+
+def test_disallowed_client_and_size_cap(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profiling_allowed_clients", "10.0.0.1")
+    client = TestClient(_app())
+    assert "x-profile-id" not in client.get("/slow?profile=1").headers
+    assert client.get("/api/profiles").status_code == 403
+
+    for i in range(5):
+        profiling.save_profile(f"p{i}", {"request": {"started_at": str(i)}, "pad": "x" * 1000})
+    monkeypatch.setattr(settings, "profiling_max_bytes", 2500)
+    profiling.prune(settings.profiling_max_bytes)
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_streams_are_not_profiled(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profiling_allowed_clients", "testclient")
+    client = TestClient(_app())
+
+    # detectat din request: nimic pornit
+    assert profiling._is_stream({"path": "/api/market/stream", "headers": []})
+    r = client.get("/slow", headers={"X-Profile": "1", "Accept": "text/event-stream"})
+    assert "x-profile-id" not in r.headers
+
+    # detectat abia la răspuns: sampler + tracemalloc opriți și _busy eliberat înainte de restul stream-ului
+    r = client.get("/events", headers={"X-Profile": "1"})
+    assert r.text.split("\n\n")[1] == "data: 00"
+    assert "x-profile-id" not in r.headers and not profiling._busy.locked()
+    assert list(tmp_path.glob("*.json")) == []
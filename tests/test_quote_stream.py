@@ -0,0 +1,61 @@
+import asyncio
+
+from app.services.quote_stream import QuoteStreamHub
+
+
+class FakeQuotes:
+    """Deterministic upstream: every symbol's price moves on odd ticks only."""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, symbols):
+        self.calls.append(list(symbols))
+        step = (len(self.calls) - 1) // 2
+        return {t: 100.0 + step for t in symbols}
+
+
+async def _run_clients(n_clients: int, ticks: int = 4):
+    fake = FakeQuotes()
+    hub = QuoteStreamHub(fetch=fake, interval_seconds=0.01)
+    subs = [await hub.subscribe([f"T{i % 50}", f"T{(i * 7) % 50}"]) for i in range(n_clients)]
+    while hub.ticks < ticks:
+        await asyncio.sleep(0.005)
+    for s in subs:
+        hub.unsubscribe(s)
+    await asyncio.sleep(0.05)
+    return hub, fake, subs
+
+
+def test_upstream_calls_constant_with_1000_subscribers():
+    hub1, fake1, _ = asyncio.run(_run_clients(1))
+    hub, fake, subs = asyncio.run(_run_clients(1000))
+
+    # un singur apel upstream per tick, indiferent de numărul de clienți
+    assert len(fake.calls) == hub.ticks
+    assert len(fake.calls) / hub.ticks == len(fake1.calls) / hub1.ticks == 1.0
+    assert all(len(c) == 50 for c in fake.calls)  # uniunea simbolurilor, o singură dată
+
+    # pollerul se oprește singur când nu mai sunt abonați
+    assert not hub.running and hub.subscribers == 0
+
+    # backpressure: clienții care nu citesc păstrează doar ultimul preț per simbol
+    assert all(s.pending <= len(s.symbols) for s in subs)
+    assert sum(s.conflated for s in subs) > 0
+
+
+def test_only_changed_prices_are_pushed():
+    async def run():
+        fake = FakeQuotes()
+        hub = QuoteStreamHub(fetch=fake, interval_seconds=3600)
+        sub = await hub.subscribe(["AAPL", "MSFT"])
+        first = await asyncio.wait_for(sub.get(), timeout=2)   # tick 1: snapshot
+        assert await hub.tick() == {}                          # tick 2: same prices
+        changed = await hub.tick()                             # tick 3: prices moved
+        second = await asyncio.wait_for(sub.get(), timeout=2)
+        hub.unsubscribe(sub)
+        return first, changed, second
+
+    first, changed, second = asyncio.run(run())
+    assert first == {"AAPL": 100.0, "MSFT": 100.0}
+    assert changed == second == {"AAPL": 101.0, "MSFT": 101.0}
@@ -0,0 +1,35 @@
+from app.core.config import settings
+from app.services import market_data
+from app.services.providers.replay_provider import ReplayProvider, record_history
+
+from tests.conftest import FakeProvider
+
+
+def test_replay_is_selectable_deterministic_and_recordable(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "market_provider_order", "replay")
+    monkeypatch.setattr(settings, "replay_latency_ms", "0")
+    (provider,) = market_data._build_providers()
+    assert isinstance(provider, ReplayProvider)
+
+    a = provider.get_history("AAPL", "1y", "1d")
+    assert len(a) == 252 and a == ReplayProvider().get_history("aapl", "1y", "1d")
+    assert a[-1].close != provider.get_history("MSFT", "1y", "1d")[-1].close
+
+    assert record_history(FakeProvider(rows=40), ["NVDA"], "1y", "1d", str(tmp_path)) == {"NVDA": 40}
+    recorded = ReplayProvider(data_dir=str(tmp_path)).get_history("NVDA", "max", "1d")
+    assert [c.close for c in recorded] == [c.close for c in FakeProvider(rows=40).get_history("NVDA", "1y", "1d")]
+
+
+def test_injected_rate_limits_fall_back_to_next_provider(monkeypatch):
+    flaky = ReplayProvider(rate_limit_rate=0.5, empty_rate=0.2, seed=3)
+    backup = FakeProvider()
+    monkeypatch.setattr(market_data, "_PROVIDERS", [flaky, backup])
+    market_data._history_cache.clear()
+
+    served = 0
+    for i in range(40):
+        market_data._history_cache.clear()
+        assert market_data.get_history("AAPL", "1y", "1d")
+        served += 1
+    # ~70% din încercări eșuează pe replay (rate limit/gol); când și #1 și #2 cad, răspunde backup-ul
+    assert served == 40 and 15 <= backup.history_calls <= 40
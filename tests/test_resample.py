@@ -0,0 +1,112 @@
+import numpy as np
+
+from app.services import market_data
+from app.services.providers.alpha_vantage_provider import _outputsize
+from app.services.resample import base_interval, broader_period, downsample, resample, trim_period
+
+_MON = 1_704_672_000  # 2024-01-08 00:00 UTC, luni
+
+
+def _cols(t):
+    t = np.asarray(t, dtype=np.int64)
+    c = np.arange(len(t), dtype=np.float64) + 100
+    return {"t": t, "o": c, "h": c + 1, "l": c - 1, "c": c + 0.5, "v": np.ones(len(t))}
+
+
+def test_daily_family_buckets_by_calendar_even_with_local_midnight_stamps():
+    # 10 zile lucrătoare, ștampilate la 22:00 UTC în ziua anterioară (miezul nopții la București)
+    days = [d for d in range(14) if d % 7 < 5]
+    wk = resample(_cols([_MON + d * 86400 - 7200 for d in days]), "1wk")
+    assert len(wk["t"]) == 2
+    assert wk["o"].tolist() == [100.0, 105.0] and wk["c"].tolist() == [104.5, 109.5]
+    assert wk["h"].tolist() == [105.0, 110.0] and wk["v"].tolist() == [5.0, 5.0]
+    assert len(resample(_cols([_MON + d * 86400 for d in range(30)]), "1mo")["t"]) == 2  # 8 ian - 6 feb
+
+
+def test_intraday_buckets_anchor_at_session_open():
+    open_ = _MON + 14 * 3600 + 1800  # 14:30 UTC
+    t = [open_ + i * 300 for i in range(78)] + [open_ + 86400 + i * 300 for i in range(78)]
+    h1 = resample(_cols(t), "60m")
+    assert len(h1["t"]) == 14  # 6.5h => 7 bare pe sesiune
+    assert h1["t"][:2].tolist() == [open_, open_ + 3600] and h1["t"][7] == open_ + 86400
+
+
+def test_base_interval_and_single_upstream_call(fake_provider):
+    assert base_interval("1y", "1mo") == "1d"
+    assert (base_interval("5d", "15m"), base_interval("1mo", "15m"), base_interval("1y", "1h")) == ("1m", "5m", "60m")
+    for interval in ("1d", "5d", "1wk", "1mo"):
+        market_data.get_history_columns("AAA", "1y", interval)
+    assert fake_provider.history_calls == 1
+
+
+def test_trim_to_period_and_compact_upstream(fake_provider):
+    # FakeProvider ignoră perioada: 300 de zile începând cu 2024-01-01 (ca AV outputsize=full)
+    cols = market_data.get_history_columns("AAA", "1mo", "1d")
+    assert len(cols["t"]) == 31 and cols["t"][0] == 1_727_308_800  # 2024-09-26 .. 2024-10-26
+
+    open_ = _MON + 14 * 3600 + 1800
+    t = [open_ + d * 86400 + i * 300 for d in range(7) for i in range(78)]
+    assert trim_period(_cols(t), "1d")["t"][0] == open_ + 6 * 86400
+    assert len(trim_period(_cols(t), "5d")["t"]) == 5 * 78
+
+    assert (broader_period("1mo", "1d"), broader_period("5d", "1m"), broader_period("max", "1d")) == ("3mo", None, None)
+    assert (_outputsize("3mo", "1d"), _outputsize("1y", "1d"), _outputsize("1d", "60m")) == ("compact", "full", "compact")
+
+
+def test_downsample_keeps_endpoints_and_extremes(fake_provider):
+    rng = np.random.default_rng(0)
+    cols = _cols(np.arange(10_000) * 60)
+    cols["c"] = np.cumsum(rng.normal(0, 1, 10_000))
+    cols["h"], cols["l"] = cols["c"] + 1, cols["c"] - 1
+    for method in ("minmax", "lttb"):
+        d = downsample(cols, 300, method)
+        assert len(d["t"]) == 300 and d["t"][0] == 0 and d["t"][-1] == cols["t"][-1]
+        assert np.all(np.diff(d["t"]) > 0)
+    mm = downsample(cols, 300, "minmax")
+    assert mm["h"].max() == cols["h"].max() and mm["l"].min() == cols["l"].min() and mm["v"].sum() == 10_000
+    assert downsample(cols, None) is cols
+
+    a = market_data.get_history_columns("AAA", "max", "1d", max_points=50)
+    b = market_data.get_history_columns("AAA", "max", "1d", max_points=50)
+    assert len(a["t"]) == 50 and fake_provider.history_calls == 1
+    assert np.array_equal(a["c"], b["c"])
+
+
+def _lttb_loop(y, max_points):
+    """Straightforward LTTB with the previous bucket's mean as third vertex (reference)."""
+    n = len(y)
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    buckets = [(a, b) for a, b in zip(edges[:-1], edges[1:])]
+    means = [(np.mean(np.arange(a, b)), np.mean(y[a:b])) for a, b in buckets]
+    idx = [0]
+    for k, (a, b) in enumerate(buckets):
+        ax, ay = (0.0, y[0]) if k == 0 else means[k - 1]
+        cx, cy = (n - 1.0, y[-1]) if k == len(buckets) - 1 else means[k + 1]
+        area = [abs((ax - cx) * (y[i] - ay) - (ax - i) * (cy - ay)) for i in range(a, b)]
+        idx.append(a + int(np.argmax(area)))
+    return idx + [n - 1]
+
+
+def test_lttb_matches_per_bucket_reference():
+    rng = np.random.default_rng(1)
+    for n, m in ((1000, 10), (997, 37), (50, 3)):
+        cols = _cols(np.arange(n) * 60)
+        cols["c"] = np.cumsum(rng.normal(0, 1, n)) + np.arange(n) * 0.05
+        got = downsample(cols, m, "lttb")
+        assert got["t"].tolist() == [i * 60 for i in _lttb_loop(cols["c"], m)]
+
+
+def test_points_cap_applies_to_routes_not_to_the_service(fake_provider, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.api.routes.market import router
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "market_history_max_points", 100)
+    assert len(market_data.get_history_columns("AAA", "max", "1d")["t"]) == 300  # apelanții ML: seria completă
+    assert market_data.chart_points_limit(None) == 100 and market_data.chart_points_limit(500) == 100
+
+    app = FastAPI()
+    app.include_router(router)
+    body = TestClient(app).get("/api/market/history", params={"ticker": "AAA", "period": "max"}).json()
+    assert len(body["candles"]) == 100
@@ -0,0 +1,44 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.db.models import ShardLease  # noqa: F401
+from app.services.sharding import HashRing, ShardCoordinator, ticker_for
+
+
+def test_ring_moves_only_a_fraction_when_a_worker_joins():
+    keys = [f"shard:{i}" for i in range(2000)]
+    before = HashRing(["w1", "w2", "w3"])
+    after = HashRing(["w1", "w2", "w3", "w4"])
+    moved = [k for k in keys if before.owner(k) != after.owner(k)]
+    assert all(after.owner(k) == "w4" for k in moved)
+    assert 0.15 < len(moved) / len(keys) < 0.35
+
+
+def test_leases_partition_shards_and_fail_over(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'leases.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine)
+    now = [1000.0]
+    a, b = (ShardCoordinator(w, f"http://{w}", shard_count=32, lease_seconds=30, vnodes=32,
+                             session_factory=Session, clock=lambda: now[0]) for w in ("a", "b"))
+
+    a.heartbeat()
+    assert len(a.owned) == 32  # singur în cluster
+    b.heartbeat()  # b intră; a încă deține totul
+    a.heartbeat()  # a predă shard-urile care acum sunt ale lui b
+    b.heartbeat()
+    assert a.owned and b.owned and not (a.owned & b.owned) and len(a.owned | b.owned) == 32
+    assert b.owner_of("AAPL") == a.owner_of("AAPL")
+
+    owned_b = set(b.owned)
+    now[0] += 31  # b moare: lease-urile lui expiră
+    a.heartbeat()
+    assert len(a.owned) == 32 and a.live_workers == ["a"]
+    assert owned_b <= a.owned
+
+
+def test_ticker_extraction_for_routing():
+    assert ticker_for("/api/predictions/aapl", b"") == "AAPL"
+    assert ticker_for("/api/market/history", b"ticker=msft&period=1y") == "MSFT"
+    assert ticker_for("/api/market/quotes", b"tickers=A,B") is None
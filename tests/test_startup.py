@@ -0,0 +1,38 @@
+import os
+import subprocess
+import sys
+
+from app.db import session
+
+
+def test_market_data_import_defers_providers():
+    # proces separat: în suita de teste yfinance/pandas pot fi deja importate de alte teste
+    code = (
+        "import sys\n"
+        "from app.services import market_data as m\n"
+        "assert m._PROVIDERS is None, 'providers built at import'\n"
+        "heavy = [k for k in ('yfinance', 'pandas', 'httpx', 'sklearn') if k in sys.modules]\n"
+        "assert not heavy, heavy\n"
+        "providers = m._providers()\n"
+        "assert providers and m._PROVIDERS is providers and m.init_providers() is providers\n"
+    )
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                          env={**os.environ, "MARKET_PROVIDER_ORDER": "replay"})
+    assert proc.returncode == 0, proc.stderr
+
+
+def test_ensure_schema_respects_db_create_all(monkeypatch):
+    from app.db.base import Base
+
+    calls = []
+    monkeypatch.setattr(Base.metadata, "create_all", lambda bind=None, **kw: calls.append(bind))
+    monkeypatch.setattr(session, "_schema_ready", False)
+
+    monkeypatch.setattr(session.settings, "db_create_all", False)
+    session.ensure_schema()
+    assert calls == []  # producție: alembic deține schema
+
+    monkeypatch.setattr(session.settings, "db_create_all", True)
+    session.ensure_schema()
+    session.ensure_schema()  # o singură dată per proces
+    assert calls == [session.engine]
@@ -0,0 +1,46 @@
+import math
+
+import numpy as np
+
+from app.ml.pipeline.trajectories import fit_return_model, row_quantiles, simulate
+
+
+def _closes(n_tickers=20, n=1000, mu=0.0005, sigma=0.02, seed=0):
+    rng = np.random.default_rng(seed)
+    return {f"T{i}": 100 * np.exp(np.cumsum(rng.normal(mu, sigma, n))) for i in range(n_tickers)}
+
+
+def test_normal_mode_matches_lognormal_closed_form():
+    model = fit_return_model(_closes(), ar1=False)
+    out = simulate(model, horizons=[1, 7, 14], n_paths=20_000, seed=1, mode="normal")
+    for i, t in enumerate(model.tickers):
+        mu, sd = model.mu[i], model.sigma[i]
+        for row in out[t]:
+            h = row["days"]
+            p_up = 0.5 * (1 + math.erf(mu * h / (sd * math.sqrt(h)) / math.sqrt(2)))
+            assert abs(row["p_up"] - p_up) < 0.015
+            assert abs(row["expected_change_pct"] - math.expm1(mu * h + 0.5 * sd * sd * h) * 100) < 0.25
+            q90 = math.expm1(mu * h + 1.2815516 * sd * math.sqrt(h)) * 100
+            assert abs(row["quantiles"]["q90"] - q90) < 0.3
+
+
+def test_bootstrap_is_seeded_and_ar1_widens_trending_series():
+    model = fit_return_model(_closes(5), ar1=True)
+    assert simulate(model, n_paths=2000, seed=7) == simulate(model, n_paths=2000, seed=7)
+    assert simulate(model, n_paths=2000, seed=7) != simulate(model, n_paths=2000, seed=8)
+
+    # serie cu autocorelare pozitivă => dispersie mai mare pe 14 zile decât fără AR(1)
+    rng = np.random.default_rng(3)
+    e, r = rng.normal(0, 0.01, 1500), np.zeros(1500)
+    for k in range(1, 1500):
+        r[k] = 0.4 * r[k - 1] + e[k]
+    closes = {"AR": 100 * np.exp(np.cumsum(r))}
+    with_ar = simulate(fit_return_model(closes, ar1=True), horizons=[14], seed=1)["AR"][0]["quantiles"]
+    without = simulate(fit_return_model(closes, ar1=False), horizons=[14], seed=1)["AR"][0]["quantiles"]
+    assert with_ar["q95"] - with_ar["q05"] > 1.2 * (without["q95"] - without["q05"])
+
+
+def test_row_quantiles_close_to_numpy():
+    x = (np.random.default_rng(0).standard_normal((50, 10_000)) * 0.05).astype(np.float32)
+    qs = [0.05, 0.5, 0.95]
+    np.testing.assert_allclose(row_quantiles(x, qs), np.quantile(x, qs, axis=1).T, atol=1e-4)
@@ -0,0 +1,116 @@
+import itertools
+from math import factorial
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier, GradientBoostingRegressor
+
+from app.ml.data.synth import synth_candles
+from app.ml.explain.treeshap import TreeExplainer
+from app.ml.monitoring.shap_stability import load_histories, stability_report
+from app.ml.pipeline import infer_service, train_baseline
+from app.ml.pipeline.train_baseline import TrainConfig, train_on_dataframe
+
+
+def _brute_shap(model, x):
+    """Exact Shapley values of the path-dependent (cover-weighted) game, by subset enumeration."""
+    def v_tree(t, S, node=0):
+        if t.children_left[node] == -1:
+            return t.value[node, 0, 0]
+        l, r = t.children_left[node], t.children_right[node]
+        if t.feature[node] in S:
+            return v_tree(t, S, l if np.float32(x[t.feature[node]]) <= t.threshold[node] else r)
+        c = t.weighted_n_node_samples
+        return (c[l] * v_tree(t, S, l) + c[r] * v_tree(t, S, r)) / c[node]
+
+    v = lambda S: sum(model.learning_rate * v_tree(e.tree_, S) for e in np.ravel(model.estimators_))
+    F = len(x)
+    phi = np.zeros(F)
+    for i in range(F):
+        others = [j for j in range(F) if j != i]
+        for k in range(F):
+            w = factorial(k) * factorial(F - k - 1) / factorial(F)
+            for S in itertools.combinations(others, k):
+                phi[i] += w * (v(set(S) | {i}) - v(set(S)))
+    return phi
+
+
+def test_matches_exact_shapley_and_is_additive():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(400, 5))
+    y = (X[:, 0] + 0.5 * X[:, 1] * X[:, 2] + rng.normal(0, 0.5, 400) > 0).astype(int)
+    models = [GradientBoostingClassifier(n_estimators=15, max_depth=3, random_state=0).fit(X, y),
+              GradientBoostingRegressor(n_estimators=15, max_depth=4, subsample=0.7, random_state=0)
+              .fit(X, 2 * X[:, 0] + X[:, 3] ** 2)]
+    for model in models:
+        ex = TreeExplainer.from_model(model)
+        phi = ex.shap_values(X[:100])
+        raw = model.decision_function(X[:100]) if hasattr(model, "decision_function") else model.predict(X[:100])
+        assert np.allclose(ex.expected_value + phi.sum(axis=1), raw, atol=1e-9)
+        assert np.allclose(phi[7], _brute_shap(model, X[7]), atol=1e-9)
+
+
+def test_importance_history_drivers_and_stability_report(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_baseline, "ART_DIR", str(tmp_path))
+    monkeypatch.setattr(infer_service, "ART_DIR", str(tmp_path))
+    for ticker, seed in (("AAA", 1), ("BBB", 2)):
+        df = synth_candles(n=500, seed=seed)
+        train_on_dataframe(df.iloc[:450], TrainConfig(ticker=ticker, horizon_days=5))
+        metrics = train_on_dataframe(df, TrainConfig(ticker=ticker, horizon_days=5))  # a doua fereastră
+    assert len(metrics["shap_top"]) == 5
+
+    pred = infer_service.predict_from_candles("BBB", 5, df)
+    assert len(pred["drivers"]) == 3 and pred["drivers"][0]["feature"] in metrics["features"]
+
+    hist = load_histories(str(tmp_path))
+    assert set(hist) == {"AAA_5d", "BBB_5d"} and all(len(d["windows"]) == 2 for d in hist.values())
+    report = stability_report(hist, "cls")
+    assert report["artifacts"] == 2 and report["with_history"] == 2
+    rows = report["features"]
+    assert {r["feature"] for r in rows} == set(metrics["features"])
+    assert [r["instability"] for r in rows] == sorted((r["instability"] for r in rows), reverse=True)
+    assert abs(sum(r["mean_share"] for r in rows) - 1.0) < 1e-2
+
+
+def test_legacy_calibrated_artifact_predicts_without_drivers(tmp_path, monkeypatch):
+    from joblib import dump
+    from sklearn.calibration import CalibratedClassifierCV
+
+    monkeypatch.setattr(train_baseline, "ART_DIR", str(tmp_path))
+    monkeypatch.setattr(infer_service, "ART_DIR", str(tmp_path))
+    df = synth_candles(n=400, seed=5)
+    metrics = train_on_dataframe(df, TrainConfig(ticker="OLD", horizon_days=5))
+    # artefact vechi: CalibratedClassifierCV în cls_*.joblib, fără calib_*.json
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(200, len(metrics["features"])))
+    legacy = CalibratedClassifierCV(GradientBoostingClassifier(n_estimators=5), cv=3).fit(X, X[:, 0] > 0)
+    dump(legacy, tmp_path / "cls_OLD_5d.joblib")
+    (tmp_path / "calib_OLD_5d.json").unlink()
+
+    pred = infer_service.predict_from_candles("OLD", 5, df)
+    assert pred["drivers"] is None and 0 <= pred["probability_pct"] <= 100
+
+
+def test_artifact_cache_is_bounded_per_model(tmp_path, monkeypatch):
+    from collections import OrderedDict
+
+    from app.core.config import settings
+
+    monkeypatch.setattr(infer_service, "_artifact_cache", OrderedDict())
+    monkeypatch.setattr(settings, "ml_artifact_cache_models", 2)
+    loads = []
+    for t in ("A", "B", "A", "C"):
+        for kind in ("cls", "calib"):
+            p = tmp_path / f"{kind}_{t}.bin"
+            if not p.exists():
+                p.write_text(t)
+            infer_service._cached_artifact(t, 5, str(p), lambda path: loads.append(path) or path)
+    assert list(infer_service._artifact_cache) == [("A", 5), ("C", 5)]  # B ieșit (LRU), A reutilizat
+    assert len(loads) == 6 and all(len(v) == 2 for v in infer_service._artifact_cache.values())
+
+
+def test_slot_to_feature_map_is_sparse():
+    rng = np.random.default_rng(3)
+    X = rng.normal(size=(300, 20))
+    model = GradientBoostingClassifier(n_estimators=40, max_depth=4, random_state=0).fit(X, X[:, 0] > 0)
+    ex = TreeExplainer.from_model(model)
+    assert ex._onehot.nnz == int((ex.leaf_feat >= 0).sum()) < ex.leaf_feat.size * ex.n_features
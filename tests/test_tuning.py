@@ -0,0 +1,20 @@
+from app.ml.data.synth import synth_candles
+from app.ml.pipeline import train_baseline, tuning
+from app.ml.pipeline.train_baseline import TrainConfig
+
+
+def test_successive_halving_prunes_and_persists_winner(tmp_path, monkeypatch):
+    monkeypatch.setattr(train_baseline, "ART_DIR", str(tmp_path))
+    df = synth_candles(n=600, seed=3)
+    report = tuning.tune(df, TrainConfig(ticker="syn", horizon_days=5), n_trials=8, n_jobs=1,
+                         min_estimators=10, max_estimators=40, eta=2)
+
+    cls = report["cls"]
+    assert [r["trials"] for r in cls["rungs"]] == [8, 4, 2]
+    assert cls["trees"] == 8 * 10 + 4 * 10 + 2 * 20 < cls["trees_without_pruning"]
+    assert 1 <= cls["params"]["n_estimators"] <= 40
+    assert cls["tuned"]["val"] <= cls["default"]["val"] * 1.5 and report["cpu_s"] > 0
+
+    cfg = TrainConfig.with_tuned("SYN", 5)
+    assert cfg.cls_params == cls["params"] and cfg.reg_params == report["reg"]["params"]
+    assert TrainConfig.with_tuned("OTHER", 5).cls_params is None
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from app.services.providers import yahoo_provider
+from app.services.providers.yahoo_provider import YahooProvider
+
+
+def _frame(seed: int, n: int = 60) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + rng.normal(0, 1, n).cumsum()
+    idx = pd.date_range("2024-01-02", periods=n, freq="B", tz="America/New_York")
+    return pd.DataFrame({"Open": close, "High": close + 1, "Low": close - 1,
+                         "Close": close, "Adj Close": close, "Volume": 1e6}, index=idx)
+
+
+class _RecordedYahoo:
+    """Stand-in for yf.download / yf.Ticker serving recorded frames."""
+
+    def __init__(self, frames):
+        self.frames = frames
+        self.download_calls = 0
+        self.ticker_calls = []
+
+    def download(self, tickers, group_by=None, **kw):
+        self.download_calls += 1
+        syms = tickers.split()
+        if group_by == "ticker":
+            empty = pd.DataFrame(np.nan, index=self.frames[syms[0]].index, columns=self.frames[syms[0]].columns)
+            return pd.concat({t: self.frames.get(t, empty) for t in syms}, axis=1)
+        return self.frames.get(syms[0], pd.DataFrame())
+
+    def Ticker(self, t):
+        rec = self
+
+        class _T:
+            def history(self, **kw):
+                rec.ticker_calls.append(t)
+                return _frame(999) if t == "LATE" else pd.DataFrame()
+        return _T()
+
+
+def test_batch_download_splits_per_ticker_and_falls_back_only_for_empty(monkeypatch):
+    frames = {t: _frame(i) for i, t in enumerate(["AAPL", "MSFT", "NVDA"])}
+    rec = _RecordedYahoo(frames)
+    monkeypatch.setattr(yahoo_provider, "yf", rec)
+
+    out = YahooProvider().get_history_many(["aapl", "MSFT", "NVDA", "LATE", "GONE"], "3mo", "1d")
+
+    assert rec.download_calls == 1
+    assert sorted(rec.ticker_calls) == ["GONE", "LATE"]   # fallback doar pentru cele goale
+    assert sorted(out) == ["AAPL", "LATE", "MSFT", "NVDA"]
+    for t in ["AAPL", "MSFT", "NVDA"]:
+        np.testing.assert_allclose([c.close for c in out[t]], frames[t]["Close"].to_numpy())
+        assert out[t][0].date.tzinfo is not None
+    assert out["AAPL"] != out["MSFT"]
+
+    # aceeași conversie ca pe calea per-ticker
+    single = YahooProvider().get_history("MSFT", "3mo", "1d")
+    assert single == out["MSFT"]